@@ -2,7 +2,10 @@ import os
 import json
 import logging
 import re
-from typing import Dict, Any, Optional
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, List
 from datetime import datetime, timedelta
 from flask import Flask, request, jsonify
 from twilio.rest import Client
@@ -28,6 +31,23 @@ AUTH_API_URL = os.getenv('AUTH_API_URL', 'http://localhost:8001')
 REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379')
 WEB_APP_URL = os.getenv('WEB_APP_URL', 'http://localhost:3000')
 
+# Broadcasts
+BROADCAST_RATE_PER_SECOND = float(os.getenv('BROADCAST_RATE_PER_SECOND', '20'))
+BROADCAST_CONCURRENCY = int(os.getenv('BROADCAST_CONCURRENCY', '10'))
+BROADCAST_PAGE_SIZE = int(os.getenv('BROADCAST_PAGE_SIZE', '500'))
+
+SESSION_TTL = timedelta(hours=24)
+SESSION_KEY_PREFIX = "whatsapp_session:"
+# Sorted set per onboarding step: phone number -> session expiry (epoch seconds)
+STEP_INDEX_PREFIX = "whatsapp_sessions:step:"
+BROADCAST_KEY_PREFIX = "whatsapp_broadcast:"
+BROADCAST_STATUS_TTL = timedelta(days=7)
+# Running broadcasts hold a lease renewed by a heartbeat; jobs whose lease has
+# lapsed (their process died) are resumed from their last completed page
+BROADCAST_LEASE_PREFIX = "whatsapp_broadcast_lease:"
+ACTIVE_BROADCASTS_KEY = "whatsapp_broadcasts:active"
+BROADCAST_LEASE_SECONDS = int(os.getenv('BROADCAST_LEASE_SECONDS', '60'))
+
 # Initialize Twilio client
 twilio_client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
 
@@ -77,7 +97,7 @@ class WhatsAppBot:
         return None
     
     def save_user_session(self, session: UserSession):
-        """Save user session to Redis"""
+        """Save user session to Redis and move it to its step in the session index"""
         try:
             session_data = {
                 'current_step': session.current_step.value,
@@ -85,11 +105,18 @@ class WhatsAppBot:
                 'created_at': session.created_at.isoformat(),
                 'updated_at': session.updated_at.isoformat()
             }
-            redis_client.setex(
-                f"whatsapp_session:{session.phone_number}",
-                timedelta(hours=24),
-                json.dumps(session_data)
-            )
+            expires_at = time.time() + SESSION_TTL.total_seconds()
+            with redis_client.pipeline() as pipe:
+                pipe.setex(
+                    f"{SESSION_KEY_PREFIX}{session.phone_number}",
+                    SESSION_TTL,
+                    json.dumps(session_data)
+                )
+                for step in OnboardingStep:
+                    if step != session.current_step:
+                        pipe.zrem(f"{STEP_INDEX_PREFIX}{step.value}", session.phone_number)
+                pipe.zadd(f"{STEP_INDEX_PREFIX}{session.current_step.value}", {session.phone_number: expires_at})
+                pipe.execute()
         except Exception as e:
             logger.error(f"Error saving user session: {e}")
     
@@ -103,7 +130,7 @@ class WhatsAppBot:
             updated_at=datetime.now()
         )
     
-    def send_message(self, to: str, message: str):
+    def send_message(self, to: str, message: str) -> bool:
         """Send WhatsApp message via Twilio"""
         try:
             twilio_client.messages.create(
@@ -112,8 +139,10 @@ class WhatsAppBot:
                 to=to
             )
             logger.info(f"Message sent to {to}")
+            return True
         except Exception as e:
             logger.error(f"Error sending message to {to}: {e}")
+            return False
     
     def validate_phone_number(self, phone: str) -> bool:
         """Validate Indian phone number"""
@@ -396,6 +425,229 @@ Business hours: Mon-Fri 9AM-6PM IST"""
 # Initialize bot
 bot = WhatsAppBot()
 
+def step_index_counts() -> Dict[str, int]:
+    """Live sessions per onboarding step, dropping expired sessions from the index"""
+    now = time.time()
+    with redis_client.pipeline() as pipe:
+        for step in OnboardingStep:
+            pipe.zremrangebyscore(f"{STEP_INDEX_PREFIX}{step.value}", '-inf', now)
+            pipe.zcard(f"{STEP_INDEX_PREFIX}{step.value}")
+        results = pipe.execute()
+    return {step.value: count for step, count in zip(OnboardingStep, results[1::2]) if count}
+
+def iter_session_pages(steps: List[str], step_index: int = 0, cursor: int = 0):
+    """
+    Yield (position, page) for pages of phone numbers with a live session in
+    any of steps, starting from position (step_index, cursor). Each position
+    is where to resume once its page has been handled.
+    """
+    seen = set()  # ZSCAN may repeat members, and users move between steps mid-broadcast
+    for index in range(step_index, len(steps)):
+        while True:
+            cursor, entries = redis_client.zscan(f"{STEP_INDEX_PREFIX}{steps[index]}", cursor, count=BROADCAST_PAGE_SIZE)
+            now = time.time()
+            page = [phone for phone, expires_at in entries if expires_at > now and phone not in seen]
+            seen.update(page)
+            if page:
+                yield (index, cursor) if cursor != 0 else (index + 1, 0), page
+            if cursor == 0:
+                break
+
+def rebuild_session_index() -> int:
+    """Index every stored session by its step, e.g. sessions saved before the index existed"""
+    indexed = 0
+    keys = []
+    for key in redis_client.scan_iter(match=f"{SESSION_KEY_PREFIX}*", count=1000):
+        keys.append(key)
+        if len(keys) == 1000:
+            indexed += _index_sessions(keys)
+            keys = []
+    if keys:
+        indexed += _index_sessions(keys)
+    return indexed
+
+def _index_sessions(keys: List[str]) -> int:
+    with redis_client.pipeline(transaction=False) as pipe:
+        for key in keys:
+            pipe.get(key)
+            pipe.ttl(key)
+        results = pipe.execute()
+
+    now = time.time()
+    indexed = 0
+    with redis_client.pipeline(transaction=False) as pipe:
+        for key, session_data, ttl in zip(keys, results[::2], results[1::2]):
+            if session_data is None or ttl < 0:
+                continue
+            phone_number = key[len(SESSION_KEY_PREFIX):]
+            current_step = json.loads(session_data).get('current_step')
+            for step in OnboardingStep:
+                if step.value != current_step:
+                    pipe.zrem(f"{STEP_INDEX_PREFIX}{step.value}", phone_number)
+            pipe.zadd(f"{STEP_INDEX_PREFIX}{current_step}", {phone_number: now + ttl})
+            indexed += 1
+        pipe.execute()
+    return indexed
+
+class SendPacer:
+    """Spaces sends from any number of threads evenly at rate per second"""
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        time.sleep(slot - now)
+
+def start_broadcast(message: str, target_step: Optional[str] = None) -> Dict[str, Any]:
+    """Record a broadcast job and send it from a background thread"""
+    broadcast_id = uuid.uuid4().hex
+    steps = [target_step] if target_step else [step.value for step in OnboardingStep]
+    counts = step_index_counts()
+    job = {
+        'broadcast_id': broadcast_id,
+        'status': 'queued',
+        'target_step': target_step or '',
+        'total': sum(counts.get(step, 0) for step in steps),
+        'sent': 0,
+        'failed': 0,
+        'created_at': datetime.now().isoformat()
+    }
+    key = f"{BROADCAST_KEY_PREFIX}{broadcast_id}"
+    with redis_client.pipeline() as pipe:
+        # The message and scan position let another process resume the job
+        pipe.hset(key, mapping={**job, 'message': message, 'steps': json.dumps(steps), 'step_index': 0, 'cursor': 0})
+        pipe.expire(key, BROADCAST_STATUS_TTL)
+        pipe.sadd(ACTIVE_BROADCASTS_KEY, broadcast_id)
+        pipe.execute()
+
+    launch_broadcast(broadcast_id)
+    return job
+
+def launch_broadcast(broadcast_id: str) -> bool:
+    """Take the job's lease and run it in a background thread; False if another process holds it"""
+    owner = uuid.uuid4().hex
+    if not redis_client.set(f"{BROADCAST_LEASE_PREFIX}{broadcast_id}", owner, nx=True, ex=BROADCAST_LEASE_SECONDS):
+        return False
+    threading.Thread(
+        target=run_broadcast, args=(broadcast_id, owner), name=f"broadcast-{broadcast_id}", daemon=True
+    ).start()
+    return True
+
+def renew_broadcast_lease(broadcast_id: str, owner: str, stop: threading.Event, lost: threading.Event):
+    """Heartbeat: renew the lease until stop is set, or flag lost if another process took it"""
+    lease_key = f"{BROADCAST_LEASE_PREFIX}{broadcast_id}"
+    while not stop.wait(BROADCAST_LEASE_SECONDS / 3):
+        try:
+            if redis_client.get(lease_key) != owner:
+                lost.set()
+                return
+            redis_client.expire(lease_key, BROADCAST_LEASE_SECONDS)
+        except redis.RedisError as e:
+            logger.warning(f"Could not renew lease for broadcast {broadcast_id}: {e}")
+
+def run_broadcast(broadcast_id: str, owner: str):
+    """
+    Send the job's message to every indexed session in its steps,
+    BROADCAST_CONCURRENCY at a time and no faster than
+    BROADCAST_RATE_PER_SECOND, recording progress and the scan position
+    after each page. A resumed job starts after its last recorded page, so
+    only the page in flight when a process died can be sent twice.
+    """
+    key = f"{BROADCAST_KEY_PREFIX}{broadcast_id}"
+    lease_key = f"{BROADCAST_LEASE_PREFIX}{broadcast_id}"
+    pacer = SendPacer(BROADCAST_RATE_PER_SECOND)
+    stop, lost = threading.Event(), threading.Event()
+    threading.Thread(
+        target=renew_broadcast_lease, args=(broadcast_id, owner, stop, lost),
+        name=f"broadcast-lease-{broadcast_id}", daemon=True
+    ).start()
+
+    def send(phone_number: str) -> bool:
+        pacer.wait()
+        return bot.send_message(phone_number, message)
+
+    def finish(mapping: Dict[str, str]):
+        with redis_client.pipeline() as pipe:
+            pipe.hset(key, mapping={**mapping, 'finished_at': datetime.now().isoformat()})
+            pipe.srem(ACTIVE_BROADCASTS_KEY, broadcast_id)
+            pipe.execute()
+
+    try:
+        job = redis_client.hgetall(key)
+        if job.get('status') not in ('queued', 'running'):
+            # Finished between the reaper's check and taking the lease
+            return
+        message = job['message']
+        redis_client.hset(key, mapping={'status': 'running', 'started_at': job.get('started_at') or datetime.now().isoformat()})
+        pages = iter_session_pages(json.loads(job['steps']), int(job.get('step_index', 0)), int(job.get('cursor', 0)))
+        with ThreadPoolExecutor(max_workers=BROADCAST_CONCURRENCY) as executor:
+            for (step_index, cursor), page in pages:
+                if lost.is_set():
+                    logger.warning(f"Broadcast {broadcast_id} lost its lease; leaving it to the new owner")
+                    return
+                results = list(executor.map(send, page))
+                sent = sum(results)
+                with redis_client.pipeline() as pipe:
+                    pipe.hincrby(key, 'sent', sent)
+                    pipe.hincrby(key, 'failed', len(results) - sent)
+                    pipe.hset(key, mapping={'step_index': step_index, 'cursor': cursor})
+                    pipe.execute()
+        finish({'status': 'completed'})
+        logger.info(f"Broadcast {broadcast_id} completed")
+    except Exception as e:
+        logger.error(f"Broadcast {broadcast_id} failed: {e}")
+        finish({'status': 'failed', 'error': str(e)})
+    finally:
+        stop.set()
+        if not lost.is_set():
+            redis_client.delete(lease_key)
+
+def resume_broadcasts() -> List[str]:
+    """Resume active broadcasts whose lease has lapsed; returns the IDs this process took over"""
+    resumed = []
+    for broadcast_id in redis_client.smembers(ACTIVE_BROADCASTS_KEY):
+        status = redis_client.hget(f"{BROADCAST_KEY_PREFIX}{broadcast_id}", 'status')
+        if status not in ('queued', 'running'):
+            # Finished, or its status record expired
+            redis_client.srem(ACTIVE_BROADCASTS_KEY, broadcast_id)
+        elif launch_broadcast(broadcast_id):
+            logger.info(f"Resuming broadcast {broadcast_id}")
+            resumed.append(broadcast_id)
+    return resumed
+
+def run_broadcast_reaper():
+    while True:
+        try:
+            resume_broadcasts()
+        except Exception as e:
+            logger.error(f"Error resuming broadcasts: {e}")
+        time.sleep(BROADCAST_LEASE_SECONDS)
+
+broadcast_reaper_lock = threading.Lock()
+broadcast_reaper: Optional[threading.Thread] = None
+
+@app.before_request
+def start_broadcast_reaper():
+    """Start this worker's broadcast reaper on its first request"""
+    global broadcast_reaper
+    if app.testing or broadcast_reaper is not None:
+        return
+    with broadcast_reaper_lock:
+        if broadcast_reaper is None:
+            broadcast_reaper = threading.Thread(target=run_broadcast_reaper, name="broadcast-reaper", daemon=True)
+            broadcast_reaper.start()
+
+@app.cli.command('rebuild-session-index')
+def rebuild_session_index_command():
+    """Index existing sessions by onboarding step"""
+    print(f"Indexed {rebuild_session_index()} sessions")
+
 @app.route('/webhook', methods=['POST'])
 def webhook():
     """Handle incoming WhatsApp messages"""
@@ -456,19 +708,11 @@ def health_check():
 def get_stats():
     """Get bot statistics"""
     try:
-        # Get session statistics from Redis
-        session_keys = redis_client.keys("whatsapp_session:*")
-        total_sessions = len(session_keys)
-        
-        # Count by step
-        step_counts = {}
-        for key in session_keys:
-            session_data = json.loads(redis_client.get(key))
-            step = session_data.get('current_step', 'unknown')
-            step_counts[step] = step_counts.get(step, 0) + 1
+        # Session counts come from the step index, one ZCARD per step
+        step_counts = step_index_counts()
         
         return jsonify({
-            "total_sessions": total_sessions,
+            "total_sessions": sum(step_counts.values()),
             "step_distribution": step_counts,
             "timestamp": datetime.now().isoformat()
         })
@@ -478,7 +722,7 @@ def get_stats():
 
 @app.route('/send-broadcast', methods=['POST'])
 def send_broadcast():
-    """Send broadcast message to all users"""
+    """Start a background broadcast to all users"""
     try:
         data = request.get_json()
         message = data.get('message')
@@ -487,37 +731,40 @@ def send_broadcast():
         if not message:
             return jsonify({"error": "Message is required"}), 400
         
-        # Get all sessions
-        session_keys = redis_client.keys("whatsapp_session:*")
-        sent_count = 0
+        if target_step and target_step not in {step.value for step in OnboardingStep}:
+            return jsonify({"error": f"Unknown target_step: {target_step}"}), 400
         
-        for key in session_keys:
-            try:
-                session_data = json.loads(redis_client.get(key))
-                
-                # Filter by step if specified
-                if target_step and session_data.get('current_step') != target_step:
-                    continue
-                
-                # Extract phone number from key
-                phone_number = key.replace("whatsapp_session:", "")
-                
-                # Send message
-                bot.send_message(phone_number, message)
-                sent_count += 1
-                
-            except Exception as e:
-                logger.error(f"Error sending broadcast to {key}: {e}")
+        job = start_broadcast(message, target_step)
         
         return jsonify({
-            "message": "Broadcast sent",
-            "sent_count": sent_count,
+            "message": "Broadcast started",
+            "broadcast_id": job['broadcast_id'],
+            "total": job['total'],
+            "status_url": f"/broadcasts/{job['broadcast_id']}",
             "timestamp": datetime.now().isoformat()
-        })
+        }), 202
         
     except Exception as e:
         logger.error(f"Error sending broadcast: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/broadcasts/<broadcast_id>', methods=['GET'])
+def get_broadcast(broadcast_id: str):
+    """Get broadcast progress"""
+    try:
+        job = redis_client.hgetall(f"{BROADCAST_KEY_PREFIX}{broadcast_id}")
+        if not job:
+            return jsonify({"error": "Broadcast not found"}), 404
+        
+        for field in ('total', 'sent', 'failed'):
+            job[field] = int(job.get(field, 0))
+        for field in ('message', 'steps', 'step_index', 'cursor'):
+            job.pop(field, None)
+        return jsonify(job)
+        
+    except Exception as e:
+        logger.error(f"Error getting broadcast {broadcast_id}: {e}")
+        return jsonify({"error": str(e)}), 500
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
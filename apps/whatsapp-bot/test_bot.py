@@ -1,8 +1,11 @@
 import unittest
 from unittest.mock import Mock, patch, MagicMock
 import json
+import time
 from datetime import datetime
+import fakeredis
 import redis
+import main
 from main import WhatsAppBot, OnboardingStep, UserSession
 
 class TestWhatsAppBot(unittest.TestCase):
@@ -215,15 +218,20 @@ class TestWhatsAppBot(unittest.TestCase):
         self.assertEqual(session.current_step, OnboardingStep.NAME)
         self.assertEqual(session.data['name'], 'John')
         
-        # Test session saving
+        # Test session saving: stored and indexed under its step in one pipeline
         self.bot.save_user_session(self.test_session)
-        mock_redis.setex.assert_called_once()
+        pipe = mock_redis.pipeline.return_value.__enter__.return_value
+        pipe.setex.assert_called_once()
+        pipe.zadd.assert_called_once()
+        self.assertEqual(pipe.zadd.call_args[0][0], 'whatsapp_sessions:step:welcome')
+        pipe.execute.assert_called_once()
 
 class TestWebhookIntegration(unittest.TestCase):
     
     def setUp(self):
         """Set up test fixtures"""
         from main import app
+        app.testing = True
         self.app = app.test_client()
         self.app.testing = True
     
@@ -260,20 +268,112 @@ class TestWebhookIntegration(unittest.TestCase):
     @patch('main.redis_client')
     def test_stats_endpoint(self, mock_redis):
         """Test stats endpoint"""
-        mock_redis.keys.return_value = ['whatsapp_session:+919876543210']
-        mock_redis.get.return_value = json.dumps({
-            'current_step': 'name',
-            'data': {},
-            'created_at': datetime.now().isoformat(),
-            'updated_at': datetime.now().isoformat()
-        })
+        # ZREMRANGEBYSCORE and ZCARD results per step: one session at 'name'
+        pipe = mock_redis.pipeline.return_value.__enter__.return_value
+        pipe.execute.return_value = [0, 0, 0, 1] + [0, 0] * (len(OnboardingStep) - 2)
         
         response = self.app.get('/stats')
         
         self.assertEqual(response.status_code, 200)
         data = json.loads(response.data)
         self.assertEqual(data['total_sessions'], 1)
-        self.assertIn('step_distribution', data)
+        self.assertEqual(data['step_distribution'], {'name': 1})
+        mock_redis.keys.assert_not_called()
+    
+    @patch('main.threading.Thread')
+    @patch('main.redis_client')
+    def test_broadcast_runs_in_background(self, mock_redis, mock_thread):
+        """Test broadcast endpoint returns a job instead of sending inline"""
+        pipe = mock_redis.pipeline.return_value.__enter__.return_value
+        pipe.execute.return_value = [0, 2] + [0, 0] * (len(OnboardingStep) - 1)
+        
+        response = self.app.post('/send-broadcast', json={'message': 'Hello'})
+        
+        self.assertEqual(response.status_code, 202)
+        data = json.loads(response.data)
+        self.assertEqual(data['total'], 2)
+        self.assertEqual(data['status_url'], f"/broadcasts/{data['broadcast_id']}")
+        mock_thread.return_value.start.assert_called_once()
+
+class TestBroadcastRecovery(unittest.TestCase):
+    
+    def setUp(self):
+        """Back the module's Redis client with fakeredis and record sends"""
+        self.redis = fakeredis.FakeRedis(decode_responses=True)
+        self.sent = []
+        for target, value in [
+            ('main.redis_client', self.redis),
+            ('main.BROADCAST_RATE_PER_SECOND', 1000),
+            ('main.BROADCAST_PAGE_SIZE', 2),
+        ]:
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = patch.object(main.bot, 'send_message', side_effect=lambda to, message: self.sent.append(to) or True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        
+        expires_at = time.time() + 3600
+        self.redis.zadd(f"{main.STEP_INDEX_PREFIX}name", {f"+91{n}": expires_at for n in range(3)})
+        self.redis.zadd(f"{main.STEP_INDEX_PREFIX}completed", {f"+92{n}": expires_at for n in range(3)})
+    
+    def record_job(self, broadcast_id, **fields):
+        self.redis.hset(f"{main.BROADCAST_KEY_PREFIX}{broadcast_id}", mapping={
+            'broadcast_id': broadcast_id, 'status': 'running', 'total': 6, 'sent': 0, 'failed': 0,
+            'message': 'Hello', 'steps': json.dumps(['name', 'completed']), 'step_index': 0, 'cursor': 0,
+            **fields
+        })
+        self.redis.sadd(main.ACTIVE_BROADCASTS_KEY, broadcast_id)
+    
+    def wait_for(self, broadcast_id, status):
+        deadline = time.time() + 5
+        while self.redis.hget(f"{main.BROADCAST_KEY_PREFIX}{broadcast_id}", 'status') != status:
+            self.assertLess(time.time(), deadline, f"broadcast never reached {status}")
+            time.sleep(0.01)
+        return self.redis.hgetall(f"{main.BROADCAST_KEY_PREFIX}{broadcast_id}")
+    
+    def test_dead_broadcast_resumes_after_its_last_page(self):
+        """A running job without a lease is taken over from its recorded position"""
+        self.record_job('dead', sent=3, step_index=1, cursor=0)
+        
+        self.assertEqual(main.resume_broadcasts(), ['dead'])
+        job = self.wait_for('dead', 'completed')
+        
+        self.assertEqual(sorted(self.sent), ['+920', '+921', '+922'])
+        self.assertEqual(int(job['sent']), 6)
+        self.assertEqual(self.redis.smembers(main.ACTIVE_BROADCASTS_KEY), set())
+        self.assertIsNone(self.redis.get(f"{main.BROADCAST_LEASE_PREFIX}dead"))
+    
+    def test_leased_and_finished_broadcasts_are_not_resumed(self):
+        """Jobs with a live lease keep running where they are; finished ones leave the active set"""
+        self.record_job('live')
+        self.redis.set(f"{main.BROADCAST_LEASE_PREFIX}live", 'other-worker', ex=60)
+        self.record_job('done', status='completed')
+        
+        self.assertEqual(main.resume_broadcasts(), [])
+        self.assertEqual(self.sent, [])
+        self.assertEqual(self.redis.smembers(main.ACTIVE_BROADCASTS_KEY), {'live'})
+    
+    def test_broadcast_records_its_position_after_each_page(self):
+        """Every page advances the stored position, ending past the last step"""
+        job = main.start_broadcast('Hello')
+        job = self.wait_for(job['broadcast_id'], 'completed')
+        
+        self.assertEqual(len(self.sent), 6)
+        self.assertEqual(int(job['sent']), 6)
+        self.assertEqual((int(job['step_index']), int(job['cursor'])), (len(OnboardingStep), 0))
+    
+    def test_status_endpoint_hides_job_internals(self):
+        """The status endpoint returns progress without the stored message or position"""
+        self.record_job('job', status='completed')
+        main.app.testing = True
+        
+        response = main.app.test_client().get('/broadcasts/job')
+        
+        data = json.loads(response.data)
+        self.assertEqual(data['status'], 'completed')
+        self.assertNotIn('message', data)
+        self.assertNotIn('cursor', data)
 
 if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    unittest.main()
@@ -0,0 +1,65 @@
+"""matching entity change notify
+
+Revision ID: 3c1f6a9d2e47
+Revises: 9173707a2177
+Create Date: 2026-10-16 09:12:41.203517
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c1f6a9d2e47'
+down_revision: Union[str, Sequence[str], None] = '9173707a2177'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The transaction matching service keeps an in-memory index of offerings
+    # and requirements and listens on this channel for the ids that changed.
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION notify_matching_entity_change() RETURNS trigger AS $$
+        DECLARE
+            entity jsonb;
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                entity := to_jsonb(OLD);
+            ELSE
+                entity := to_jsonb(NEW);
+            END IF;
+            PERFORM pg_notify(
+                'matching_entity_changes',
+                json_build_object('table', TG_TABLE_NAME, 'id', entity ->> TG_ARGV[0])::text
+            );
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER seller_offerings_matching_notify
+        AFTER INSERT OR UPDATE OR DELETE ON seller_offerings
+        FOR EACH ROW EXECUTE FUNCTION notify_matching_entity_change('offering_id')
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER buyer_requirements_matching_notify
+        AFTER INSERT OR UPDATE OR DELETE ON buyer_requirements
+        FOR EACH ROW EXECUTE FUNCTION notify_matching_entity_change('requirement_id')
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS buyer_requirements_matching_notify ON buyer_requirements")
+    op.execute("DROP TRIGGER IF EXISTS seller_offerings_matching_notify ON seller_offerings")
+    op.execute("DROP FUNCTION IF EXISTS notify_matching_entity_change()")
@@ -0,0 +1,55 @@
+"""msme listings browse indexes
+
+Revision ID: 7e2b4d81c5a9
+Revises: 3c1f6a9d2e47
+Create Date: 2026-10-16 11:47:09.581204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7e2b4d81c5a9'
+down_revision: Union[str, Sequence[str], None] = '3c1f6a9d2e47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Trigram indexes back the ILIKE '%...%' filters of GET /listings
+TRIGRAM_COLUMNS = ['company_name', 'description', 'industry', 'city', 'state']
+ARRAY_COLUMNS = ['tags', 'keywords']
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # msme_listings is the busiest table; build without blocking writes
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_msme_listings_created_at_id "
+            "ON msme_listings (created_at DESC, id DESC)"
+        )
+        for column in TRIGRAM_COLUMNS:
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_msme_listings_{column}_trgm "
+                f"ON msme_listings USING gin ({column} gin_trgm_ops)"
+            )
+        for column in ARRAY_COLUMNS:
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_msme_listings_{column}_gin "
+                f"ON msme_listings USING gin ({column})"
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for column in ARRAY_COLUMNS:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS ix_msme_listings_{column}_gin")
+        for column in TRIGRAM_COLUMNS:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS ix_msme_listings_{column}_trgm")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_msme_listings_created_at_id")
@@ -0,0 +1,37 @@
+"""points transactions idempotency key
+
+Revision ID: b5d09e3f7a61
+Revises: 7e2b4d81c5a9
+Create Date: 2026-10-16 19:02:37.118450
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5d09e3f7a61'
+down_revision: Union[str, Sequence[str], None] = '7e2b4d81c5a9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The gamification service skips awards whose key is already in the ledger
+    op.execute("ALTER TABLE points_transactions ADD COLUMN IF NOT EXISTS idempotency_key text")
+
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ix_points_transactions_idempotency_key "
+            "ON points_transactions (idempotency_key) WHERE idempotency_key IS NOT NULL"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_points_transactions_idempotency_key")
+    op.execute("ALTER TABLE points_transactions DROP COLUMN IF EXISTS idempotency_key")
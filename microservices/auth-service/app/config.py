@@ -1,10 +1,18 @@
-from pydantic import BaseSettings
+from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     PROJECT_NAME: str = "Auth Service"
     ENV: str = "development"
     DEBUG: bool = True
 
+    REDIS_URL: str = "redis://localhost:6379"
+
+    # Must match what the other services verify with (shared JWTHandler)
+    JWT_SECRET: str
+    JWT_ALGORITHM: str = "HS256"
+    JWT_ISSUER: str = "msmebazaar.com"
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 15
+
     class Config:
         env_file = ".env"
 
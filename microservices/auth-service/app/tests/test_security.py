@@ -0,0 +1,30 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+os.environ.setdefault("JWT_SECRET", "test-secret")
+
+# The shared verifier is imported from the repository root, as the services do
+sys.path.insert(0, str(Path(__file__).resolve().parents[4]))
+
+from app.core.security import create_access_token
+from microservices.shared.utils.token_verifier import TokenVerifier
+
+
+def test_access_tokens_pass_the_shared_verifier():
+    verifier = TokenVerifier()
+    token = create_access_token({"sub": "user-1", "role": "MSME"})
+
+    payload = verifier.verify(token)
+
+    assert payload is not None
+    assert payload["sub"] == "user-1"
+    assert verifier.current_user(payload) == {"valid": True, "user_id": "user-1", "role": "MSME"}
+
+
+def test_verifier_requires_a_secret(monkeypatch):
+    monkeypatch.delenv("JWT_SECRET")
+    with pytest.raises(RuntimeError):
+        TokenVerifier()
@@ -1,8 +1,8 @@
-from fastapi import FastAPI, Depends, HTTPException, BackgroundTasks
+from fastapi import FastAPI, Depends, HTTPException, BackgroundTasks, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer
 from pydantic import BaseModel, Field
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 import asyncio
 import redis.asyncio as redis
 import json
@@ -63,6 +63,10 @@ class PointsAward(BaseModel):
     points: int
     service: str
     metadata: Optional[Dict[str, Any]] = {}
+    idempotency_key: Optional[str] = None  # Retries with the same key are applied once
+
+class BulkPointsAward(BaseModel):
+    awards: List[PointsAward] = Field(..., min_length=1, max_length=1000)
 
 class UserStats(BaseModel):
     user_id: str
@@ -122,9 +126,13 @@ async def lifespan(app: FastAPI):
         min_size=10,
         max_size=20
     )
+    leaderboard.start(app.state.redis, app.state.db_pool)
+    points_ingestor.start(app.state.db_pool, app.state.redis)
     logger.info("Gamification service started")
     yield
     # Shutdown
+    await points_ingestor.stop()
+    await leaderboard.stop()
     await app.state.redis.close()
     await app.state.db_pool.close()
     logger.info("Gamification service stopped")
@@ -166,6 +174,26 @@ POINTS_CONFIG = {
 # Level thresholds
 LEVEL_THRESHOLDS = [0, 100, 300, 600, 1000, 1500, 2100, 2800, 3600, 4500, 5500, 7000, 9000, 12000, 16000, 21000]
 
+# Points ingestion
+POINTS_BATCH_SIZE = int(os.getenv("POINTS_BATCH_SIZE", "500"))
+POINTS_BATCH_WAIT_MS = float(os.getenv("POINTS_BATCH_WAIT_MS", "20"))
+POINTS_QUEUE_SIZE = int(os.getenv("POINTS_QUEUE_SIZE", "10000"))
+POINTS_NOTIFICATION_CONCURRENCY = int(os.getenv("POINTS_NOTIFICATION_CONCURRENCY", "20"))
+
+# Per-action counters checked by badge and achievement requirements
+ACTION_FIELD_MAP = {
+    ActionType.MSME_REGISTERED: 'msmes_registered',
+    ActionType.VALUATION_COMPLETED: 'valuations_completed',
+    ActionType.TRANSACTION_COMPLETED: 'transactions_completed',
+    ActionType.REFERRAL_SUCCESSFUL: 'referrals_successful',
+    ActionType.PROFILE_COMPLETED: 'profile_completed'
+}
+STATS_COUNTER_COLUMNS = ['msmes_registered', 'valuations_completed', 'transactions_completed', 'referrals_successful']
+
+# Leaderboards
+LEADERBOARD_RECONCILE_SECONDS = int(os.getenv("LEADERBOARD_RECONCILE_SECONDS", "3600"))
+LEADERBOARD_BUCKET_TTL = {"weekly": 15 * 86400, "monthly": 62 * 86400}  # Keep the previous bucket readable
+
 # Badge definitions
 BADGES_CONFIG = {
     BadgeType.NEWCOMER: Badge(
@@ -289,6 +317,196 @@ ACHIEVEMENTS_CONFIG = {
     ),
 }
 
+class LeaderboardEngine:
+    """Leaderboards kept in Redis sorted sets.
+    
+    all_time mirrors user_gamification_stats.total_points. weekly and monthly
+    sum the points earned in the current ISO week / calendar month, one set
+    per bucket, expiring once the bucket is well over. Each points batch
+    updates all of them in one MULTI; Postgres stays the source of truth and
+    reconcile() rebuilds the current boards from it at startup and every
+    LEADERBOARD_RECONCILE_SECONDS.
+    
+    Every batch also records each user's new total in a journal set, which
+    reconcile() uses to put back the awards that reached Redis while it was
+    reading Postgres: whatever a user's journal total exceeds their total in
+    the rebuild's snapshot by was awarded after the snapshot.
+    """
+    
+    PERIODS = ("all_time", "monthly", "weekly")
+    RECONCILE_LOCK = "leaderboard:reconcile_lock"
+    JOURNAL_KEY = "leaderboard:journal"
+    
+    # KEYS: journal, then (rebuilt, live) pairs with all_time first. ARGV: a
+    # (mode, ttl) pair per board; mode "max" keeps the larger total, "incr"
+    # adds the points awarded since the snapshot, "none" re-applies nothing.
+    # Runs as one script so no award lands between the swap and the re-apply.
+    SWAP_SCRIPT = """
+    local late = {}
+    local journal = redis.call('ZRANGE', KEYS[1], 0, -1, 'WITHSCORES')
+    for i = 1, #journal, 2 do
+        local total = tonumber(journal[i + 1])
+        local snapshot = tonumber(redis.call('ZSCORE', KEYS[2], journal[i]) or 0)
+        if total > snapshot then
+            late[journal[i]] = {total, total - snapshot}
+        end
+    end
+    for i = 2, #KEYS, 2 do
+        local mode, ttl = ARGV[i - 1], tonumber(ARGV[i])
+        if redis.call('EXISTS', KEYS[i]) == 1 then
+            redis.call('RENAME', KEYS[i], KEYS[i + 1])
+        else
+            redis.call('DEL', KEYS[i + 1])
+        end
+        for user_id, points in pairs(late) do
+            if mode == 'max' then
+                if points[1] > tonumber(redis.call('ZSCORE', KEYS[i + 1], user_id) or 0) then
+                    redis.call('ZADD', KEYS[i + 1], points[1], user_id)
+                end
+            elseif mode == 'incr' then
+                redis.call('ZINCRBY', KEYS[i + 1], points[2], user_id)
+            end
+        end
+        if ttl > 0 then
+            redis.call('EXPIRE', KEYS[i + 1], ttl)
+        end
+    end
+    return redis.call('ZCARD', KEYS[3])
+    """
+    
+    def __init__(self):
+        self.redis_client = None
+        self.db_pool = None
+        self.reconcile_task = None
+    
+    def start(self, redis_client, db_pool):
+        self.redis_client = redis_client
+        self.db_pool = db_pool
+        self.reconcile_task = asyncio.create_task(self._reconcile_periodically())
+    
+    async def stop(self):
+        if self.reconcile_task:
+            self.reconcile_task.cancel()
+    
+    @staticmethod
+    def key(period: str, when: Optional[datetime] = None) -> str:
+        """Sorted set holding a period's current bucket (unknown periods read all_time)"""
+        when = when or datetime.now()
+        if period == "weekly":
+            year, week, _ = when.isocalendar()
+            return f"leaderboard:weekly:{year}-W{week:02d}"
+        if period == "monthly":
+            return f"leaderboard:monthly:{when:%Y-%m}"
+        return "leaderboard:all_time"
+    
+    @staticmethod
+    def bucket_start(period: str, when: datetime) -> datetime:
+        midnight = when.replace(hour=0, minute=0, second=0, microsecond=0)
+        if period == "weekly":
+            return midnight - timedelta(days=midnight.weekday())
+        return midnight.replace(day=1)
+    
+    async def record_awards(self, awards: Dict[str, Tuple[int, int]]):
+        """Apply awards ({user_id: (total_points, points_awarded)}) to every board atomically"""
+        totals = {user_id: total for user_id, (total, _) in awards.items()}
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            pipe.zadd(self.key("all_time"), totals)
+            pipe.zadd(self.JOURNAL_KEY, totals, gt=True)
+            pipe.expire(self.JOURNAL_KEY, 2 * LEADERBOARD_RECONCILE_SECONDS)
+            for period, ttl in LEADERBOARD_BUCKET_TTL.items():
+                key = self.key(period)
+                for user_id, (_, points_awarded) in awards.items():
+                    pipe.zincrby(key, points_awarded, user_id)
+                pipe.expire(key, ttl)
+            await pipe.execute()
+    
+    async def rank(self, user_id: str, period: str = "all_time") -> Optional[int]:
+        """1-based position via ZREVRANK, O(log N); None if the user has no points on the board"""
+        position = await self.redis_client.zrevrank(self.key(period), user_id)
+        return None if position is None else position + 1
+    
+    async def page(self, period: str, offset: int, limit: int) -> Tuple[List[Tuple[str, float]], int]:
+        """(user_id, score) pairs for one page, best first, and the board's size"""
+        key = self.key(period)
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            pipe.zrevrange(key, offset, offset + limit - 1, withscores=True)
+            pipe.zcard(key)
+            entries, total = await pipe.execute()
+        return entries, total
+    
+    async def reconcile(self) -> Dict[str, int]:
+        """Rebuild the current boards from one Postgres snapshot and swap them in"""
+        now = datetime.now()
+        queries = {
+            "all_time": ("SELECT user_id, total_points FROM user_gamification_stats", ()),
+        }
+        for period in LEADERBOARD_BUCKET_TTL:
+            queries[period] = (
+                """
+                SELECT user_id, SUM(points) FROM points_transactions
+                WHERE created_at >= $1
+                GROUP BY user_id
+                """,
+                (self.bucket_start(period, now),)
+            )
+        
+        # Awards journaled from here on may postdate the snapshot below
+        await self.redis_client.delete(self.JOURNAL_KEY)
+        
+        sizes = {}
+        keys = [self.JOURNAL_KEY]
+        args = []
+        async with self.db_pool.acquire() as conn:
+            # Every board is read from the same snapshot as the all_time totals
+            async with conn.transaction(isolation='repeatable_read', readonly=True):
+                for period, (query, query_args) in queries.items():
+                    key = self.key(period, now)
+                    staging_key = f"{key}:rebuild"
+                    await self.redis_client.delete(staging_key)
+                    
+                    size = 0
+                    batch = {}
+                    async for user_id, points in conn.cursor(query, *query_args, prefetch=10000):
+                        batch[str(user_id)] = int(points or 0)
+                        if len(batch) >= 10000:
+                            await self.redis_client.zadd(staging_key, batch)
+                            size += len(batch)
+                            batch = {}
+                    if batch:
+                        await self.redis_client.zadd(staging_key, batch)
+                        size += len(batch)
+                    
+                    if period == "all_time":
+                        mode = "max"
+                    elif key == self.key(period):
+                        mode = "incr"
+                    else:
+                        # The bucket rolled over mid-rebuild; late awards went to the new one
+                        mode = "none"
+                    keys += [staging_key, key]
+                    args += [mode, LEADERBOARD_BUCKET_TTL.get(period, 0)]
+                    sizes[period] = size
+        
+        sizes["all_time"] = await self.redis_client.eval(self.SWAP_SCRIPT, len(keys), *keys, *args)
+        
+        logger.info(f"Leaderboards reconciled: {sizes}")
+        return sizes
+    
+    async def _reconcile_periodically(self):
+        while True:
+            try:
+                # One instance per interval does the rebuild
+                if await self.redis_client.set(self.RECONCILE_LOCK, "1", nx=True, ex=LEADERBOARD_RECONCILE_SECONDS):
+                    await self.reconcile()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Leaderboard reconciliation failed: {e}")
+            await asyncio.sleep(LEADERBOARD_RECONCILE_SECONDS)
+
+
+leaderboard = LeaderboardEngine()
+
 # Authentication dependency
 async def get_current_user(token: str = Depends(oauth2_scheme)):
     # Validate JWT token with auth service
@@ -362,202 +580,427 @@ async def check_achievement_eligibility(user_id: str, user_stats: dict) -> List[
     
     return new_achievements
 
-async def send_push_notification(user_id: str, notification: Notification):
+async def send_push_notification(user_id: str, notification: Notification, client: Optional[httpx.AsyncClient] = None):
     """Send push notification to user"""
     try:
-        async with httpx.AsyncClient() as client:
-            await client.post(
-                f"{os.getenv('NOTIFICATION_SERVICE_URL')}/api/send-push",
-                json={
-                    "user_id": user_id,
-                    "title": notification.title,
-                    "message": notification.message,
-                    "data": notification.data
-                }
-            )
+        if client is None:
+            async with httpx.AsyncClient() as own_client:
+                return await send_push_notification(user_id, notification, own_client)
+        await client.post(
+            f"{os.getenv('NOTIFICATION_SERVICE_URL')}/api/send-push",
+            json={
+                "user_id": user_id,
+                "title": notification.title,
+                "message": notification.message,
+                "data": notification.data
+            }
+        )
     except Exception as e:
         logger.error(f"Push notification error: {e}")
 
-# API Endpoints
-@app.post("/api/award-points")
-async def award_points(
-    award: PointsAward,
-    background_tasks: BackgroundTasks
-):
-    """Award points to a user for completing an action"""
-    try:
-        # Get or create user stats
-        async with app.state.db_pool.acquire() as conn:
-            user_stats = await conn.fetchrow(
-                "SELECT * FROM user_gamification_stats WHERE user_id = $1",
-                award.user_id
-            )
-            
-            if not user_stats:
-                # Create new user stats
-                await conn.execute(
-                    """
-                    INSERT INTO user_gamification_stats 
-                    (user_id, total_points, level, badges, achievements, created_at)
-                    VALUES ($1, $2, $3, $4, $5, $6)
-                    """,
-                    award.user_id, 0, 0, [], [], datetime.now()
-                )
-                user_stats = {
-                    'user_id': award.user_id,
-                    'total_points': 0,
-                    'level': 0,
-                    'badges': [],
-                    'achievements': [],
-                    'msmes_registered': 0,
-                    'valuations_completed': 0,
-                    'transactions_completed': 0,
-                    'referrals_successful': 0,
-                    'profile_completed': False
-                }
-            else:
-                user_stats = dict(user_stats)
-        
-        # Calculate points to award
-        base_points = POINTS_CONFIG.get(award.action, award.points)
-        
-        # Apply multipliers for special events or user level
-        multiplier = 1.0
-        if user_stats['level'] >= 10:
-            multiplier = 1.2  # 20% bonus for high-level users
-        
-        points_to_award = int(base_points * multiplier)
-        
-        # Update user stats
-        new_total_points = user_stats['total_points'] + points_to_award
-        old_level = user_stats['level']
-        new_level, next_level_points, progress_percentage = await calculate_level(new_total_points)
-        
-        # Update action-specific counters
-        action_field_map = {
-            ActionType.MSME_REGISTERED: 'msmes_registered',
-            ActionType.VALUATION_COMPLETED: 'valuations_completed',
-            ActionType.TRANSACTION_COMPLETED: 'transactions_completed',
-            ActionType.REFERRAL_SUCCESSFUL: 'referrals_successful',
-            ActionType.PROFILE_COMPLETED: 'profile_completed'
-        }
-        
-        updates = {
-            'total_points': new_total_points,
-            'level': new_level
-        }
-        
-        if award.action in action_field_map:
-            field = action_field_map[award.action]
-            if field == 'profile_completed':
-                updates[field] = True
-            else:
-                updates[field] = user_stats.get(field, 0) + 1
-            user_stats[field] = updates[field]
-        
-        # Check for new badges and achievements
-        user_stats['total_points'] = new_total_points
-        user_stats['level'] = new_level
-        
-        new_badges = await check_badge_eligibility(award.user_id, user_stats)
-        new_achievements = await check_achievement_eligibility(award.user_id, user_stats)
-        
-        if new_badges:
-            current_badges = user_stats.get('badges', [])
-            updates['badges'] = current_badges + new_badges
-            
-        if new_achievements:
-            current_achievements = user_stats.get('achievements', [])
-            updates['achievements'] = current_achievements + new_achievements
-        
-        # Update database
-        set_clause = ", ".join([f"{k} = ${i+2}" for i, k in enumerate(updates.keys())])
-        values = [award.user_id] + list(updates.values())
+def new_user_stats(user_id: str) -> Dict[str, Any]:
+    """Stats for a user with no user_gamification_stats row yet"""
+    return {
+        'user_id': user_id,
+        'total_points': 0,
+        'level': 0,
+        'badges': [],
+        'achievements': [],
+        'msmes_registered': 0,
+        'valuations_completed': 0,
+        'transactions_completed': 0,
+        'referrals_successful': 0,
+        'profile_completed': False
+    }
+
+async def apply_award(user_stats: Dict[str, Any], award: PointsAward) -> Tuple[Dict[str, Any], int, List[Notification]]:
+    """Apply one award to a user's stats in place; returns the response, points awarded and notifications"""
+    # Calculate points to award
+    base_points = POINTS_CONFIG.get(award.action, award.points)
+    
+    # Apply multipliers for special events or user level
+    multiplier = 1.0
+    if user_stats['level'] >= 10:
+        multiplier = 1.2  # 20% bonus for high-level users
+    
+    points_to_award = int(base_points * multiplier)
+    
+    # Update user stats
+    new_total_points = user_stats['total_points'] + points_to_award
+    old_level = user_stats['level']
+    new_level, next_level_points, progress_percentage = await calculate_level(new_total_points)
+    
+    # Update action-specific counters
+    if award.action in ACTION_FIELD_MAP:
+        field = ACTION_FIELD_MAP[award.action]
+        if field == 'profile_completed':
+            user_stats[field] = True
+        else:
+            user_stats[field] = (user_stats.get(field) or 0) + 1
+    
+    # Check for new badges and achievements
+    user_stats['total_points'] = new_total_points
+    user_stats['level'] = new_level
+    
+    new_badges = await check_badge_eligibility(award.user_id, user_stats)
+    new_achievements = await check_achievement_eligibility(award.user_id, user_stats)
+    
+    if new_badges:
+        user_stats['badges'] = list(user_stats.get('badges') or []) + new_badges
+    
+    if new_achievements:
+        user_stats['achievements'] = list(user_stats.get('achievements') or []) + new_achievements
+    
+    # Notifications for level up, badges, achievements
+    notifications = []
+    
+    if new_level > old_level:
+        notifications.append(Notification(
+            user_id=award.user_id,
+            type="level_up",
+            title="Level Up! 🎉",
+            message=f"Congratulations! You've reached level {new_level}!",
+            data={"new_level": new_level, "points_earned": points_to_award},
+            created_at=datetime.now()
+        ))
+    
+    for badge_id in new_badges:
+        badge = BADGES_CONFIG[BadgeType(badge_id)]
+        notifications.append(Notification(
+            user_id=award.user_id,
+            type="badge",
+            title="New Badge Earned! 🏆",
+            message=f"You've earned the '{badge.name}' badge!",
+            data={"badge_id": badge_id, "badge_name": badge.name},
+            created_at=datetime.now()
+        ))
+    
+    for achievement_id in new_achievements:
+        achievement = ACHIEVEMENTS_CONFIG[AchievementType(achievement_id)]
+        notifications.append(Notification(
+            user_id=award.user_id,
+            type="achievement",
+            title="Achievement Unlocked! 🌟",
+            message=f"You've unlocked the '{achievement.name}' achievement!",
+            data={"achievement_id": achievement_id, "achievement_name": achievement.name},
+            created_at=datetime.now()
+        ))
+    
+    result = {
+        "success": True,
+        "points_awarded": points_to_award,
+        "total_points": new_total_points,
+        "new_level": new_level,
+        "level_up": new_level > old_level,
+        "new_badges": new_badges,
+        "new_achievements": new_achievements,
+        "next_level_points": next_level_points,
+        "progress_percentage": progress_percentage
+    }
+    return result, points_to_award, notifications
+
+async def duplicate_award_result(user_stats: Dict[str, Any]) -> Dict[str, Any]:
+    """Response for an award whose idempotency key was already applied"""
+    level, next_level_points, progress_percentage = await calculate_level(user_stats['total_points'])
+    return {
+        "success": True,
+        "duplicate": True,
+        "points_awarded": 0,
+        "total_points": user_stats['total_points'],
+        "new_level": level,
+        "level_up": False,
+        "new_badges": [],
+        "new_achievements": [],
+        "next_level_points": next_level_points,
+        "progress_percentage": progress_percentage
+    }
+
+class PointsIngestor:
+    """Batched, idempotent points ingestion.
+    
+    Award endpoints queue their events here and wait for the result. A single
+    worker takes whatever is queued (after POINTS_BATCH_WAIT_MS for a burst
+    to gather, up to POINTS_BATCH_SIZE) and applies it in one transaction:
+    the batch's users are locked with advisory locks, idempotency keys are
+    checked against points_transactions, events are folded into each user's
+    stats in memory, and the stats go back in one UPDATE ... RETURNING with
+    one ledger insert. Caches, leaderboards and push notifications are then
+    updated once per batch. If the batch transaction fails, its awards are
+    retried one transaction each, so only the bad award's caller sees an error.
+    """
+    
+    def __init__(self):
+        self.db_pool = None
+        self.redis_client = None
+        self.http_client = None
+        self.queue = None
+        self.worker_task = None
+        self.notification_tasks = set()
+    
+    def start(self, db_pool, redis_client):
+        self.db_pool = db_pool
+        self.redis_client = redis_client
+        self.http_client = httpx.AsyncClient(timeout=10)
+        self.queue = asyncio.Queue(maxsize=POINTS_QUEUE_SIZE)
+        self.worker_task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=10)
+        except asyncio.TimeoutError:
+            logger.error(f"Stopping with {self.queue.qsize()} points events unprocessed")
+        if self.worker_task:
+            self.worker_task.cancel()
+        await self.http_client.aclose()
+    
+    async def submit(self, awards: List[PointsAward]) -> List[Any]:
+        """Queue awards and wait for their results, in order.
         
-        async with app.state.db_pool.acquire() as conn:
-            await conn.execute(
-                f"UPDATE user_gamification_stats SET {set_clause}, updated_at = $1 WHERE user_id = $2",
-                datetime.now(), *values[1:], award.user_id
-            )
+        A failed award comes back as its exception instead of a result, so
+        one bad event doesn't hide the outcome of the others.
+        """
+        loop = asyncio.get_running_loop()
+        futures = []
+        for award in awards:
+            future = loop.create_future()
+            await self.queue.put((award, future))
+            futures.append(future)
+        return await asyncio.gather(*futures, return_exceptions=True)
+    
+    async def _run(self):
+        while True:
+            batch = [await self.queue.get()]
+            if self.queue.qsize() < POINTS_BATCH_SIZE - 1:
+                await asyncio.sleep(POINTS_BATCH_WAIT_MS / 1000)
+            while len(batch) < POINTS_BATCH_SIZE and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
             
-            # Log the points transaction
-            await conn.execute(
-                """
-                INSERT INTO points_transactions 
-                (user_id, action, points, service, metadata, created_at)
-                VALUES ($1, $2, $3, $4, $5, $6)
-                """,
-                award.user_id, award.action.value, points_to_award, 
-                award.service, json.dumps(award.metadata), datetime.now()
-            )
-        
-        # Cache updated stats
-        await app.state.redis.setex(
-            f"user_stats:{award.user_id}",
-            3600,
-            json.dumps({**user_stats, **updates})
-        )
-        
-        # Send notifications for level up, badges, achievements
+            try:
+                results = await self.apply_batch([award for award, _ in batch])
+            except Exception as e:
+                if len(batch) == 1:
+                    logger.error(f"Points award for {batch[0][0].user_id} failed: {e}")
+                    results = [e]
+                else:
+                    # The whole transaction rolled back; apply each award on its
+                    # own so one bad event only fails its own caller
+                    logger.warning(f"Points batch of {len(batch)} events failed, retrying one by one: {e}")
+                    results = [await self._apply_one(award) for award, _ in batch]
+            try:
+                for (_, future), result in zip(batch, results):
+                    if future.done():
+                        continue
+                    if isinstance(result, Exception):
+                        future.set_exception(result)
+                    else:
+                        future.set_result(result)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+    
+    async def _apply_one(self, award: PointsAward):
+        """Apply a single award; returns its result or the exception it raised"""
+        try:
+            (result,) = await self.apply_batch([award])
+            return result
+        except Exception as e:
+            logger.error(f"Points award for {award.user_id} failed: {e}")
+            return e
+    
+    async def apply_batch(self, awards: List[PointsAward]) -> List[Dict[str, Any]]:
+        """Apply awards atomically; returns one result per award, in order"""
+        user_ids = sorted({award.user_id for award in awards})
+        keys = [award.idempotency_key for award in awards if award.idempotency_key]
+        results: List[Optional[Dict[str, Any]]] = [None] * len(awards)
+        applied: List[PointsAward] = []
+        ledger = []
         notifications = []
+        awarded: Dict[str, int] = {}  # user_id -> points awarded in this batch
+        now = datetime.now()
         
-        if new_level > old_level:
-            notifications.append(Notification(
-                user_id=award.user_id,
-                type="level_up",
-                title="Level Up! 🎉",
-                message=f"Congratulations! You've reached level {new_level}!",
-                data={"new_level": new_level, "points_earned": points_to_award},
-                created_at=datetime.now()
-            ))
+        async with self.db_pool.acquire() as conn:
+            async with conn.transaction():
+                # Serializes batches touching the same users, including users
+                # without a row yet; taken in sorted order so they cannot deadlock
+                await conn.execute(
+                    "SELECT pg_advisory_xact_lock(hashtext(user_id)) FROM unnest($1::text[]) AS user_id",
+                    user_ids
+                )
+                
+                seen_keys = set()
+                if keys:
+                    seen_keys = {
+                        row['idempotency_key'] for row in await conn.fetch(
+                            "SELECT idempotency_key FROM points_transactions WHERE idempotency_key = ANY($1::text[])",
+                            keys
+                        )
+                    }
+                
+                rows = await conn.fetch(
+                    "SELECT * FROM user_gamification_stats WHERE user_id = ANY($1::text[])",
+                    user_ids
+                )
+                stats = {row['user_id']: dict(row) for row in rows}
+                
+                new_users = [user_id for user_id in user_ids if user_id not in stats]
+                if new_users:
+                    await conn.executemany(
+                        """
+                        INSERT INTO user_gamification_stats 
+                        (user_id, total_points, level, badges, achievements, created_at)
+                        VALUES ($1, $2, $3, $4, $5, $6)
+                        """,
+                        [(user_id, 0, 0, [], [], now) for user_id in new_users]
+                    )
+                    stats.update({user_id: new_user_stats(user_id) for user_id in new_users})
+                
+                for i, award in enumerate(awards):
+                    user_stats = stats[award.user_id]
+                    if award.idempotency_key in seen_keys:
+                        results[i] = await duplicate_award_result(user_stats)
+                        continue
+                    if award.idempotency_key:
+                        seen_keys.add(award.idempotency_key)
+                    
+                    results[i], points, award_notifications = await apply_award(user_stats, award)
+                    applied.append(award)
+                    awarded[award.user_id] = awarded.get(award.user_id, 0) + points
+                    notifications.extend(award_notifications)
+                    ledger.append((
+                        award.user_id, award.action.value, points, award.service,
+                        json.dumps(award.metadata), award.idempotency_key, now
+                    ))
+                
+                if awarded:
+                    changed = [stats[user_id] for user_id in awarded]
+                    updated = await conn.fetch(
+                        """
+                        UPDATE user_gamification_stats AS s SET
+                            total_points = v.total_points,
+                            level = v.level,
+                            badges = ARRAY(SELECT jsonb_array_elements_text(v.badges)),
+                            achievements = ARRAY(SELECT jsonb_array_elements_text(v.achievements)),
+                            msmes_registered = v.msmes_registered,
+                            valuations_completed = v.valuations_completed,
+                            transactions_completed = v.transactions_completed,
+                            referrals_successful = v.referrals_successful,
+                            profile_completed = v.profile_completed,
+                            updated_at = $11
+                        FROM unnest(
+                            $1::text[], $2::int[], $3::int[], $4::jsonb[], $5::jsonb[],
+                            $6::int[], $7::int[], $8::int[], $9::int[], $10::bool[]
+                        ) AS v(user_id, total_points, level, badges, achievements, msmes_registered,
+                               valuations_completed, transactions_completed, referrals_successful,
+                               profile_completed)
+                        WHERE s.user_id = v.user_id
+                        RETURNING s.user_id
+                        """,
+                        [s['user_id'] for s in changed],
+                        [s['total_points'] for s in changed],
+                        [s['level'] for s in changed],
+                        [json.dumps(list(s.get('badges') or [])) for s in changed],
+                        [json.dumps(list(s.get('achievements') or [])) for s in changed],
+                        *([s.get(column) for s in changed] for column in STATS_COUNTER_COLUMNS),
+                        [s.get('profile_completed') for s in changed],
+                        now
+                    )
+                    if len(updated) != len(changed):
+                        raise RuntimeError("user_gamification_stats rows changed during the batch")
+                    
+                    # Log the points transactions
+                    await conn.executemany(
+                        """
+                        INSERT INTO points_transactions 
+                        (user_id, action, points, service, metadata, idempotency_key, created_at)
+                        VALUES ($1, $2, $3, $4, $5, $6, $7)
+                        """,
+                        ledger
+                    )
         
-        for badge_id in new_badges:
-            badge = BADGES_CONFIG[BadgeType(badge_id)]
-            notifications.append(Notification(
-                user_id=award.user_id,
-                type="badge",
-                title="New Badge Earned! 🏆",
-                message=f"You've earned the '{badge.name}' badge!",
-                data={"badge_id": badge_id, "badge_name": badge.name},
-                created_at=datetime.now()
-            ))
-            BADGES_EARNED.labels(badge_type=badge_id).inc()
+        if awarded:
+            await self._publish(stats, awarded, applied, notifications)
         
-        for achievement_id in new_achievements:
-            achievement = ACHIEVEMENTS_CONFIG[AchievementType(achievement_id)]
-            notifications.append(Notification(
-                user_id=award.user_id,
-                type="achievement",
-                title="Achievement Unlocked! 🌟",
-                message=f"You've unlocked the '{achievement.name}' achievement!",
-                data={"achievement_id": achievement_id, "achievement_name": achievement.name},
-                created_at=datetime.now()
-            ))
-            ACHIEVEMENTS_UNLOCKED.inc()
+        return results
+    
+    async def _publish(
+        self,
+        stats: Dict[str, Dict[str, Any]],
+        awarded: Dict[str, int],
+        applied: List[PointsAward],
+        notifications: List[Notification]
+    ):
+        """Post-commit side effects; failures are logged, the points are already stored"""
+        try:
+            # Cache updated stats
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for user_id in awarded:
+                    pipe.setex(f"user_stats:{user_id}", 3600, json.dumps(stats[user_id], default=str))
+                await pipe.execute()
+            
+            await leaderboard.record_awards({
+                user_id: (stats[user_id]['total_points'], points) for user_id, points in awarded.items()
+            })
+        except Exception as e:
+            # The next leaderboard reconciliation puts the boards right
+            logger.error(f"Stats cache / leaderboard update error: {e}")
         
-        # Send push notifications
+        # Update metrics
+        for award in applied:
+            POINTS_AWARDED.labels(action=award.action.value, service=award.service).inc()
         for notification in notifications:
-            background_tasks.add_task(send_push_notification, award.user_id, notification)
+            if notification.type == "badge":
+                BADGES_EARNED.labels(badge_type=notification.data["badge_id"]).inc()
+            elif notification.type == "achievement":
+                ACHIEVEMENTS_UNLOCKED.inc()
         
-        # Update metrics
-        POINTS_AWARDED.labels(action=award.action.value, service=award.service).inc()
+        if notifications:
+            task = asyncio.create_task(self.send_notifications(notifications))
+            self.notification_tasks.add(task)
+            task.add_done_callback(self.notification_tasks.discard)
+    
+    async def send_notifications(self, notifications: List[Notification]):
+        """Send a batch's push notifications concurrently over the shared client"""
+        semaphore = asyncio.Semaphore(POINTS_NOTIFICATION_CONCURRENCY)
         
-        return {
-            "success": True,
-            "points_awarded": points_to_award,
-            "total_points": new_total_points,
-            "new_level": new_level,
-            "level_up": new_level > old_level,
-            "new_badges": new_badges,
-            "new_achievements": new_achievements,
-            "next_level_points": next_level_points,
-            "progress_percentage": progress_percentage
-        }
+        async def send(notification: Notification):
+            async with semaphore:
+                await send_push_notification(notification.user_id, notification, self.http_client)
         
+        await asyncio.gather(*(send(notification) for notification in notifications))
+
+
+points_ingestor = PointsIngestor()
+
+# API Endpoints
+@app.post("/api/award-points")
+async def award_points(award: PointsAward):
+    """Award points to a user for completing an action"""
+    try:
+        (result,) = await points_ingestor.submit([award])
+        if isinstance(result, Exception):
+            raise result
+        return result
     except Exception as e:
         logger.error(f"Points award error: {e}")
         raise HTTPException(status_code=500, detail="Failed to award points")
 
+@app.post("/api/award-points/bulk")
+async def award_points_bulk(bulk: BulkPointsAward):
+    """Award points for many events at once; results are in request order"""
+    try:
+        results = await points_ingestor.submit(bulk.awards)
+        return {
+            "success": all(not isinstance(result, Exception) for result in results),
+            "results": [
+                {"success": False, "error": "Failed to award points"}
+                if isinstance(result, Exception) else result
+                for result in results
+            ]
+        }
+    except Exception as e:
+        logger.error(f"Bulk points award error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to award points")
+
 @app.get("/api/user/{user_id}/stats", response_model=UserStats)
 async def get_user_stats(
     user_id: str,
@@ -602,16 +1045,7 @@ async def get_user_stats(
         level, next_level_points, progress_percentage = await calculate_level(stats_data['total_points'])
         
         # Get user's rank
-        async with app.state.db_pool.acquire() as conn:
-            rank_result = await conn.fetchval(
-                """
-                SELECT rank FROM (
-                    SELECT user_id, RANK() OVER (ORDER BY total_points DESC) as rank
-                    FROM user_gamification_stats
-                ) ranked WHERE user_id = $1
-                """,
-                user_id
-            )
+        rank_result = await leaderboard.rank(user_id)
         
         return UserStats(
             user_id=user_id,
@@ -630,65 +1064,53 @@ async def get_user_stats(
 
 @app.get("/api/leaderboard")
 async def get_leaderboard(
-    limit: int = 50,
-    offset: int = 0,
+    limit: int = Query(50, ge=1, le=100),
+    offset: int = Query(0, ge=0),
     period: str = "all_time",  # all_time, monthly, weekly
     current_user: dict = Depends(get_current_user)
 ):
     """Get platform leaderboard"""
     try:
-        cache_key = f"leaderboard:{period}:{limit}:{offset}"
-        cached_leaderboard = await app.state.redis.get(cache_key)
-        
-        if cached_leaderboard:
-            return json.loads(cached_leaderboard)
-        
-        # Build query based on period
-        time_filter = ""
-        if period == "monthly":
-            time_filter = "WHERE ugs.updated_at >= NOW() - INTERVAL '30 days'"
-        elif period == "weekly":
-            time_filter = "WHERE ugs.updated_at >= NOW() - INTERVAL '7 days'"
+        # Ranks and scores come from the sorted set; Postgres only fills in
+        # the details for the users on this page
+        entries, total_users = await leaderboard.page(period, offset, limit)
         
         async with app.state.db_pool.acquire() as conn:
-            leaderboard_data = await conn.fetch(
-                f"""
+            details = await conn.fetch(
+                """
                 SELECT 
                     ugs.user_id,
                     u.username,
-                    ugs.total_points,
                     ugs.level,
-                    array_length(ugs.badges, 1) as badges_count,
-                    RANK() OVER (ORDER BY ugs.total_points DESC) as rank
+                    array_length(ugs.badges, 1) as badges_count
                 FROM user_gamification_stats ugs
                 JOIN users u ON ugs.user_id = u.id
-                {time_filter}
-                ORDER BY ugs.total_points DESC
-                LIMIT $1 OFFSET $2
+                WHERE ugs.user_id = ANY($1)
                 """,
-                limit, offset
+                [user_id for user_id, _ in entries]
             )
+        details_by_user = {str(row['user_id']): row for row in details}
         
-        leaderboard = [
-            LeaderboardEntry(
-                user_id=row['user_id'],
+        entries_out = []
+        for position, (user_id, score) in enumerate(entries):
+            row = details_by_user.get(user_id)
+            if row is None:
+                continue  # Removed since the last reconciliation
+            entries_out.append(LeaderboardEntry(
+                user_id=user_id,
                 username=row['username'],
-                total_points=row['total_points'],
+                total_points=int(score),
                 level=row['level'],
                 badges_count=row['badges_count'] or 0,
-                rank=row['rank']
-            ).model_dump() for row in leaderboard_data
-        ]
+                rank=offset + position + 1
+            ).model_dump())
         
         result = {
-            "leaderboard": leaderboard,
+            "leaderboard": entries_out,
             "period": period,
-            "total_users": len(leaderboard_data)
+            "total_users": total_users
         }
         
-        # Cache for 10 minutes
-        await app.state.redis.setex(cache_key, 600, json.dumps(result))
-        
         LEADERBOARD_REQUESTS.inc()
         
         return result
@@ -697,6 +1119,19 @@ async def get_leaderboard(
         logger.error(f"Leaderboard retrieval error: {e}")
         raise HTTPException(status_code=500, detail="Failed to get leaderboard")
 
+@app.post("/api/leaderboard/rebuild")
+async def rebuild_leaderboard(current_user: dict = Depends(get_current_user)):
+    """Rebuild the leaderboards from Postgres now (admin only)"""
+    if current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can rebuild leaderboards")
+    
+    try:
+        sizes = await leaderboard.reconcile()
+        return {"success": True, "entries": sizes}
+    except Exception as e:
+        logger.error(f"Leaderboard rebuild error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to rebuild leaderboard")
+
 @app.get("/api/badges")
 async def get_all_badges():
     """Get all available badges"""
@@ -9,9 +9,16 @@ Features:
 - Real-time user feedback integration
 - Cold start problem handling
 - Performance optimization with caching
+- Versioned on-disk model snapshots for fast, memory-mapped warm starts
+- Precomputed ALS top-K recommendations for every known user, served from Redis
 """
 
 import asyncio
+import copy
+import fcntl
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import pandas as pd
 from typing import List, Dict, Optional, Tuple, Any
@@ -22,7 +29,7 @@ from sklearn.neighbors import NearestNeighbors
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.decomposition import TruncatedSVD
-from sklearn.preprocessing import StandardScaler, MinMaxScaler
+from sklearn.preprocessing import StandardScaler, MinMaxScaler, normalize
 from scipy.sparse import csr_matrix
 from scipy.spatial.distance import cosine
 import implicit
@@ -63,6 +70,8 @@ class RecommendationRequest(BaseModel):
     limit: int = Field(10, ge=1, le=50)
     filters: Dict = {}
     context: Dict = {}  # Current session context
+    diversity_weight: Optional[float] = Field(None, ge=0.0, le=1.0)  # Hybrid re-ranking overrides
+    novelty_weight: Optional[float] = Field(None, ge=0.0, le=1.0)
 
 class RecommendationItem(BaseModel):
     item_id: int
@@ -94,7 +103,23 @@ class UserFeedback(BaseModel):
     session_id: Optional[str] = None
     context: Dict = {}
 
+def top_n_indices(scores: np.ndarray, n: int) -> np.ndarray:
+    """Indices of the n highest positive scores, best first"""
+    candidates = np.flatnonzero(scores > 0)
+    if len(candidates) > n:
+        candidates = candidates[np.argpartition(-scores[candidates], n - 1)[:n]]
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
 class RecommendationEngine:
+    # Attributes a retrain produces, swapped in together by publish()
+    MODEL_STATE = (
+        'interactions_df', 'pending_interactions_df', 'user_item_matrix', 'user_ids', 'item_ids',
+        'user_knn_model', 'item_knn_model', 'als_model', 'als_user_ids', 'als_item_ids',
+        'item_popularity', 'content_df', 'content_vectorizer', 'feature_scaler',
+        'item_content_matrix', 'content_item_ids', 'neighbor_indices', 'neighbor_scores',
+        'last_full_retrain', 'interaction_watermark', 'watermark_keys',
+    )
+    
     def __init__(self):
         self.redis_client = redis.Redis(host='localhost', port=6379, db=0, decode_responses=True)
         self.db_pool = None
@@ -107,7 +132,9 @@ class RecommendationEngine:
         self.content_features = None
         
         # Data matrices
-        self.user_item_matrix = None
+        self.user_item_matrix = None  # CSR users x items, rows/cols follow user_ids/item_ids
+        self.user_ids = pd.Index([], dtype='int64')
+        self.item_ids = pd.Index([], dtype='int64')
         self.item_content_matrix = None
         self.user_profiles = {}
         self.item_profiles = {}
@@ -121,10 +148,55 @@ class RecommendationEngine:
         self.cache_ttl = 3600  # 1 hour
         self.diversity_weight = 0.3
         self.novelty_weight = 0.2
+        self.max_diversity_bonus = 0.2
+        self.max_novelty_bonus = 0.15
+        self.item_popularity = np.zeros(0, dtype=np.int64)  # Interaction count per item_ids position
         
         # Cold start thresholds
         self.new_user_threshold = 3  # interactions
         self.new_item_threshold = 5  # interactions
+        
+        # Incremental retraining state
+        self.interactions_df = pd.DataFrame()
+        self.pending_interactions_df = pd.DataFrame()  # Rows whose user or item is below min_interactions
+        self.interaction_watermark: Optional[datetime] = None
+        self.watermark_keys: set = set()  # row_keys of the rows already seen at the watermark
+        self.watermark_cache_key = "recommendation:interaction_watermark"
+        self.last_full_retrain: Optional[datetime] = None
+        self.full_retrain_interval = timedelta(hours=24)
+        self.incremental_als_iterations = 3
+        self.als_user_ids = None  # Id order the ALS factors were trained on
+        self.als_item_ids = None
+        
+        # Content neighbour index: row i holds item i's top-K most similar content rows
+        self.content_df = pd.DataFrame()
+        self.content_item_ids = pd.Index([], dtype='int64')
+        self.neighbor_k = 50
+        self.neighbor_indices = None  # int32 (items x K)
+        self.neighbor_scores = None  # float32 (items x K)
+        
+        # Model snapshots
+        self.snapshot_dir = os.getenv("RECOMMENDATION_SNAPSHOT_DIR", "models/snapshots")
+        self.snapshot_format_version = 1
+        self.snapshots_to_keep = 3
+        self.snapshot_version: Optional[str] = None
+        self.refresh_on_startup = os.getenv("RECOMMENDATION_REFRESH_ON_STARTUP", "true").lower() == "true"
+        self.training_lock = asyncio.Lock()
+        
+        # One worker process per snapshot directory (the holder of its lock
+        # file) trains and writes snapshots; the others only load them
+        self.is_leader = False
+        self.leader_lock_file = None
+        self.snapshot_poll_seconds = float(os.getenv("RECOMMENDATION_SNAPSHOT_POLL_SECONDS", "30"))
+        self.background_tasks = set()
+        
+        # Precomputed ALS recommendations: one Redis sorted set of item_id -> score per user
+        self.precomputed_k = int(os.getenv("RECOMMENDATION_PRECOMPUTED_K", "100"))
+        self.precomputed_key_prefix = "recommendations:als"
+        self.precomputed_ttl = int(self.full_retrain_interval.total_seconds() * 2)
+        self.precompute_block_size = 2048  # users per factor product
+        self.precompute_workers = os.cpu_count() or 1
+        self.precomputed_at: Optional[datetime] = None
 
     async def initialize(self):
         """Initialize database connection and load data"""
@@ -139,119 +211,298 @@ class RecommendationEngine:
                 max_size=20
             )
             
-            # Load data and train models
-            await self.load_interaction_data()
-            await self.load_content_data()
-            await self.train_models()
+            # Serve from the latest snapshot. The leader trains in the background;
+            # with no snapshot, requests get cold-start recommendations until the
+            # first models are published. Other workers pick up its snapshots.
+            self.is_leader = self.acquire_leadership()
+            loaded = self.load_snapshot()
+            if not self.is_leader:
+                self.spawn(self.follow_snapshots())
+            elif not loaded:
+                self.spawn(self.retrain_models_background(full=True))
+            elif self.refresh_on_startup:
+                self.spawn(self.retrain_models_background())
             
             logger.info("Recommendation engine initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize recommendation engine: {e}")
             raise
 
+    def spawn(self, coro) -> asyncio.Task:
+        """Run a background coroutine, keeping a reference so it can't be collected mid-run"""
+        task = asyncio.create_task(coro)
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+        return task
+
+    def acquire_leadership(self) -> bool:
+        """Try to take the snapshot directory's leader lock (held until the process exits)"""
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        lock_file = open(os.path.join(self.snapshot_dir, "LEADER.lock"), "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self.leader_lock_file = lock_file
+        return True
+
+    async def follow_snapshots(self):
+        """Load each snapshot the leader writes; take over training if the leader goes away"""
+        while True:
+            await asyncio.sleep(self.snapshot_poll_seconds)
+            if self.acquire_leadership():
+                self.is_leader = True
+                logger.info("Took over as snapshot leader")
+                await self.retrain_models_background(full=self.als_model is None)
+                return
+            
+            try:
+                version = self.current_snapshot_version()
+                if version and version != self.snapshot_version:
+                    staged = self.staging_copy()
+                    if await asyncio.to_thread(staged.load_snapshot):
+                        self.publish(staged)
+                        self.snapshot_version = staged.snapshot_version
+            except Exception as e:
+                logger.error(f"Failed to follow model snapshots: {e}")
+
+    def build_interaction_query(self, incremental: bool = False) -> str:
+        """Build the interaction query, optionally restricted to rows at or after $1
+        
+        The incremental bound is inclusive because rows committed later can
+        share the watermark's created_at; the ones already folded in are
+        recognised by their row_key and dropped by load_interaction_delta.
+        """
+        since = "AND {column} >= $1" if incremental else ""
+        return f"""
+            SELECT 
+                COALESCE(t.buyer_id, t.investor_id) as user_id,
+                t.msme_id as item_id,
+                'msme' as item_type,
+                CASE 
+                    WHEN t.status IN ('completed', 'delivered') THEN 5.0
+                    WHEN t.status IN ('in_progress', 'approved') THEN 4.0
+                    WHEN t.status IN ('negotiating', 'under_review') THEN 3.0
+                    ELSE 2.0
+                END as rating,
+                t.amount,
+                t.created_at,
+                t.satisfaction_rating,
+                't:' || t.id as row_key
+            FROM transactions t
+            WHERE t.created_at >= NOW() - INTERVAL '2 years'
+            AND (t.buyer_id IS NOT NULL OR t.investor_id IS NOT NULL)
+            {since.format(column='t.created_at')}
+            
+            UNION ALL
+            
+            SELECT 
+                mi.user_id,
+                mi.matched_entity_id as item_id,
+                mi.matched_entity_type as item_type,
+                CASE mi.interaction_type
+                    WHEN 'purchase' THEN 5.0
+                    WHEN 'contact' THEN 4.0
+                    WHEN 'save' THEN 3.0
+                    WHEN 'click' THEN 2.0
+                    WHEN 'view' THEN 1.0
+                    ELSE 1.0
+                END as rating,
+                NULL as amount,
+                mi.created_at,
+                NULL as satisfaction_rating,
+                'mi:' || mi.id as row_key
+            FROM match_interactions mi
+            WHERE mi.created_at >= NOW() - INTERVAL '6 months'
+            {since.format(column='mi.created_at')}
+            
+            UNION ALL
+            
+            SELECT 
+                uf.user_id,
+                uf.item_id,
+                uf.item_type,
+                COALESCE(uf.explicit_rating, uf.implicit_score * 5) as rating,
+                NULL as amount,
+                uf.created_at,
+                uf.explicit_rating as satisfaction_rating,
+                'uf:' || uf.id as row_key
+            FROM user_feedback uf
+            WHERE uf.created_at >= NOW() - INTERVAL '1 year'
+            {since.format(column='uf.created_at')}
+        """
+
+    def interactions_to_frame(self, interactions) -> pd.DataFrame:
+        """Convert interaction rows to a DataFrame"""
+        return pd.DataFrame([
+            {
+                'user_id': row['user_id'],
+                'item_id': row['item_id'],
+                'item_type': row['item_type'],
+                'rating': float(row['rating']),
+                'amount': float(row['amount']) if row['amount'] else 0,
+                'timestamp': row['created_at'],
+                'row_key': row['row_key']
+            }
+            for row in interactions if row['user_id'] and row['item_id']
+        ], columns=['user_id', 'item_id', 'item_type', 'rating', 'amount', 'timestamp', 'row_key'])
+
+    def update_watermark(self, interactions_df: pd.DataFrame):
+        """Advance and persist the newest interaction timestamp seen, and the rows seen at it"""
+        if interactions_df.empty:
+            return
+        
+        newest = interactions_df['timestamp'].max()
+        latest = newest.to_pydatetime() if isinstance(newest, pd.Timestamp) else newest
+        keys = set(interactions_df.loc[interactions_df['timestamp'] == newest, 'row_key'])
+        
+        if self.interaction_watermark is None or latest > self.interaction_watermark:
+            self.interaction_watermark = latest
+            self.watermark_keys = keys
+        elif latest == self.interaction_watermark:
+            self.watermark_keys = self.watermark_keys | keys
+        else:
+            return
+        
+        try:
+            self.redis_client.set(self.watermark_cache_key, json.dumps({
+                'at': latest.isoformat(),
+                'keys': sorted(self.watermark_keys)
+            }))
+        except Exception as e:
+            logger.warning(f"Failed to persist interaction watermark: {e}")
+
+    def restore_watermark(self):
+        """Load the persisted interaction watermark, if any"""
+        try:
+            value = self.redis_client.get(self.watermark_cache_key)
+            if value:
+                watermark = json.loads(value)
+                self.interaction_watermark = datetime.fromisoformat(watermark['at'])
+                self.watermark_keys = set(watermark['keys'])
+        except Exception as e:
+            logger.warning(f"Failed to restore interaction watermark: {e}")
+
     async def load_interaction_data(self):
         """Load user-item interaction data"""
         try:
             async with self.db_pool.acquire() as conn:
-                # Load transaction data
-                interaction_query = """
-                    SELECT 
-                        COALESCE(t.buyer_id, t.investor_id) as user_id,
-                        t.msme_id as item_id,
-                        'msme' as item_type,
-                        CASE 
-                            WHEN t.status IN ('completed', 'delivered') THEN 5.0
-                            WHEN t.status IN ('in_progress', 'approved') THEN 4.0
-                            WHEN t.status IN ('negotiating', 'under_review') THEN 3.0
-                            ELSE 2.0
-                        END as rating,
-                        t.amount,
-                        t.created_at,
-                        t.satisfaction_rating
-                    FROM transactions t
-                    WHERE t.created_at >= NOW() - INTERVAL '2 years'
-                    AND (t.buyer_id IS NOT NULL OR t.investor_id IS NOT NULL)
-                    
-                    UNION ALL
-                    
-                    SELECT 
-                        mi.user_id,
-                        mi.matched_entity_id as item_id,
-                        mi.matched_entity_type as item_type,
-                        CASE mi.interaction_type
-                            WHEN 'purchase' THEN 5.0
-                            WHEN 'contact' THEN 4.0
-                            WHEN 'save' THEN 3.0
-                            WHEN 'click' THEN 2.0
-                            WHEN 'view' THEN 1.0
-                            ELSE 1.0
-                        END as rating,
-                        NULL as amount,
-                        mi.created_at,
-                        NULL as satisfaction_rating
-                    FROM match_interactions mi
-                    WHERE mi.created_at >= NOW() - INTERVAL '6 months'
-                    
-                    UNION ALL
-                    
-                    SELECT 
-                        uf.user_id,
-                        uf.item_id,
-                        uf.item_type,
-                        COALESCE(uf.explicit_rating, uf.implicit_score * 5) as rating,
-                        NULL as amount,
-                        uf.created_at,
-                        uf.explicit_rating as satisfaction_rating
-                    FROM user_feedback uf
-                    WHERE uf.created_at >= NOW() - INTERVAL '1 year'
-                """
-                
-                interactions = await conn.fetch(interaction_query)
-                
-                # Convert to DataFrame
-                self.interactions_df = pd.DataFrame([
-                    {
-                        'user_id': row['user_id'],
-                        'item_id': row['item_id'],
-                        'item_type': row['item_type'],
-                        'rating': float(row['rating']),
-                        'amount': float(row['amount']) if row['amount'] else 0,
-                        'timestamp': row['created_at']
-                    }
-                    for row in interactions if row['user_id'] and row['item_id']
-                ])
-                
-                if not self.interactions_df.empty:
-                    # Filter users and items with minimum interactions
-                    user_counts = self.interactions_df['user_id'].value_counts()
-                    item_counts = self.interactions_df['item_id'].value_counts()
-                    
-                    valid_users = user_counts[user_counts >= self.min_interactions].index
-                    valid_items = item_counts[item_counts >= self.min_interactions].index
-                    
-                    self.interactions_df = self.interactions_df[
-                        (self.interactions_df['user_id'].isin(valid_users)) &
-                        (self.interactions_df['item_id'].isin(valid_items))
-                    ]
-                    
-                    # Create user-item matrix
-                    self.user_item_matrix = self.interactions_df.pivot_table(
-                        index='user_id',
-                        columns='item_id',
-                        values='rating',
-                        fill_value=0
-                    )
-                    
-                    logger.info(f"Loaded {len(self.interactions_df)} interactions for {len(valid_users)} users and {len(valid_items)} items")
-                else:
-                    logger.warning("No interaction data found")
-                    self.interactions_df = pd.DataFrame()
-                    self.user_item_matrix = pd.DataFrame()
+                interactions = await conn.fetch(self.build_interaction_query())
+            
+            await asyncio.to_thread(self.prepare_interaction_data, interactions)
                     
         except Exception as e:
             logger.error(f"Failed to load interaction data: {e}")
             raise
 
+    def prepare_interaction_data(self, interactions):
+        """Filter loaded interactions and build the user-item matrix from them"""
+        # Convert to DataFrame
+        self.interactions_df = self.interactions_to_frame(interactions)
+        self.interaction_watermark = None
+        self.update_watermark(self.interactions_df)
+        
+        if not self.interactions_df.empty:
+            # Filter users and items with minimum interactions
+            user_counts = self.interactions_df['user_id'].value_counts()
+            item_counts = self.interactions_df['item_id'].value_counts()
+            
+            valid_users = user_counts[user_counts >= self.min_interactions].index
+            valid_items = item_counts[item_counts >= self.min_interactions].index
+            
+            admitted = (
+                self.interactions_df['user_id'].isin(valid_users) &
+                self.interactions_df['item_id'].isin(valid_items)
+            )
+            # Kept so later deltas can push these users and items over the threshold
+            self.pending_interactions_df = self.interactions_df[~admitted]
+            self.interactions_df = self.interactions_df[admitted]
+            
+            # Create sparse user-item matrix (mean rating per pair)
+            ratings = self.interactions_df.groupby(['user_id', 'item_id'])['rating'].mean()
+            self.build_user_item_matrix(ratings)
+            
+            logger.info(f"Loaded {len(self.interactions_df)} interactions for {len(valid_users)} users and {len(valid_items)} items")
+        else:
+            logger.warning("No interaction data found")
+            self.interactions_df = pd.DataFrame()
+            self.pending_interactions_df = pd.DataFrame()
+            self.build_user_item_matrix(pd.Series(dtype=float))
+
+    async def load_interaction_delta(self) -> pd.DataFrame:
+        """Load interactions newer than the persisted watermark (or at it but not yet seen)"""
+        if self.interaction_watermark is None:
+            self.restore_watermark()
+        if self.interaction_watermark is None:
+            return pd.DataFrame()
+        
+        async with self.db_pool.acquire() as conn:
+            interactions = await conn.fetch(
+                self.build_interaction_query(incremental=True),
+                self.interaction_watermark
+            )
+        
+        delta_df = self.interactions_to_frame(interactions)
+        seen = (delta_df['timestamp'] == self.interaction_watermark) & delta_df['row_key'].isin(self.watermark_keys)
+        return delta_df[~seen].reset_index(drop=True)
+
+    def fold_interactions(self, delta_df: pd.DataFrame) -> int:
+        """Fold new interactions into the user-item matrix without reloading history.
+        
+        Returns the number of interactions that were applied.
+        """
+        if delta_df.empty:
+            return 0
+        
+        # Apply the minimum-interaction filter to pending rows plus the delta,
+        # counting over every row seen so far; rows still below it stay pending
+        candidates = pd.concat([self.pending_interactions_df, delta_df], ignore_index=True)
+        combined = pd.concat([self.interactions_df, candidates], ignore_index=True)
+        user_counts = combined['user_id'].value_counts()
+        item_counts = combined['item_id'].value_counts()
+        admitted = (
+            candidates['user_id'].isin(user_counts[user_counts >= self.min_interactions].index) &
+            candidates['item_id'].isin(item_counts[item_counts >= self.min_interactions].index)
+        )
+        self.pending_interactions_df = candidates[~admitted].reset_index(drop=True)
+        delta_df = candidates[admitted]
+        if delta_df.empty:
+            return 0
+        
+        self.interactions_df = pd.concat([self.interactions_df, delta_df], ignore_index=True)
+        
+        # Recompute the mean rating only for the (user, item) cells the delta touched
+        touched = delta_df[['user_id', 'item_id']].drop_duplicates()
+        ratings = (self.interactions_df
+                   .merge(touched, on=['user_id', 'item_id'])
+                   .groupby(['user_id', 'item_id'])['rating']
+                   .mean())
+        
+        user_ids = self.user_ids.append(
+            pd.Index(touched['user_id'].unique()).difference(self.user_ids)
+        )
+        item_ids = self.item_ids.append(
+            pd.Index(touched['item_id'].unique()).difference(self.item_ids)
+        )
+        shape = (len(user_ids), len(item_ids))
+        matrix = self.resize_csr(self.user_item_matrix, shape)
+        
+        rows = user_ids.get_indexer(ratings.index.get_level_values('user_id')).astype(np.int32)
+        cols = item_ids.get_indexer(ratings.index.get_level_values('item_id')).astype(np.int32)
+        updates = csr_matrix((ratings.to_numpy(dtype=np.float32), (rows, cols)), shape=shape)
+        touched_mask = csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)), shape=shape)
+        
+        # Replace the touched cells: drop their old values, then add the new means
+        matrix = matrix - matrix.multiply(touched_mask) + updates
+        matrix.eliminate_zeros()
+        
+        self.user_item_matrix = matrix.tocsr()
+        self.user_ids = user_ids
+        self.item_ids = item_ids
+        
+        return len(delta_df)
+
     async def load_content_data(self):
         """Load content features for items"""
         try:
@@ -280,42 +531,46 @@ class RecommendationEngine:
                 """
                 
                 msme_results = await conn.fetch(msme_query)
-                
-                # Convert to DataFrame
-                self.content_df = pd.DataFrame([
-                    {
-                        'item_id': row['id'],
-                        'item_type': 'msme',
-                        'title': row['company_name'],
-                        'industry': row['industry_category'],
-                        'business_type': row['business_type'],
-                        'annual_turnover': float(row['annual_turnover'] or 0),
-                        'employee_count': int(row['employee_count'] or 0),
-                        'location': f"{row['city']} {row['state']}",
-                        'establishment_year': row['year_of_establishment'],
-                        'is_exporter': row['is_exporter'] or False,
-                        'certifications': json.loads(row['certifications']),
-                        'services': json.loads(row['services']),
-                        'products': json.loads(row['products']),
-                        'target_market': json.loads(row['target_market']),
-                        'growth_stage': row['growth_stage'],
-                        'tech_level': row['technology_adoption_level']
-                    }
-                    for row in msme_results
-                ])
-                
-                if not self.content_df.empty:
-                    # Create content features
-                    await self.create_content_features()
-                    logger.info(f"Loaded content features for {len(self.content_df)} items")
-                else:
-                    logger.warning("No content data found")
+            
+            await asyncio.to_thread(self.prepare_content_data, msme_results)
                     
         except Exception as e:
             logger.error(f"Failed to load content data: {e}")
             raise
 
-    async def create_content_features(self):
+    def prepare_content_data(self, msme_results):
+        """Build the content frame and its feature matrix from loaded MSMEs"""
+        # Convert to DataFrame
+        self.content_df = pd.DataFrame([
+            {
+                'item_id': row['id'],
+                'item_type': 'msme',
+                'title': row['company_name'],
+                'industry': row['industry_category'],
+                'business_type': row['business_type'],
+                'annual_turnover': float(row['annual_turnover'] or 0),
+                'employee_count': int(row['employee_count'] or 0),
+                'location': f"{row['city']} {row['state']}",
+                'establishment_year': row['year_of_establishment'],
+                'is_exporter': row['is_exporter'] or False,
+                'certifications': json.loads(row['certifications']),
+                'services': json.loads(row['services']),
+                'products': json.loads(row['products']),
+                'target_market': json.loads(row['target_market']),
+                'growth_stage': row['growth_stage'],
+                'tech_level': row['technology_adoption_level']
+            }
+            for row in msme_results
+        ])
+        
+        if not self.content_df.empty:
+            # Create content features
+            self.create_content_features()
+            logger.info(f"Loaded content features for {len(self.content_df)} items")
+        else:
+            logger.warning("No content data found")
+
+    def create_content_features(self):
         """Create content-based features using TF-IDF and other techniques"""
         try:
             # Create text features
@@ -375,7 +630,8 @@ class RecommendationEngine:
                 self.item_content_matrix = hstack([
                     tfidf_matrix,
                     csr_matrix(numerical_features_scaled)
-                ])
+                ]).tocsr()
+                self.content_item_ids = pd.Index(self.content_df['item_id'])
                 
                 logger.info(f"Created content features matrix: {self.item_content_matrix.shape}")
             else:
@@ -385,10 +641,18 @@ class RecommendationEngine:
             logger.error(f"Failed to create content features: {e}")
             raise
 
-    async def train_models(self):
-        """Train recommendation models"""
+    async def train_models(self, warm_start: bool = False):
+        """Train recommendation models off the event loop"""
+        await asyncio.to_thread(self.fit_models, warm_start)
+
+    def fit_models(self, warm_start: bool = False):
+        """Train recommendation models
+        
+        With warm_start the ALS model resumes from the previous factors and
+        only runs a few iterations over the updated matrix.
+        """
         try:
-            if self.user_item_matrix is not None and not self.user_item_matrix.empty:
+            if self.user_item_matrix is not None and self.user_item_matrix.nnz > 0:
                 # Train User-Based KNN
                 self.user_knn_model = NearestNeighbors(
                     n_neighbors=20,
@@ -396,8 +660,7 @@ class RecommendationEngine:
                     metric='cosine'
                 )
                 
-                # Convert to sparse matrix for efficiency
-                user_item_sparse = csr_matrix(self.user_item_matrix.values)
+                user_item_sparse = self.user_item_matrix
                 
                 if user_item_sparse.shape[0] > 0:
                     self.user_knn_model.fit(user_item_sparse)
@@ -411,17 +674,31 @@ class RecommendationEngine:
                     self.item_knn_model.fit(user_item_sparse.T)  # Transpose for item-based
                     
                     # Train ALS Model
-                    self.als_model = implicit.als.AlternatingLeastSquares(
-                        factors=50,
-                        regularization=0.1,
-                        iterations=20,
-                        random_state=42
+                    user_ids = self.user_ids
+                    item_ids = self.item_ids
+                    previous_model = self.als_model if warm_start else None
+                    
+                    als_model = self.create_als_model(
+                        iterations=self.incremental_als_iterations if previous_model is not None else 20
                     )
                     
+                    if previous_model is not None and self.als_user_ids is not None:
+                        als_model.user_factors = self.extend_factors(
+                            previous_model.user_factors, self.als_user_ids, user_ids
+                        )
+                        als_model.item_factors = self.extend_factors(
+                            previous_model.item_factors, self.als_item_ids, item_ids
+                        )
+                    
                     # Convert ratings to implicit feedback (binary)
                     implicit_matrix = (user_item_sparse > 0).astype(np.float32)
-                    self.als_model.fit(implicit_matrix)
+                    als_model.fit(implicit_matrix, show_progress=False)
                     
+                    self.als_model = als_model
+                    self.als_user_ids = user_ids
+                    self.als_item_ids = item_ids
+                    
+                    self.compute_item_popularity()
                     logger.info("Trained collaborative filtering models successfully")
                 else:
                     logger.warning("Insufficient data to train collaborative models")
@@ -432,47 +709,216 @@ class RecommendationEngine:
             logger.error(f"Failed to train models: {e}")
             raise
 
-    async def get_collaborative_recommendations(self, user_id: int, limit: int = 10) -> List[RecommendationItem]:
-        """Get recommendations using collaborative filtering"""
+    @staticmethod
+    def create_als_model(iterations: int = 20):
+        """Create the ALS model with the service's hyperparameters"""
+        return implicit.als.AlternatingLeastSquares(
+            factors=50,
+            regularization=0.1,
+            iterations=iterations,
+            random_state=42
+        )
+
+    def build_user_item_matrix(self, ratings: pd.Series):
+        """Build the CSR user-item matrix and id maps from a (user_id, item_id) -> rating series"""
+        if ratings.empty:
+            self.user_item_matrix = csr_matrix((0, 0), dtype=np.float32)
+            self.user_ids = pd.Index([], dtype='int64')
+            self.item_ids = pd.Index([], dtype='int64')
+            return
+        
+        user_codes, user_ids = pd.factorize(ratings.index.get_level_values('user_id'), sort=True)
+        item_codes, item_ids = pd.factorize(ratings.index.get_level_values('item_id'), sort=True)
+        
+        self.user_item_matrix = csr_matrix(
+            (ratings.to_numpy(dtype=np.float32),
+             (user_codes.astype(np.int32), item_codes.astype(np.int32))),
+            shape=(len(user_ids), len(item_ids))
+        )
+        self.user_ids = pd.Index(user_ids)
+        self.item_ids = pd.Index(item_ids)
+
+    @staticmethod
+    def resize_csr(matrix: Optional[csr_matrix], shape: Tuple[int, int]) -> csr_matrix:
+        """Grow a CSR matrix to shape without copying its data (new rows/cols are empty)"""
+        if matrix is None or matrix.shape[0] == 0:
+            return csr_matrix(shape, dtype=np.float32)
+        
+        extra_rows = shape[0] - matrix.shape[0]
+        indptr = np.concatenate([matrix.indptr, np.full(extra_rows, matrix.indptr[-1], dtype=matrix.indptr.dtype)])
+        return csr_matrix((matrix.data, matrix.indices, indptr), shape=shape)
+
+    def build_neighbor_index(self, block_size: int = 1024):
+        """Precompute each item's top-K content neighbours into compact arrays"""
         try:
-            recommendations = []
+            if self.item_content_matrix is None or self.item_content_matrix.shape[0] < 2:
+                self.neighbor_indices = None
+                self.neighbor_scores = None
+                return
             
-            if (self.user_knn_model is None or 
-                self.user_item_matrix is None or 
-                user_id not in self.user_item_matrix.index):
-                return await self.get_cold_start_recommendations(user_id, limit)
+            features = normalize(self.item_content_matrix)
+            n_items = features.shape[0]
+            k = min(self.neighbor_k, n_items - 1)
             
-            # Get user vector
-            user_vector = self.user_item_matrix.loc[user_id].values.reshape(1, -1)
+            neighbor_indices = np.empty((n_items, k), dtype=np.int32)
+            neighbor_scores = np.empty((n_items, k), dtype=np.float32)
             
-            # Find similar users
-            distances, indices = self.user_knn_model.kneighbors(user_vector, n_neighbors=min(20, len(self.user_item_matrix)))
+            # Score items in row blocks so memory stays at block_size x n_items
+            for start in range(0, n_items, block_size):
+                stop = min(start + block_size, n_items)
+                similarities = (features[start:stop] @ features.T).toarray()
+                similarities[np.arange(stop - start), np.arange(start, stop)] = -np.inf  # Exclude self
+                
+                top = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+                top_scores = np.take_along_axis(similarities, top, axis=1)
+                order = np.argsort(-top_scores, axis=1)
+                
+                neighbor_indices[start:stop] = np.take_along_axis(top, order, axis=1)
+                neighbor_scores[start:stop] = np.take_along_axis(top_scores, order, axis=1)
             
-            # Get items from similar users
-            similar_users = self.user_item_matrix.index[indices[0][1:]]  # Exclude self
-            item_scores = {}
+            self.neighbor_indices = neighbor_indices
+            self.neighbor_scores = neighbor_scores
+            logger.info(f"Built content neighbour index: {n_items} items x {k} neighbours")
             
-            for sim_user_idx, sim_user in enumerate(similar_users):
-                similarity = 1 / (1 + distances[0][sim_user_idx + 1])  # Convert distance to similarity
+        except Exception as e:
+            logger.error(f"Failed to build neighbour index: {e}")
+            raise
+
+    def extend_factors(self, factors: np.ndarray, previous_ids: pd.Index, ids: pd.Index) -> np.ndarray:
+        """Align previous ALS factors to a new id order, seeding unseen ids randomly"""
+        factors = np.asarray(factors)
+        extended = (np.random.default_rng(42).random((len(ids), factors.shape[1])) * 0.01).astype(factors.dtype)
+        
+        positions = previous_ids.get_indexer(ids)
+        known = positions >= 0
+        extended[known] = factors[positions[known]]
+        return extended
+
+    def compute_als_top_k(self, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k unseen items for every ALS user as (users x k) item positions and scores.
+        
+        User factors are multiplied against all item factors in row blocks on a
+        thread pool (the BLAS product releases the GIL); already liked items
+        score -inf so they sort last.
+        """
+        user_factors = np.asarray(self.als_model.user_factors, dtype=np.float32)
+        item_factors_t = np.ascontiguousarray(np.asarray(self.als_model.item_factors, dtype=np.float32).T)
+        liked = self.user_item_matrix
+        n_users = user_factors.shape[0]
+        k = min(k, item_factors_t.shape[1])
+        
+        top_items = np.empty((n_users, k), dtype=np.int32)
+        top_scores = np.empty((n_users, k), dtype=np.float32)
+        
+        def score_block(start: int):
+            stop = min(start + self.precompute_block_size, n_users)
+            scores = user_factors[start:stop] @ item_factors_t
+            
+            block = liked[start:stop]
+            scores[np.repeat(np.arange(stop - start), np.diff(block.indptr)), block.indices] = -np.inf
+            
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            block_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-block_scores, axis=1, kind='stable')
+            top_items[start:stop] = np.take_along_axis(top, order, axis=1)
+            top_scores[start:stop] = np.take_along_axis(block_scores, order, axis=1)
+        
+        with ThreadPoolExecutor(max_workers=self.precompute_workers) as executor:
+            list(executor.map(score_block, range(0, n_users, self.precompute_block_size)))
+        
+        return top_items, top_scores
+
+    def precompute_recommendations(self) -> int:
+        """Score every ALS user and publish their top-K items to Redis sorted sets
+        
+        Returns the number of users written. Runs after each retrain; users
+        without an entry are scored online by get_similar_users_recommendations.
+        """
+        if self.als_model is None or self.user_item_matrix is None or self.als_user_ids is None:
+            return 0
+        
+        if self.user_item_matrix.shape != (len(self.als_user_ids), len(self.als_item_ids)):
+            logger.warning("User-item matrix is out of step with the ALS factors, skipping precompute")
+            return 0
+        
+        try:
+            started = datetime.now()
+            top_items, top_scores = self.compute_als_top_k(self.precomputed_k)
+            item_ids = self.als_item_ids.to_numpy()
+            
+            written = 0
+            pipe = self.redis_client.pipeline(transaction=False)
+            for row, user_id in enumerate(self.als_user_ids):
+                key = f"{self.precomputed_key_prefix}:{user_id}"
+                valid = np.isfinite(top_scores[row])
                 
-                user_ratings = self.user_item_matrix.loc[sim_user]
-                unrated_items = user_ratings[user_ratings > 0].index
+                pipe.delete(key)
+                if valid.any():
+                    pipe.zadd(key, dict(zip(
+                        item_ids[top_items[row][valid]].tolist(),
+                        top_scores[row][valid].tolist()
+                    )))
+                    pipe.expire(key, self.precomputed_ttl)
+                    written += 1
                 
-                # Remove items already rated by target user
-                target_user_items = set(self.user_item_matrix.loc[user_id][self.user_item_matrix.loc[user_id] > 0].index)
-                unrated_items = [item for item in unrated_items if item not in target_user_items]
+                if (row + 1) % 1000 == 0:
+                    pipe.execute()
+            pipe.execute()
+            
+            self.precomputed_at = datetime.now()
+            logger.info(
+                f"Precomputed ALS recommendations for {written} users in "
+                f"{(self.precomputed_at - started).total_seconds():.2f}s"
+            )
+            return written
+            
+        except Exception as e:
+            logger.error(f"Failed to precompute recommendations: {e}")
+            return 0
+
+    def get_precomputed_recommendations(self, user_id: int, limit: int) -> List[Tuple[int, float]]:
+        """Best-first (item_id, score) pairs from the precomputed table, or [] if absent"""
+        if limit > self.precomputed_k:
+            return []
+        
+        try:
+            entries = self.redis_client.zrevrange(
+                f"{self.precomputed_key_prefix}:{user_id}", 0, limit - 1, withscores=True
+            )
+            return [(int(item_id), score) for item_id, score in entries]
+        except Exception as e:
+            logger.warning(f"Failed to read precomputed recommendations for user {user_id}: {e}")
+            return []
+
+    async def get_collaborative_recommendations(self, user_id: int, limit: int = 10) -> List[RecommendationItem]:
+        """Get recommendations using collaborative filtering
+        
+        Served from the precomputed ALS table; users without an entry (trained
+        since the last precompute, or limit above precomputed_k) are scored
+        online against their nearest neighbours.
+        """
+        try:
+            recommendations = []
+            
+            precomputed = self.get_precomputed_recommendations(user_id, limit)
+            if precomputed:
+                top_item_ids = [item_id for item_id, _ in precomputed]
+                top_scores = np.array([score for _, score in precomputed])
+            else:
+                if (self.user_knn_model is None or 
+                    self.user_item_matrix is None or 
+                    user_id not in self.user_ids):
+                    return await self.get_cold_start_recommendations(user_id, limit)
                 
-                for item in unrated_items:
-                    if item not in item_scores:
-                        item_scores[item] = 0
-                    item_scores[item] += similarity * user_ratings[item]
+                top_item_ids, top_scores = self.score_user_neighbours(user_id, limit)
             
-            # Sort and get top recommendations
-            sorted_items = sorted(item_scores.items(), key=lambda x: x[1], reverse=True)[:limit]
+            max_score = top_scores[0] if len(top_scores) else 0
             
-            for rank, (item_id, score) in enumerate(sorted_items):
-                # Get item details
-                item_details = await self.get_item_details(item_id, 'msme')
+            # Get item details
+            details = await self.get_items_details(top_item_ids, 'msme')
+            
+            for rank, (item_id, score) in enumerate(zip(top_item_ids, top_scores)):
+                item_details = details.get(item_id)
                 
                 if item_details:
                     recommendations.append(RecommendationItem(
@@ -481,7 +927,7 @@ class RecommendationEngine:
                         title=item_details.get('title', f'MSME {item_id}'),
                         description=item_details.get('description', ''),
                         score=float(score),
-                        confidence=min(0.9, score / max(item_scores.values()) if item_scores else 0),
+                        confidence=min(0.9, score / max_score if max_score else 0),
                         reasons=['Similar users liked this', 'Collaborative filtering match'],
                         metadata=item_details,
                         rank=rank + 1
@@ -493,6 +939,29 @@ class RecommendationEngine:
             logger.error(f"Error in collaborative recommendations: {e}")
             return []
 
+    def score_user_neighbours(self, user_id: int, limit: int) -> Tuple[List[int], np.ndarray]:
+        """Online user-KNN scoring: best-first item ids and scores for a known user"""
+        # Get user vector
+        user_row = self.user_ids.get_loc(user_id)
+        user_vector = self.user_item_matrix[user_row]
+        
+        # Find similar users
+        distances, indices = self.user_knn_model.kneighbors(
+            user_vector, n_neighbors=min(20, self.user_item_matrix.shape[0])
+        )
+        neighbours = indices[0] != user_row  # Exclude self
+        similar_rows = indices[0][neighbours]
+        similarities = 1 / (1 + distances[0][neighbours])  # Convert distance to similarity
+        
+        # Score every item with one sparse product of neighbour weights against their rows
+        item_scores = np.asarray(self.user_item_matrix[similar_rows].T @ similarities).ravel()
+        
+        # Remove items already rated by target user
+        item_scores[user_vector.indices] = 0
+        
+        top_items = top_n_indices(item_scores, limit)
+        return [int(item_id) for item_id in self.item_ids[top_items]], item_scores[top_items]
+
     async def get_content_based_recommendations(self, user_id: int, limit: int = 10) -> List[RecommendationItem]:
         """Get recommendations using content-based filtering"""
         try:
@@ -511,38 +980,38 @@ class RecommendationEngine:
             if not liked_items:
                 return await self.get_cold_start_recommendations(user_id, limit)
             
-            # Get indices of liked items
-            item_indices = []
-            for item_id in liked_items:
-                if item_id in self.content_df['item_id'].values:
-                    idx = self.content_df[self.content_df['item_id'] == item_id].index[0]
-                    item_indices.append(idx)
+            # Get content rows of liked items
+            item_indices = self.content_item_ids.get_indexer(liked_items)
+            item_indices = item_indices[item_indices >= 0]
             
-            if not item_indices:
+            if len(item_indices) == 0 or self.neighbor_indices is None:
                 return await self.get_cold_start_recommendations(user_id, limit)
             
-            # Create user profile by averaging liked item features
-            user_profile = np.mean(self.item_content_matrix[item_indices], axis=0)
-            
-            # Calculate similarity with all items
-            similarities = cosine_similarity(user_profile.reshape(1, -1), self.item_content_matrix)[0]
+            # Combine the liked items' neighbour lists; a candidate's score is its
+            # mean similarity to the liked items
+            candidate_rows, inverse = np.unique(self.neighbor_indices[item_indices], return_inverse=True)
+            candidate_scores = np.bincount(
+                inverse.ravel(),
+                weights=self.neighbor_scores[item_indices].ravel(),
+                minlength=len(candidate_rows)
+            ) / len(item_indices)
             
-            # Get top similar items (excluding already interacted items)
-            interacted_items = set([item['item_id'] for item in user_interactions])
+            # Drop already interacted items
+            interacted_rows = self.content_item_ids.get_indexer([item['item_id'] for item in user_interactions])
+            candidate_scores[np.isin(candidate_rows, interacted_rows)] = 0
             
             recommendations = []
-            item_similarity_pairs = []
+            top = top_n_indices(candidate_scores, limit)
+            item_similarity_pairs = [
+                (int(self.content_item_ids[candidate_rows[i]]), float(candidate_scores[i]), candidate_rows[i])
+                for i in top
+            ]
             
-            for idx, similarity in enumerate(similarities):
-                item_id = self.content_df.iloc[idx]['item_id']
-                if item_id not in interacted_items:
-                    item_similarity_pairs.append((item_id, similarity, idx))
+            top_pairs = item_similarity_pairs[:limit]
+            details = await self.get_items_details([item_id for item_id, _, _ in top_pairs], 'msme')
             
-            # Sort by similarity
-            item_similarity_pairs.sort(key=lambda x: x[1], reverse=True)
-            
-            for rank, (item_id, similarity, idx) in enumerate(item_similarity_pairs[:limit]):
-                item_details = await self.get_item_details(item_id, 'msme')
+            for rank, (item_id, similarity, idx) in enumerate(top_pairs):
+                item_details = details.get(int(item_id))
                 
                 if item_details:
                     # Generate content-based reasons
@@ -566,10 +1035,13 @@ class RecommendationEngine:
             logger.error(f"Error in content-based recommendations: {e}")
             return []
 
-    async def get_hybrid_recommendations(self, user_id: int, limit: int = 10) -> List[RecommendationItem]:
+    async def get_hybrid_recommendations(self, user_id: int, limit: int = 10,
+                                         diversity_weight: Optional[float] = None,
+                                         novelty_weight: Optional[float] = None) -> List[RecommendationItem]:
         """Get recommendations using hybrid approach"""
         try:
-            # Get recommendations from both approaches
+            # Get recommendations from both approaches (the collaborative half
+            # comes from the precomputed table when the user has an entry)
             collaborative_recs = await self.get_collaborative_recommendations(user_id, limit * 2)
             content_recs = await self.get_content_based_recommendations(user_id, limit * 2)
             
@@ -599,31 +1071,29 @@ class RecommendationEngine:
                     }
             
             # Calculate hybrid scores
-            for item_id, data in all_recommendations.items():
-                # Weighted combination
-                hybrid_score = (0.6 * data['collaborative_score'] + 
-                               0.4 * data['content_score'])
-                
-                # Apply diversity and novelty bonuses
-                diversity_bonus = await self.calculate_diversity_bonus(item_id, user_id)
-                novelty_bonus = await self.calculate_novelty_bonus(item_id, user_id)
-                
-                final_score = hybrid_score + (self.diversity_weight * diversity_bonus) + (self.novelty_weight * novelty_bonus)
-                
-                data['final_score'] = final_score
-                data['item'].score = final_score
-                data['item'].reasons = list(data['reasons'])
-            
-            # Sort by final score and return top recommendations
-            sorted_recs = sorted(
-                all_recommendations.values(),
-                key=lambda x: x['final_score'],
-                reverse=True
-            )[:limit]
-            
-            # Update ranks
-            for rank, rec_data in enumerate(sorted_recs):
+            candidates = list(all_recommendations.values())
+            hybrid_scores = np.array([
+                0.6 * data['collaborative_score'] + 0.4 * data['content_score']
+                for data in candidates
+            ], dtype=np.float64)
+            
+            # Re-rank the whole candidate set with diversity and novelty bonuses
+            order, final_scores = await self.rerank_candidates(
+                user_id,
+                [data['item'].item_id for data in candidates],
+                hybrid_scores,
+                limit,
+                self.diversity_weight if diversity_weight is None else diversity_weight,
+                self.novelty_weight if novelty_weight is None else novelty_weight
+            )
+            
+            sorted_recs = []
+            for rank, (idx, final_score) in enumerate(zip(order, final_scores)):
+                rec_data = candidates[idx]
+                rec_data['item'].score = float(final_score)
+                rec_data['item'].reasons = list(rec_data['reasons'])
                 rec_data['item'].rank = rank + 1
+                sorted_recs.append(rec_data)
             
             return [rec_data['item'] for rec_data in sorted_recs]
             
@@ -647,13 +1117,16 @@ class RecommendationEngine:
                 popular_items.columns = ['interaction_count', 'avg_rating', 'unique_users']
                 popular_items = popular_items.sort_values(['interaction_count', 'avg_rating'], ascending=False)
                 
+                top_items = popular_items.head(limit)
+                details = await self.get_items_details(list(top_items.index), 'msme')
+                
                 recommendations = []
-                for rank, (item_id, stats) in enumerate(popular_items.head(limit).iterrows()):
-                    item_details = await self.get_item_details(item_id, 'msme')
+                for rank, (item_id, stats) in enumerate(top_items.iterrows()):
+                    item_details = details.get(int(item_id))
                     
                     if item_details:
                         recommendations.append(RecommendationItem(
-                            item_id=item_id,
+                            item_id=int(item_id),
                             item_type='msme',
                             title=item_details.get('title', f'MSME {item_id}'),
                             description=item_details.get('description', ''),
@@ -675,25 +1148,34 @@ class RecommendationEngine:
     async def get_similar_users_recommendations(self, user_id: int, limit: int = 10) -> List[RecommendationItem]:
         """Get recommendations based on similar users using ALS"""
         try:
-            if self.als_model is None or user_id not in self.user_item_matrix.index:
-                return await self.get_cold_start_recommendations(user_id, limit)
-            
-            # Get user index
-            user_idx = list(self.user_item_matrix.index).index(user_id)
+            # Known users are served from the precomputed table; the model is
+            # only scored online for users trained since the last precompute
+            precomputed = self.get_precomputed_recommendations(user_id, limit)
+            if precomputed:
+                top_item_ids = [item_id for item_id, _ in precomputed]
+                scores = [score for _, score in precomputed]
+            else:
+                if self.als_model is None or user_id not in self.user_ids:
+                    return await self.get_cold_start_recommendations(user_id, limit)
+                
+                # Get user index
+                user_idx = self.user_ids.get_loc(user_id)
+                
+                # Get recommendations from ALS model
+                item_indices, scores = self.als_model.recommend(
+                    user_idx,
+                    self.user_item_matrix[user_idx],
+                    N=limit,
+                    filter_already_liked_items=True
+                )
+                
+                top_item_ids = [int(item_id) for item_id in self.item_ids[item_indices]]
             
-            # Get recommendations from ALS model
-            item_ids = list(self.user_item_matrix.columns)
-            recommendations_als = self.als_model.recommend(
-                user_idx,
-                csr_matrix(self.user_item_matrix.values)[user_idx],
-                N=limit,
-                filter_already_liked_items=True
-            )
+            details = await self.get_items_details(top_item_ids, 'msme')
             
             recommendations = []
-            for rank, (item_idx, score) in enumerate(recommendations_als):
-                item_id = item_ids[item_idx]
-                item_details = await self.get_item_details(item_id, 'msme')
+            for rank, (item_id, score) in enumerate(zip(top_item_ids, scores)):
+                item_details = details.get(item_id)
                 
                 if item_details:
                     recommendations.append(RecommendationItem(
@@ -716,36 +1198,78 @@ class RecommendationEngine:
 
     async def get_item_details(self, item_id: int, item_type: str) -> Optional[Dict]:
         """Get detailed information about an item"""
+        details = await self.get_items_details([item_id], item_type)
+        return details.get(int(item_id))
+
+    async def get_items_details(self, item_ids: List[int], item_type: str) -> Dict[int, Dict]:
+        """Get details for many items at once.
+        
+        One MGET against the cache, one query for the misses, and the misses
+        written back to the cache in a single pipeline.
+        """
+        item_ids = list(dict.fromkeys(int(item_id) for item_id in item_ids))
+        if not item_ids:
+            return {}
+        
+        details = {}
+        cache_keys = [f"item_details:{item_type}:{item_id}" for item_id in item_ids]
+        
+        try:
+            cached_values = self.redis_client.mget(cache_keys)
+        except Exception as e:
+            logger.warning(f"Item details cache read failed: {e}")
+            cached_values = [None] * len(item_ids)
+        
+        for item_id, cached in zip(item_ids, cached_values):
+            if cached:
+                details[item_id] = json.loads(cached)
+        
+        missing_ids = [item_id for item_id in item_ids if item_id not in details]
+        if not missing_ids or item_type != 'msme':
+            return details
+        
         try:
             async with self.db_pool.acquire() as conn:
-                if item_type == 'msme':
-                    query = """
-                        SELECT m.id, m.company_name, m.industry_category, 
-                               m.business_type, m.annual_turnover, m.employee_count,
-                               m.state, m.city, m.description, m.services, m.products
-                        FROM msmes m
-                        WHERE m.id = $1 AND m.status = 'active'
-                    """
-                    result = await conn.fetchrow(query, item_id)
-                    
-                    if result:
-                        return {
-                            'title': result['company_name'],
-                            'description': result['description'] or f"{result['business_type']} company in {result['industry_category']}",
-                            'industry': result['industry_category'],
-                            'business_type': result['business_type'],
-                            'location': f"{result['city']}, {result['state']}",
-                            'annual_turnover': result['annual_turnover'],
-                            'employee_count': result['employee_count'],
-                            'services': json.loads(result['services'] or '[]'),
-                            'products': json.loads(result['products'] or '[]')
-                        }
+                query = """
+                    SELECT m.id, m.company_name, m.industry_category, 
+                           m.business_type, m.annual_turnover, m.employee_count,
+                           m.state, m.city, m.description, m.services, m.products
+                    FROM msmes m
+                    WHERE m.id = ANY($1) AND m.status = 'active'
+                """
+                results = await conn.fetch(query, missing_ids)
             
-            return None
+            fetched = {result['id']: self.item_details_from_row(result) for result in results}
+            details.update(fetched)
+            
+            if fetched:
+                try:
+                    pipe = self.redis_client.pipeline(transaction=False)
+                    for item_id, item_details in fetched.items():
+                        pipe.setex(f"item_details:{item_type}:{item_id}", self.cache_ttl, json.dumps(item_details))
+                    pipe.execute()
+                except Exception as e:
+                    logger.warning(f"Item details cache write failed: {e}")
             
         except Exception as e:
             logger.error(f"Error getting item details: {e}")
-            return None
+        
+        return details
+
+    @staticmethod
+    def item_details_from_row(result) -> Dict:
+        """Convert an msmes row to the item details dict"""
+        return {
+            'title': result['company_name'],
+            'description': result['description'] or f"{result['business_type']} company in {result['industry_category']}",
+            'industry': result['industry_category'],
+            'business_type': result['business_type'],
+            'location': f"{result['city']}, {result['state']}",
+            'annual_turnover': float(result['annual_turnover']) if result['annual_turnover'] is not None else None,
+            'employee_count': result['employee_count'],
+            'services': json.loads(result['services'] or '[]'),
+            'products': json.loads(result['products'] or '[]')
+        }
 
     async def get_user_interaction_history(self, user_id: int) -> List[Dict]:
         """Get user's interaction history"""
@@ -766,13 +1290,15 @@ class RecommendationEngine:
         try:
             reasons = []
             
-            if item_id in self.content_df['item_id'].values and liked_items:
-                item_data = self.content_df[self.content_df['item_id'] == item_id].iloc[0]
+            item_row = self.content_item_ids.get_indexer([item_id])[0]
+            
+            if item_row >= 0 and liked_items:
+                item_data = self.content_df.iloc[item_row]
                 
                 # Compare with liked items
-                for liked_item_id in liked_items[:3]:  # Check top 3 liked items
-                    if liked_item_id in self.content_df['item_id'].values:
-                        liked_data = self.content_df[self.content_df['item_id'] == liked_item_id].iloc[0]
+                for liked_row in self.content_item_ids.get_indexer(liked_items[:3]):  # Check top 3 liked items
+                    if liked_row >= 0:
+                        liked_data = self.content_df.iloc[liked_row]
                         
                         # Check similarity factors
                         if item_data['industry'] == liked_data['industry']:
@@ -803,52 +1329,78 @@ class RecommendationEngine:
             logger.error(f"Error generating content reasons: {e}")
             return ["Content-based match"]
 
-    async def calculate_diversity_bonus(self, item_id: int, user_id: int) -> float:
-        """Calculate diversity bonus for recommendation"""
-        try:
-            # Get user's interaction history
-            user_history = await self.get_user_interaction_history(user_id)
-            
-            if not user_history:
-                return 0.0
-            
-            # Get industries/categories from user history
-            user_industries = set()
-            for interaction in user_history:
-                item_details = await self.get_item_details(interaction['item_id'], interaction['item_type'])
-                if item_details:
-                    user_industries.add(item_details.get('industry', ''))
-            
-            # Check if current item is from a different industry
-            item_details = await self.get_item_details(item_id, 'msme')
-            if item_details:
-                item_industry = item_details.get('industry', '')
-                if item_industry not in user_industries:
-                    return 0.2  # Diversity bonus
-            
-            return 0.0
+    async def rerank_candidates(self, user_id: int, item_ids: List[int], relevance: np.ndarray,
+                                limit: int, diversity_weight: float,
+                                novelty_weight: float) -> Tuple[np.ndarray, np.ndarray]:
+        """MMR-style re-ranking of a whole candidate set.
+        
+        Diversity is one minus the highest content similarity to the user's
+        history and to the candidates already picked; novelty falls with an
+        item's interaction count. Returns candidate positions in pick order
+        and their final scores.
+        """
+        n_candidates = len(item_ids)
+        if n_candidates == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        
+        # Novelty from the precomputed popularity array (unknown items count as unseen)
+        popularity = np.zeros(n_candidates)
+        positions = self.item_ids.get_indexer(item_ids)
+        known = positions >= 0
+        if known.any() and len(self.item_popularity):
+            popularity[known] = self.item_popularity[positions[known]]
+        max_popularity = max(popularity.max(), self.item_popularity.max() if len(self.item_popularity) else 0)
+        novelty = 1 - np.log1p(popularity) / np.log1p(max_popularity) if max_popularity > 0 else np.ones(n_candidates)
+        
+        base_scores = relevance + novelty_weight * self.max_novelty_bonus * novelty
+        
+        # Candidate content vectors; items without content get no diversity bonus
+        rows = (self.content_item_ids.get_indexer(item_ids) 
+                if self.item_content_matrix is not None else np.full(n_candidates, -1))
+        has_vector = rows >= 0
+        candidate_similarity = np.zeros((n_candidates, n_candidates))
+        max_similarity = np.ones(n_candidates)
+        
+        if has_vector.any():
+            vectors = normalize(self.item_content_matrix[rows[has_vector]])
+            candidate_similarity[np.ix_(has_vector, has_vector)] = (vectors @ vectors.T).toarray()
+            max_similarity[has_vector] = 0
             
-        except Exception as e:
-            logger.error(f"Error calculating diversity bonus: {e}")
-            return 0.0
+            user_history = await self.get_user_interaction_history(user_id)
+            history_rows = self.content_item_ids.get_indexer(
+                [interaction['item_id'] for interaction in user_history if interaction['item_type'] == 'msme']
+            )
+            history_rows = np.unique(history_rows[history_rows >= 0])
+            if len(history_rows):
+                history_vectors = normalize(self.item_content_matrix[history_rows])
+                max_similarity[has_vector] = (vectors @ history_vectors.T).toarray().max(axis=1)
+        
+        # Greedy MMR: each pick updates every remaining candidate's max similarity
+        order = []
+        final_scores = []
+        available = np.ones(n_candidates, dtype=bool)
+        for _ in range(min(limit, n_candidates)):
+            diversity = np.clip(1 - max_similarity, 0, 1)
+            scores = base_scores + diversity_weight * self.max_diversity_bonus * diversity
+            scores[~available] = -np.inf
+            
+            best = int(np.argmax(scores))
+            order.append(best)
+            final_scores.append(scores[best])
+            available[best] = False
+            if has_vector[best]:
+                max_similarity = np.maximum(max_similarity, candidate_similarity[best])
+        
+        return np.array(order, dtype=np.int64), np.array(final_scores)
 
-    async def calculate_novelty_bonus(self, item_id: int, user_id: int) -> float:
-        """Calculate novelty bonus for recommendation"""
-        try:
-            # Check if item is new (recent addition or low interaction count)
-            if not self.interactions_df.empty:
-                item_interactions = self.interactions_df[
-                    self.interactions_df['item_id'] == item_id
-                ]
-                
-                if len(item_interactions) < self.new_item_threshold:
-                    return 0.15  # Novelty bonus for new items
-            
-            return 0.0
-            
-        except Exception as e:
-            logger.error(f"Error calculating novelty bonus: {e}")
-            return 0.0
+    def compute_item_popularity(self):
+        """Precompute per-item interaction counts aligned with item_ids"""
+        if self.interactions_df.empty or len(self.item_ids) == 0:
+            self.item_popularity = np.zeros(len(self.item_ids), dtype=np.int64)
+            return
+        
+        counts = self.interactions_df['item_id'].value_counts()
+        self.item_popularity = counts.reindex(self.item_ids, fill_value=0).to_numpy(dtype=np.int64)
 
     async def record_user_feedback(self, feedback: UserFeedback):
         """Record user feedback for model improvement"""
@@ -900,15 +1452,264 @@ class RecommendationEngine:
         except Exception as e:
             logger.error(f"Error checking model update trigger: {e}")
 
-    async def retrain_models_background(self):
-        """Background task to retrain models"""
+    async def retrain_models_background(self, full: bool = False):
+        """Background task to retrain models
+        
+        Defaults to an incremental update that folds in interactions newer
+        than the watermark; falls back to a full reload when requested, when
+        no model or watermark exists yet, or once full_retrain_interval has
+        elapsed so that interactions ageing out of the windows are dropped.
+        Every successful run is written out as a new snapshot.
+        """
+        if not self.is_leader:
+            logger.info("Model retraining runs in the snapshot leader process, skipping")
+            return
+        if self.training_lock.locked():
+            logger.info("Model retraining already in progress, skipping")
+            return
+        
+        async with self.training_lock:
+            try:
+                needs_full = (
+                    full or
+                    self.als_model is None or
+                    self.last_full_retrain is None or
+                    datetime.now() - self.last_full_retrain >= self.full_retrain_interval
+                )
+                
+                # Train on a staged copy in worker threads; requests keep reading
+                # the live models until publish swaps the new ones in
+                staged = self.staging_copy()
+                
+                if not needs_full:
+                    delta_df = await staged.load_interaction_delta()
+                    if staged.interaction_watermark is None:
+                        needs_full = True
+                    else:
+                        logger.info(f"Starting incremental model retraining with {len(delta_df)} new interactions...")
+                        applied = await asyncio.to_thread(staged.fold_interactions, delta_df)
+                        if applied:
+                            await staged.train_models(warm_start=True)
+                        staged.update_watermark(delta_df)
+                        self.publish(staged)
+                        if applied:
+                            await asyncio.to_thread(self.save_snapshot)
+                            await asyncio.to_thread(self.precompute_recommendations)
+                        logger.info(f"Incremental model retraining completed ({applied} interactions applied)")
+                        return
+                
+                logger.info("Starting background model retraining...")
+                await staged.load_interaction_data()
+                await staged.load_content_data()
+                await staged.train_models()
+                await asyncio.to_thread(staged.build_neighbor_index)
+                staged.last_full_retrain = datetime.now()
+                self.publish(staged)
+                await asyncio.to_thread(self.save_snapshot)
+                await asyncio.to_thread(self.precompute_recommendations)
+                logger.info("Background model retraining completed")
+            except Exception as e:
+                logger.error(f"Background model retraining failed: {e}")
+
+    def staging_copy(self) -> 'RecommendationEngine':
+        """Shallow copy of the engine for a retrain to build new models on.
+        
+        Training steps replace attributes rather than mutating them, so the
+        copy shares nothing it will change; the feature scaler is the
+        exception (fit in place) and gets a fresh instance.
+        """
+        staged = copy.copy(self)
+        staged.feature_scaler = StandardScaler()
+        return staged
+
+    def publish(self, staged: 'RecommendationEngine'):
+        """Swap a staged retrain's models in; runs on the event loop between requests"""
+        for name in self.MODEL_STATE:
+            setattr(self, name, getattr(staged, name))
+
+    def save_snapshot(self) -> Optional[str]:
+        """Write trained artefacts to a new versioned snapshot directory.
+        
+        Arrays are stored as individual .npy files so load_snapshot can
+        memory-map them; CURRENT is switched atomically once the directory
+        is complete.
+        """
+        if self.user_item_matrix is None or self.als_model is None:
+            return None
+        
+        version = f"{datetime.now().strftime('%Y%m%dT%H%M%S%f')}-{os.getpid()}"
+        final_path = os.path.join(self.snapshot_dir, version)
+        tmp_path = final_path + ".tmp"
+        
+        try:
+            os.makedirs(tmp_path, exist_ok=True)
+            
+            arrays = {
+                'user_ids': self.user_ids.to_numpy(),
+                'item_ids': self.item_ids.to_numpy(),
+                'als_user_ids': self.als_user_ids.to_numpy(),
+                'als_item_ids': self.als_item_ids.to_numpy(),
+                'als_user_factors': np.asarray(self.als_model.user_factors),
+                'als_item_factors': np.asarray(self.als_model.item_factors),
+                'item_popularity': self.item_popularity,
+                'user_item.data': self.user_item_matrix.data,
+                'user_item.indices': self.user_item_matrix.indices,
+                'user_item.indptr': self.user_item_matrix.indptr,
+            }
+            if self.item_content_matrix is not None:
+                arrays.update({
+                    'content_item_ids': self.content_item_ids.to_numpy(),
+                    'item_content.data': self.item_content_matrix.data,
+                    'item_content.indices': self.item_content_matrix.indices,
+                    'item_content.indptr': self.item_content_matrix.indptr,
+                })
+            if self.neighbor_indices is not None:
+                arrays.update({
+                    'neighbor_indices': self.neighbor_indices,
+                    'neighbor_scores': self.neighbor_scores,
+                })
+            
+            for name, array in arrays.items():
+                np.save(os.path.join(tmp_path, f"{name}.npy"), np.ascontiguousarray(array))
+            
+            self.interactions_df.to_pickle(os.path.join(tmp_path, "interactions.pkl"))
+            self.pending_interactions_df.to_pickle(os.path.join(tmp_path, "pending_interactions.pkl"))
+            self.content_df.to_pickle(os.path.join(tmp_path, "content.pkl"))
+            joblib.dump({
+                'content_vectorizer': self.content_vectorizer,
+                'feature_scaler': self.feature_scaler
+            }, os.path.join(tmp_path, "vectorizer.joblib"))
+            
+            manifest = {
+                'format_version': self.snapshot_format_version,
+                'version': version,
+                'created_at': datetime.now().isoformat(),
+                'interaction_watermark': self.interaction_watermark.isoformat() if self.interaction_watermark else None,
+                'watermark_keys': sorted(self.watermark_keys),
+                'last_full_retrain': self.last_full_retrain.isoformat() if self.last_full_retrain else None,
+                'arrays': sorted(arrays),
+                'user_item_shape': list(self.user_item_matrix.shape),
+                'item_content_shape': list(self.item_content_matrix.shape) if self.item_content_matrix is not None else None
+            }
+            with open(os.path.join(tmp_path, "manifest.json"), "w") as f:
+                json.dump(manifest, f)
+            
+            os.replace(tmp_path, final_path)
+            
+            current_tmp = os.path.join(self.snapshot_dir, f"CURRENT.{os.getpid()}")
+            with open(current_tmp, "w") as f:
+                f.write(version)
+            os.replace(current_tmp, os.path.join(self.snapshot_dir, "CURRENT"))
+            
+            self.snapshot_version = version
+            self.prune_snapshots()
+            logger.info(f"Saved model snapshot {version}")
+            return version
+            
+        except Exception as e:
+            logger.error(f"Failed to save model snapshot: {e}")
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            return None
+
+    def prune_snapshots(self):
+        """Remove all but the newest snapshots_to_keep snapshot directories
+        
+        Only the leader prunes. Followers still mapping a pruned version keep
+        working: its files are unlinked, not truncated.
+        """
+        versions = sorted(
+            entry for entry in os.listdir(self.snapshot_dir)
+            if os.path.isdir(os.path.join(self.snapshot_dir, entry)) and not entry.endswith(".tmp")
+        )
+        for version in versions[:-self.snapshots_to_keep]:
+            if version != self.snapshot_version:
+                shutil.rmtree(os.path.join(self.snapshot_dir, version), ignore_errors=True)
+
+    def current_snapshot_version(self) -> Optional[str]:
+        """Version named by the snapshot directory's CURRENT file, if any"""
+        current_file = os.path.join(self.snapshot_dir, "CURRENT")
+        if not os.path.exists(current_file):
+            return None
+        with open(current_file) as f:
+            return f.read().strip() or None
+
+    def load_snapshot(self) -> bool:
+        """Load the CURRENT snapshot, memory-mapping its arrays.
+        
+        Worker processes that load the same snapshot share its pages through
+        the OS page cache. Returns False when no usable snapshot exists.
+        """
         try:
-            logger.info("Starting background model retraining...")
-            await self.load_interaction_data()
-            await self.train_models()
-            logger.info("Background model retraining completed")
+            version = self.current_snapshot_version()
+            if not version:
+                logger.info("No model snapshot found")
+                return False
+            path = os.path.join(self.snapshot_dir, version)
+            
+            with open(os.path.join(path, "manifest.json")) as f:
+                manifest = json.load(f)
+            if manifest.get('format_version') != self.snapshot_format_version:
+                logger.warning(f"Ignoring snapshot {version} with format version {manifest.get('format_version')}")
+                return False
+            
+            arrays = {
+                name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r')
+                for name in manifest['arrays']
+            }
+            
+            self.user_item_matrix = csr_matrix(
+                (arrays['user_item.data'], arrays['user_item.indices'], arrays['user_item.indptr']),
+                shape=tuple(manifest['user_item_shape'])
+            )
+            self.user_ids = pd.Index(arrays['user_ids'])
+            self.item_ids = pd.Index(arrays['item_ids'])
+            self.item_popularity = arrays['item_popularity']
+            
+            self.als_model = self.create_als_model()
+            self.als_model.user_factors = arrays['als_user_factors']
+            self.als_model.item_factors = arrays['als_item_factors']
+            self.als_user_ids = pd.Index(arrays['als_user_ids'])
+            self.als_item_ids = pd.Index(arrays['als_item_ids'])
+            
+            if manifest['item_content_shape']:
+                self.item_content_matrix = csr_matrix(
+                    (arrays['item_content.data'], arrays['item_content.indices'], arrays['item_content.indptr']),
+                    shape=tuple(manifest['item_content_shape'])
+                )
+                self.content_item_ids = pd.Index(arrays['content_item_ids'])
+            if 'neighbor_indices' in arrays:
+                self.neighbor_indices = arrays['neighbor_indices']
+                self.neighbor_scores = arrays['neighbor_scores']
+            
+            self.interactions_df = pd.read_pickle(os.path.join(path, "interactions.pkl"))
+            pending_path = os.path.join(path, "pending_interactions.pkl")
+            if os.path.exists(pending_path):
+                self.pending_interactions_df = pd.read_pickle(pending_path)
+            self.content_df = pd.read_pickle(os.path.join(path, "content.pkl"))
+            vectorizers = joblib.load(os.path.join(path, "vectorizer.joblib"))
+            self.content_vectorizer = vectorizers['content_vectorizer']
+            self.feature_scaler = vectorizers['feature_scaler']
+            
+            # KNN models only index the matrix, so refitting is cheap
+            if self.user_item_matrix.nnz > 0:
+                self.user_knn_model = NearestNeighbors(n_neighbors=20, algorithm='auto', metric='cosine')
+                self.user_knn_model.fit(self.user_item_matrix)
+                self.item_knn_model = NearestNeighbors(n_neighbors=20, algorithm='auto', metric='cosine')
+                self.item_knn_model.fit(self.user_item_matrix.T)
+            
+            if manifest['interaction_watermark']:
+                self.interaction_watermark = datetime.fromisoformat(manifest['interaction_watermark'])
+                self.watermark_keys = set(manifest.get('watermark_keys', []))
+            if manifest['last_full_retrain']:
+                self.last_full_retrain = datetime.fromisoformat(manifest['last_full_retrain'])
+            
+            self.snapshot_version = version
+            logger.info(f"Loaded model snapshot {version}")
+            return True
+            
         except Exception as e:
-            logger.error(f"Background model retraining failed: {e}")
+            logger.error(f"Failed to load model snapshot: {e}")
+            return False
 
 # Initialize service
 recommendation_engine = RecommendationEngine()
@@ -926,6 +1727,8 @@ async def get_recommendations(request: RecommendationRequest):
         with recommendation_latency.time():
             # Check cache first
             cache_key = f"recommendations:{request.user_id}:{request.recommendation_type}:{request.limit}"
+            if request.recommendation_type == "hybrid":
+                cache_key += f":{request.diversity_weight}:{request.novelty_weight}"
             cached_result = recommendation_engine.redis_client.get(cache_key)
             
             if cached_result:
@@ -950,7 +1753,9 @@ async def get_recommendations(request: RecommendationRequest):
                 
             elif request.recommendation_type == "hybrid":
                 recommendations = await recommendation_engine.get_hybrid_recommendations(
-                    request.user_id, request.limit
+                    request.user_id, request.limit,
+                    diversity_weight=request.diversity_weight,
+                    novelty_weight=request.novelty_weight
                 )
                 algorithm_used = "hybrid_collaborative_content"
                 
@@ -1018,10 +1823,15 @@ async def get_user_profile(user_id: int):
         locations = {}
         avg_rating = 0
         
-        for interaction in interactions:
-            item_details = await recommendation_engine.get_item_details(
-                interaction['item_id'], interaction['item_type']
+        details_by_type = {}
+        for item_type in set(interaction['item_type'] for interaction in interactions):
+            details_by_type[item_type] = await recommendation_engine.get_items_details(
+                [interaction['item_id'] for interaction in interactions if interaction['item_type'] == item_type],
+                item_type
             )
+        
+        for interaction in interactions:
+            item_details = details_by_type[interaction['item_type']].get(int(interaction['item_id']))
             
             if item_details:
                 # Count industries
@@ -1055,22 +1865,41 @@ async def get_user_profile(user_id: int):
         raise HTTPException(status_code=500, detail="Failed to get user profile")
 
 @app.post("/api/retrain_models")
-async def trigger_model_retraining(background_tasks: BackgroundTasks):
-    """Trigger manual model retraining"""
+async def trigger_model_retraining(background_tasks: BackgroundTasks, full: bool = False):
+    """Trigger manual model retraining (incremental unless full=true)"""
     try:
-        background_tasks.add_task(recommendation_engine.retrain_models_background)
-        return {"status": "success", "message": "Model retraining triggered"}
+        background_tasks.add_task(recommendation_engine.retrain_models_background, full)
+        return {
+            "status": "success",
+            "message": "Model retraining triggered",
+            "mode": "full" if full else "incremental"
+        }
     except Exception as e:
         logger.error(f"Retrain trigger error: {e}")
         raise HTTPException(status_code=500, detail="Failed to trigger retraining")
 
+@app.post("/api/precompute_recommendations")
+async def trigger_precompute(background_tasks: BackgroundTasks):
+    """Recompute the precomputed ALS recommendation table from the current model"""
+    try:
+        if recommendation_engine.als_model is None:
+            raise HTTPException(status_code=409, detail="ALS model not trained yet")
+        
+        background_tasks.add_task(asyncio.to_thread, recommendation_engine.precompute_recommendations)
+        return {"status": "success", "message": "Recommendation precompute triggered"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Precompute trigger error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to trigger precompute")
+
 @app.get("/api/recommendation_stats")
 async def get_recommendation_stats():
     """Get recommendation system statistics"""
     try:
         stats = {
-            "total_users": len(recommendation_engine.user_item_matrix.index) if recommendation_engine.user_item_matrix is not None else 0,
-            "total_items": len(recommendation_engine.user_item_matrix.columns) if recommendation_engine.user_item_matrix is not None else 0,
+            "total_users": len(recommendation_engine.user_ids),
+            "total_items": len(recommendation_engine.item_ids),
             "total_interactions": len(recommendation_engine.interactions_df) if not recommendation_engine.interactions_df.empty else 0,
             "models_trained": {
                 "user_knn": recommendation_engine.user_knn_model is not None,
@@ -1080,6 +1909,8 @@ async def get_recommendation_stats():
             },
             "cache_size": recommendation_engine.redis_client.dbsize(),
             "content_features_shape": list(recommendation_engine.item_content_matrix.shape) if recommendation_engine.item_content_matrix is not None else [0, 0],
+            "snapshot_version": recommendation_engine.snapshot_version,
+            "precomputed_at": recommendation_engine.precomputed_at.isoformat() if recommendation_engine.precomputed_at else None,
             "last_updated": datetime.now().isoformat()
         }
         return stats
@@ -8,18 +8,38 @@ from fastapi import FastAPI, HTTPException, Depends, status, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, validator
 from typing import Optional, List, Dict, Any
+import asyncio
+import base64
+import hashlib
+import logging
+from contextlib import asynccontextmanager
 import asyncpg
+import redis.asyncio as redis
 from datetime import datetime
 import os
 import uuid
 import boto3
 from botocore.exceptions import ClientError
-import requests
+from microservices.shared.utils.token_verifier import token_verifier
 from enum import Enum
 from decimal import Decimal
 import json
 
-app = FastAPI(title="MSME Listing Service", description="MSME Business Listing Management")
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup
+    app.state.redis = redis.from_url(REDIS_URL, decode_responses=True)
+    await listing_counters.start(app.state.redis)
+    await token_verifier.start()
+    yield
+    # Shutdown
+    await token_verifier.stop()
+    await listing_counters.stop()
+    await app.state.redis.close()
+
+app = FastAPI(title="MSME Listing Service", description="MSME Business Listing Management", lifespan=lifespan)
 
 # CORS middleware
 app.add_middleware(
@@ -36,6 +56,9 @@ AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
 AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
 S3_BUCKET_NAME = os.getenv("S3_BUCKET_NAME", "msme-listings")
 AUTH_SERVICE_URL = os.getenv("AUTH_SERVICE_URL", "http://localhost:8001")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+COUNTER_FLUSH_SECONDS = float(os.getenv("COUNTER_FLUSH_SECONDS", "5"))
+LISTING_COUNT_CACHE_SECONDS = int(os.getenv("LISTING_COUNT_CACHE_SECONDS", "60"))
 
 # AWS S3 client
 s3_client = boto3.client(
@@ -49,9 +72,113 @@ s3_client = boto3.client(
 async def get_db_connection():
     return await asyncpg.connect(DATABASE_URL)
 
+class ListingCounters:
+    """Write-behind view and interest counters.
+    
+    Increments go to one Redis hash per column (HINCRBY, field = listing id)
+    and a background task moves them into msme_listings with a single
+    batched UPDATE every COUNTER_FLUSH_SECONDS, so reads never write rows.
+    """
+    
+    COLUMNS = ("view_count", "interest_count")
+    KEY_PREFIX = "listing_counters"
+    
+    def __init__(self):
+        self.redis_client = None
+        self.flush_task = None
+        self.stopping = asyncio.Event()
+    
+    def key(self, column: str) -> str:
+        return f"{self.KEY_PREFIX}:{column}"
+    
+    async def start(self, redis_client):
+        self.redis_client = redis_client
+        self.flush_task = asyncio.create_task(self._flush_periodically())
+    
+    async def stop(self):
+        """Wake the flush task for a final flush and wait for it, never cutting a flush short"""
+        self.stopping.set()
+        if self.flush_task:
+            await self.flush_task
+    
+    async def increment(self, listing_id: int, column: str, amount: int = 1) -> int:
+        """Add to a listing's pending count; returns the new pending value"""
+        return await self.redis_client.hincrby(self.key(column), listing_id, amount)
+    
+    async def record_view(self, listing_id: int) -> Dict[str, int]:
+        """Count a view and return the pending counts from before it, per column"""
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.hincrby(self.key("view_count"), listing_id, 1)
+        pipe.hget(self.key("interest_count"), listing_id)
+        views, interests = await pipe.execute()
+        return {"view_count": views - 1, "interest_count": int(interests or 0)}
+    
+    async def flush(self) -> int:
+        """Apply all pending increments in one UPDATE; returns the number of listings touched"""
+        # Read and clear atomically so increments arriving meanwhile wait for the next flush
+        pipe = self.redis_client.pipeline(transaction=True)
+        for column in self.COLUMNS:
+            pipe.hgetall(self.key(column))
+        for column in self.COLUMNS:
+            pipe.delete(self.key(column))
+        results = await pipe.execute()
+        
+        pending = dict(zip(self.COLUMNS, results[:len(self.COLUMNS)]))
+        listing_ids = sorted({int(listing_id) for counts in pending.values() for listing_id in counts})
+        if not listing_ids:
+            return 0
+        
+        deltas = {
+            column: [int(pending[column].get(str(listing_id), 0)) for listing_id in listing_ids]
+            for column in self.COLUMNS
+        }
+        
+        try:
+            conn = await get_db_connection()
+            try:
+                await conn.execute(
+                    """
+                    UPDATE msme_listings AS l
+                    SET view_count = l.view_count + c.views,
+                        interest_count = l.interest_count + c.interests
+                    FROM unnest($1::int[], $2::bigint[], $3::bigint[]) AS c(id, views, interests)
+                    WHERE l.id = c.id
+                    """,
+                    listing_ids, deltas["view_count"], deltas["interest_count"]
+                )
+            finally:
+                await conn.close()
+        except (Exception, asyncio.CancelledError):
+            # Hand the increments back so the next flush retries them
+            pipe = self.redis_client.pipeline(transaction=False)
+            for column, counts in pending.items():
+                for listing_id, amount in counts.items():
+                    pipe.hincrby(self.key(column), listing_id, int(amount))
+            await pipe.execute()
+            raise
+        
+        return len(listing_ids)
+    
+    async def _flush_periodically(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.stopping.wait(), COUNTER_FLUSH_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            # Checked before flushing: a stop arriving mid-flush gets one more pass
+            final = self.stopping.is_set()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"{'Final counter' if final else 'Counter'} flush failed: {e}")
+            if final:
+                return
+
+listing_counters = ListingCounters()
+
 # Authentication dependency
 async def verify_token(authorization: str = None):
-    """Verify JWT token with auth service"""
+    """Verify JWT token locally against the shared signing key and revocation mirror"""
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -60,24 +187,14 @@ async def verify_token(authorization: str = None):
     
     token = authorization.split(" ")[1]
     
-    try:
-        response = requests.post(
-            f"{AUTH_SERVICE_URL}/validate-token",
-            headers={"Authorization": f"Bearer {token}"}
-        )
-        
-        if response.status_code == 200:
-            return response.json()
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token"
-            )
-    except requests.RequestException:
+    payload = token_verifier.verify(token)
+    if payload is None:
         raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="Auth service unavailable"
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token"
         )
+    
+    return token_verifier.current_user(payload)
 
 # Enums
 class ListingStatus(str, Enum):
@@ -319,6 +436,65 @@ def format_listing(record: dict) -> dict:
         "approved_by": record["approved_by"]
     }
 
+# Columns returned by list views; the JSON blobs, media and contact details
+# are only loaded by GET /listings/{listing_id}
+LISTING_SUMMARY_COLUMNS = [
+    "id", "seller_id", "company_name", "business_type", "industry", "sub_industry",
+    "description", "establishment_year", "city", "state", "country",
+    "asking_price", "negotiable", "tags", "keywords", "featured_image_url",
+    "status", "view_count", "interest_count", "created_at", "updated_at"
+]
+
+def format_listing_summary(record: dict) -> dict:
+    """Format a LISTING_SUMMARY_COLUMNS record to a list view entry"""
+    summary = {column: record[column] for column in LISTING_SUMMARY_COLUMNS}
+    summary["asking_price"] = float(record["asking_price"]) if record["asking_price"] else None
+    return summary
+
+def encode_cursor(record: dict) -> str:
+    """Opaque keyset cursor for the (created_at, id) position of a record"""
+    raw = json.dumps([record["created_at"].isoformat(), record["id"]])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple:
+    """Inverse of encode_cursor"""
+    try:
+        created_at, listing_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), int(listing_id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+async def get_cached_count(conn, filters: Dict[str, Any], where_clause: str, params: list) -> int:
+    """COUNT(*) for a filter set, cached in Redis for LISTING_COUNT_CACHE_SECONDS
+    
+    filters should already be normalised (e.g. lowercased for ILIKE filters)
+    so equivalent requests share a cache entry.
+    """
+    normalized = json.dumps(
+        {key: value for key, value in filters.items() if value is not None},
+        sort_keys=True
+    )
+    cache_key = f"listings:count:{hashlib.sha1(normalized.encode()).hexdigest()}"
+    
+    try:
+        cached = await app.state.redis.get(cache_key)
+        if cached is not None:
+            return int(cached)
+    except Exception as e:
+        logger.warning(f"Listing count cache read failed: {e}")
+    
+    total_count = await conn.fetchval(f"SELECT COUNT(*) FROM msme_listings WHERE {where_clause}", *params)
+    
+    try:
+        await app.state.redis.setex(cache_key, LISTING_COUNT_CACHE_SECONDS, total_count)
+    except Exception as e:
+        logger.warning(f"Listing count cache write failed: {e}")
+    
+    return total_count
+
 # API Endpoints
 
 @app.post("/listings")
@@ -391,22 +567,52 @@ async def get_listing(listing_id: int):
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Listing not found"
             )
-        
-        # Increment view count
-        await conn.execute(
-            "UPDATE msme_listings SET view_count = view_count + 1 WHERE id = $1",
+    finally:
+        await conn.close()
+    
+    result = format_listing(listing)
+    
+    # Views are counted write-behind; include the increments not yet flushed
+    try:
+        pending = await listing_counters.record_view(listing_id)
+        for column, amount in pending.items():
+            result[column] = (result[column] or 0) + amount
+    except Exception as e:
+        logger.warning(f"Failed to record view for listing {listing_id}: {e}")
+    
+    return result
+
+@app.post("/listings/{listing_id}/interest")
+async def express_interest(
+    listing_id: int,
+    current_user: dict = Depends(verify_token)
+):
+    """Register a buyer's interest in a listing"""
+    conn = await get_db_connection()
+    
+    try:
+        exists = await conn.fetchval(
+            "SELECT 1 FROM msme_listings WHERE id = $1",
             listing_id
         )
-        
-        return format_listing(listing)
-        
     finally:
         await conn.close()
+    
+    if not exists:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Listing not found"
+        )
+    
+    await listing_counters.increment(listing_id, "interest_count")
+    
+    return {"message": "Interest recorded successfully"}
 
 @app.get("/listings")
 async def get_listings(
     limit: int = 20,
     offset: int = 0,
+    cursor: Optional[str] = None,
     status: Optional[ListingStatus] = None,
     business_type: Optional[BusinessType] = None,
     industry: Optional[str] = None,
@@ -416,7 +622,12 @@ async def get_listings(
     max_price: Optional[float] = None,
     search: Optional[str] = None
 ):
-    """Get listings with filters"""
+    """Get listings with filters
+    
+    Pages are keyset-paginated on (created_at, id): pass the returned
+    next_cursor to fetch the following page. offset is still honoured
+    when no cursor is given.
+    """
     conn = await get_db_connection()
     
     try:
@@ -435,6 +646,7 @@ async def get_listings(
             params.append(business_type.value)
             param_count += 1
         
+        # Substring filters are backed by trigram indexes
         if industry:
             conditions.append(f"industry ILIKE ${param_count}")
             params.append(f"%{industry}%")
@@ -461,32 +673,61 @@ async def get_listings(
             param_count += 1
         
         if search:
-            conditions.append(f"(company_name ILIKE ${param_count} OR description ILIKE ${param_count} OR ${param_count} = ANY(tags) OR ${param_count} = ANY(keywords))")
-            params.extend([f"%{search}%", f"%{search}%", search, search])
-            param_count += 4
+            conditions.append(
+                f"(company_name ILIKE ${param_count} OR description ILIKE ${param_count}"
+                f" OR tags @> ARRAY[${param_count + 1}] OR keywords @> ARRAY[${param_count + 1}])"
+            )
+            params.extend([f"%{search}%", search])
+            param_count += 2
         
         where_clause = " AND ".join(conditions) if conditions else "TRUE"
+        filter_params = list(params)
         
+        page_conditions = where_clause
+        if cursor:
+            cursor_created_at, cursor_id = decode_cursor(cursor)
+            page_conditions += f" AND (created_at, id) < (${param_count}, ${param_count + 1})"
+            params.extend([cursor_created_at, cursor_id])
+            param_count += 2
+            offset = 0
+        
+        # One extra row tells us whether there is a next page
         query = f"""
-            SELECT * FROM msme_listings 
-            WHERE {where_clause}
-            ORDER BY created_at DESC
+            SELECT {", ".join(LISTING_SUMMARY_COLUMNS)} FROM msme_listings 
+            WHERE {page_conditions}
+            ORDER BY created_at DESC, id DESC
             LIMIT ${param_count} OFFSET ${param_count + 1}
         """
         
-        params.extend([limit, offset])
+        params.extend([limit + 1, offset])
         
         listings = await conn.fetch(query, *params)
+        has_more = len(listings) > limit
+        listings = listings[:limit]
         
         # Get total count
-        count_query = f"SELECT COUNT(*) FROM msme_listings WHERE {where_clause}"
-        total_count = await conn.fetchval(count_query, *params[:-2])
+        total_count = await get_cached_count(
+            conn,
+            {
+                "status": status.value if status else None,
+                "business_type": business_type.value if business_type else None,
+                "industry": industry.lower() if industry else None,
+                "city": city.lower() if city else None,
+                "state": state.lower() if state else None,
+                "min_price": min_price,
+                "max_price": max_price,
+                "search": search
+            },
+            where_clause,
+            filter_params
+        )
         
         return {
-            "listings": [format_listing(listing) for listing in listings],
+            "listings": [format_listing_summary(listing) for listing in listings],
             "total_count": total_count,
             "limit": limit,
-            "offset": offset
+            "offset": offset,
+            "next_cursor": encode_cursor(listings[-1]) if has_more else None
         }
         
     finally:
@@ -1,15 +1,23 @@
+import asyncio
 import boto3
+from botocore.config import Config
+from typing import List
 from ..config import settings
 
+# SES accepts at most 50 recipients per message
+SES_MAX_RECIPIENTS = 50
+
 ses_client = boto3.client(
     "ses",
     region_name=settings.AWS_SES_REGION,
     aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY
+    aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+    config=Config(max_pool_connections=settings.DISPATCH_WORKERS_PER_CHANNEL)
 )
 
 async def send_email_ses(to_email: str, subject: str, body: str):
-    ses_client.send_email(
+    await asyncio.to_thread(
+        ses_client.send_email,
         Source=f"noreply@msmebazaar.com",
         Destination={"ToAddresses": [to_email]},
         Message={
@@ -17,3 +25,15 @@ async def send_email_ses(to_email: str, subject: str, body: str):
             "Body": {"Text": {"Data": body}}
         }
     )
+
+async def send_bulk_email_ses(to_emails: List[str], subject: str, body: str):
+    # One message to up to SES_MAX_RECIPIENTS; Bcc so recipients don't see each other
+    await asyncio.to_thread(
+        ses_client.send_email,
+        Source=f"noreply@msmebazaar.com",
+        Destination={"BccAddresses": to_emails},
+        Message={
+            "Subject": {"Data": subject},
+            "Body": {"Text": {"Data": body}}
+        }
+    )
@@ -1,13 +1,21 @@
-import requests
+import asyncio
+from typing import List, Optional
 from ..config import settings
+from .http_client import http_session
 
-async def send_push_fcm(title: str, body: str):
+# Legacy HTTP API limit for registration_ids in one multicast
+FCM_MAX_TOKENS = 1000
+
+async def send_push_fcm(title: str, body: str, tokens: Optional[List[str]] = None):
     headers = {
         "Authorization": f"key={settings.FCM_SERVER_KEY}",
         "Content-Type": "application/json"
     }
-    payload = {
-        "notification": {"title": title, "body": body},
-        "to": "/topics/all"
-    }
-    requests.post("https://fcm.googleapis.com/fcm/send", json=payload, headers=headers)
+    payload = {"notification": {"title": title, "body": body}}
+    if tokens:
+        payload["registration_ids"] = tokens
+    else:
+        payload["to"] = "/topics/all"
+    await asyncio.to_thread(
+        http_session.post, "https://fcm.googleapis.com/fcm/send", json=payload, headers=headers, timeout=10
+    )
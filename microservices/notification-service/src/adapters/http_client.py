@@ -0,0 +1,9 @@
+import requests
+from requests.adapters import HTTPAdapter
+from ..config import settings
+
+# One keep-alive pool per process for the HTTP providers (FCM, WhatsApp).
+# Sized for every dispatcher worker of a channel posting at once.
+http_session = requests.Session()
+http_session.mount("https://", HTTPAdapter(pool_maxsize=settings.DISPATCH_WORKERS_PER_CHANNEL))
+http_session.mount("http://", HTTPAdapter(pool_maxsize=settings.DISPATCH_WORKERS_PER_CHANNEL))
@@ -1,5 +1,6 @@
-import requests
+import asyncio
 from ..config import settings
+from .http_client import http_session
 
 async def send_whatsapp_message(to_phone: str, message: str):
     headers = {
@@ -12,4 +13,6 @@ async def send_whatsapp_message(to_phone: str, message: str):
         "type": "text",
         "text": {"body": message}
     }
-    requests.post(settings.WHATSAPP_API_URL, json=payload, headers=headers)
+    await asyncio.to_thread(
+        http_session.post, settings.WHATSAPP_API_URL, json=payload, headers=headers, timeout=10
+    )
@@ -1,8 +1,9 @@
+import uuid
 from fastapi import APIRouter, Depends, HTTPException
 from ...models.notification import NotificationRequest
 from ...core.security import verify_jwt
 from ...core.rate_limiter import rate_limiter
-from ...services.notification_dispatcher import NotificationDispatcher
+from ...services.notification_dispatcher import notification_dispatcher, log_dispatch_result
 
 router = APIRouter()
 
@@ -13,8 +14,10 @@ async def send_notification(
     _=Depends(rate_limiter)
 ):
     try:
-        dispatcher = NotificationDispatcher()
-        task_id = await dispatcher.dispatch(payload)
+        # Returns once queued; delivery (which may be deferred by the throttle) goes on in the background
+        task_id = str(uuid.uuid4())
+        future = await notification_dispatcher.submit(payload, task_id=task_id)
+        future.add_done_callback(log_dispatch_result)
         return {"status": "queued", "task_id": task_id}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
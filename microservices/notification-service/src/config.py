@@ -1,3 +1,4 @@
+from typing import Dict
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -22,6 +23,30 @@ class Settings(BaseSettings):
     # Redis / Kafka
     REDIS_URL: str
     KAFKA_BROKER_URL: str
+    KAFKA_NOTIFICATION_TOPIC: str = "notifications"
+    KAFKA_DEAD_LETTER_TOPIC: str = "notifications.dead_letter"
+    KAFKA_CONSUMER_MODE: str = "batched"  # or "simple": one record at a time, auto-commit
+    KAFKA_MAX_BATCH: int = 500
+    KAFKA_MAX_IN_FLIGHT: int = 1000
+    KAFKA_MAX_ATTEMPTS: int = 3
+    KAFKA_POLL_TIMEOUT_MS: int = 1000
+    KAFKA_DRAIN_TIMEOUT_SECONDS: float = 30.0  # wait for in-flight deliveries on rebalance / shutdown
+
+    # Throttling
+    USER_RATE_LIMIT_PER_MINUTE: int = 30
+    PROVIDER_RATES_PER_SECOND: Dict[str, float] = {"twilio": 10, "whatsapp": 80, "ses": 14}
+    RECIPIENT_LIMITS_PER_HOUR: Dict[str, int] = {"sms": 10, "whatsapp": 10, "email": 20}
+    THROTTLE_MAX_WAIT_SECONDS: float = 1.0
+
+    # Celery
+    CELERY_BROKER_URL: str = "redis://localhost:6379/1"
+    CELERY_RESULT_BACKEND: str = "redis://localhost:6379/2"
+    CELERY_TASK_TIMEOUT: int = 120
+
+    # Dispatcher
+    DISPATCH_WORKERS_PER_CHANNEL: int = 8
+    DISPATCH_QUEUE_SIZE: int = 1000
+    DISPATCH_BATCH_SIZE: int = 50
 
     # Database
     DATABASE_URL: str
@@ -8,6 +8,14 @@ class ChannelDeliveryError(NotificationServiceError):
         self.channel = channel
         super().__init__(f"[{channel}] {message}")
 
+class DispatchError(NotificationServiceError):
+    """Raised when one or more channels of a notification failed; the others were still sent."""
+    def __init__(self, task_id: str, failures: dict, delivered: list):
+        self.task_id = task_id
+        self.failures = failures
+        self.delivered = delivered
+        super().__init__("; ".join(f"[{channel}] {error}" for channel, error in failures.items()))
+
 class InvalidNotificationPayload(NotificationServiceError):
     """Raised when a notification payload is invalid."""
     pass
@@ -1,24 +1,116 @@
-import time
-import redis
+import math
+import hashlib
+from typing import Dict, Optional, Tuple
+import redis.asyncio as aioredis
+from redis.exceptions import NoScriptError, RedisError
 from fastapi import Depends, HTTPException
 from ..config import settings
+from .security import verify_jwt
+from .logger import configure_logging
 
-# Simple Redis connection
-r = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+logger = configure_logging()
 
-def rate_limiter(user: dict = Depends(lambda: {"sub": "anonymous"})):
-    """Allow max 30 notifications/minute per user."""
-    user_id = user.get("sub", "anonymous")
-    key = f"rate_limit:{user_id}"
-    now = int(time.time())
+# GCRA token bucket in one round trip. KEYS[1] holds the bucket's theoretical
+# arrival time (TAT, microseconds). ARGV: interval per token, burst (bucket
+# size), cost (tokens wanted), max_delay the caller is willing to wait; times
+# in microseconds. Returns {allowed, delay}: allowed with a delay reserves the
+# tokens for that moment; not allowed reserves nothing and delay is when to
+# come back. The TAT is written with %.0f; Lua's default %.14g would round it.
+GCRA_SCRIPT = """
+local t = redis.call('TIME')
+local now = t[1] * 1000000 + t[2]
+local interval = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local max_delay = tonumber(ARGV[4])
 
-    count = r.get(key)
-    if count and int(count) >= 30:
-        raise HTTPException(status_code=429, detail="Rate limit exceeded")
+local tat = math.max(tonumber(redis.call('GET', KEYS[1]) or now), now)
+local new_tat = tat + interval * cost
+local delay = new_tat - interval * burst - now
+if delay > max_delay then
+    return {0, delay}
+end
+redis.call('SET', KEYS[1], string.format('%.0f', new_tat), 'PX', math.ceil((new_tat - now) / 1000) + 1000)
+return {1, math.max(delay, 0)}
+"""
 
-    pipe = r.pipeline()
-    pipe.incr(key, 1)
-    pipe.expire(key, 60)
-    pipe.execute()
+# Which provider quota each channel draws from
+CHANNEL_PROVIDERS = {"sms": "twilio", "whatsapp": "whatsapp", "email": "ses", "push": "fcm"}
 
+class NotificationThrottle:
+    """
+    Async token buckets in Redis, shared by every worker and replica.
+
+    Provider buckets pace sends to the provider's quota (PROVIDER_RATES_PER_SECOND):
+    a worker waits up to THROTTLE_MAX_WAIT_SECONDS for its slot, and work
+    further out is handed back to be rescheduled. Recipient buckets
+    (RECIPIENT_LIMITS_PER_HOUR) cap how often one person is notified on a
+    channel; a notification over that cap is rescheduled for when it fits.
+    Nothing over quota is rejected. Redis errors fail open.
+    """
+
+    def __init__(self, redis_url: str = settings.REDIS_URL):
+        self.redis = aioredis.from_url(redis_url)
+        self.sha: Optional[str] = None
+
+    async def reserve_provider(self, channel: str, cost: int = 1) -> Tuple[bool, float]:
+        """
+        Take cost tokens from the channel's provider bucket. Returns (reserved,
+        delay): if reserved, send after delay seconds; otherwise retry after it.
+        """
+        provider = CHANNEL_PROVIDERS.get(channel)
+        rate = settings.PROVIDER_RATES_PER_SECOND.get(provider)
+        if not rate:
+            return True, 0.0
+        burst = max(1, int(rate))
+        interval = 1000000 / rate
+        # A batch bigger than the bucket can never start sooner than this
+        max_wait = max(settings.THROTTLE_MAX_WAIT_SECONDS * 1000000, (cost - burst) * interval)
+        return await self._take(f"throttle:provider:{provider}", interval, burst, cost, max_wait)
+
+    async def check_recipient(self, channel: str, recipient: Optional[str]) -> float:
+        """Count one notification to recipient on channel; returns 0, or seconds until it fits"""
+        limit = settings.RECIPIENT_LIMITS_PER_HOUR.get(channel)
+        if not limit or not recipient:
+            return 0.0
+        # Key on a hash so phone numbers and addresses don't appear in Redis
+        digest = hashlib.sha256(recipient.encode()).hexdigest()
+        allowed, delay = await self._take(
+            f"throttle:recipient:{channel}:{digest}", 3600 * 1000000 / limit, limit, 1, 0
+        )
+        return 0.0 if allowed else delay
+
+    async def check_user(self, user_id: str) -> float:
+        """Count one API submission by user_id; returns 0, or seconds until allowed"""
+        limit = settings.USER_RATE_LIMIT_PER_MINUTE
+        allowed, delay = await self._take(f"throttle:user:{user_id}", 60 * 1000000 / limit, limit, 1, 0)
+        return 0.0 if allowed else delay
+
+    async def _take(self, key: str, interval: float, burst: int, cost: int, max_delay: float) -> Tuple[bool, float]:
+        args = (math.ceil(interval), burst, cost, math.ceil(max_delay))
+        try:
+            if self.sha is None:
+                self.sha = await self.redis.script_load(GCRA_SCRIPT)
+            try:
+                allowed, delay = await self.redis.evalsha(self.sha, 1, key, *args)
+            except NoScriptError:
+                self.sha = await self.redis.script_load(GCRA_SCRIPT)
+                allowed, delay = await self.redis.evalsha(self.sha, 1, key, *args)
+        except RedisError as e:
+            logger.warning(f"Throttle unavailable, not limiting {key}: {e}")
+            return True, 0.0
+        return bool(allowed), delay / 1000000
+
+# Shared throttle for the dispatcher and the API
+notification_throttle = NotificationThrottle()
+
+async def rate_limiter(user: Dict = Depends(verify_jwt)):
+    """Allow USER_RATE_LIMIT_PER_MINUTE notification requests per user."""
+    retry_after = await notification_throttle.check_user(str(user.get("sub", "anonymous")))
+    if retry_after:
+        raise HTTPException(
+            status_code=429,
+            detail="Rate limit exceeded",
+            headers={"Retry-After": str(math.ceil(retry_after))}
+        )
     return True
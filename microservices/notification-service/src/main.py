@@ -3,6 +3,7 @@ from prometheus_fastapi_instrumentator import Instrumentator
 from .config import settings
 from .core.logger import configure_logging
 from .api.routes import notifications, status
+from .services.notification_dispatcher import notification_dispatcher
 
 # Configure logging
 logger = configure_logging()
@@ -23,8 +24,10 @@ Instrumentator().instrument(app).expose(app)
 
 @app.on_event("startup")
 async def startup_event():
+    notification_dispatcher.start()
     logger.info("Notification Service started", extra={"env": settings.ENVIRONMENT})
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Notification Service shutting down")
+    await notification_dispatcher.stop()
@@ -5,6 +5,7 @@ class NotificationRequest(BaseModel):
     channels: List[str] = Field(..., example=["email", "sms"])
     recipient_email: Optional[EmailStr] = None
     recipient_phone: Optional[str] = None
+    recipient_device_tokens: Optional[List[str]] = None
     title: Optional[str] = None
     message: str
     template_id: Optional[str] = None
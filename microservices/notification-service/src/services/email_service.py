@@ -1,4 +1,5 @@
-from ..adapters.aws_ses_adapter import send_email_ses
+from typing import List, Optional
+from ..adapters.aws_ses_adapter import send_email_ses, send_bulk_email_ses, SES_MAX_RECIPIENTS
 from ..models.notification import NotificationRequest
 from ..core.logger import configure_logging
 
@@ -14,3 +15,28 @@ class EmailService:
             subject=payload.title or "Notification",
             body=payload.message
         )
+
+    async def send_batch(self, payloads: List[NotificationRequest]) -> List[Optional[Exception]]:
+        """Send identical emails as one SES message per SES_MAX_RECIPIENTS; returns an error (or None) per payload"""
+        errors: List[Optional[Exception]] = [None] * len(payloads)
+        groups = {}
+        for i, payload in enumerate(payloads):
+            if not payload.recipient_email:
+                errors[i] = ValueError("Missing recipient_email for email notification")
+                continue
+            groups.setdefault((payload.title or "Notification", payload.message), []).append(i)
+
+        for (subject, body), indexes in groups.items():
+            for start in range(0, len(indexes), SES_MAX_RECIPIENTS):
+                chunk = indexes[start:start + SES_MAX_RECIPIENTS]
+                recipients = [payloads[i].recipient_email for i in chunk]
+                logger.info("Sending email batch", extra={"recipients": len(recipients)})
+                try:
+                    if len(recipients) == 1:
+                        await send_email_ses(to_email=recipients[0], subject=subject, body=body)
+                    else:
+                        await send_bulk_email_ses(to_emails=recipients, subject=subject, body=body)
+                except Exception as e:
+                    for i in chunk:
+                        errors[i] = e
+        return errors
@@ -1,29 +1,211 @@
 import uuid
+import time
+import asyncio
+from typing import Dict, List, Optional, Set
+from ..config import settings
 from ..services.email_service import EmailService
 from ..services.sms_service import SMSService
 from ..services.whatsapp_service import WhatsAppService
 from ..services.push_service import PushService
 from ..services.inapp_service import InAppService
-from ..core.exceptions import ChannelDeliveryError
+from ..core.exceptions import ChannelDeliveryError, DispatchError
+from ..core.rate_limiter import NotificationThrottle, notification_throttle
+from ..core.logger import configure_logging
+from ..telemetry.metrics import record_notification_sent, record_latency, record_throttled
+
+logger = configure_logging()
+
+def log_dispatch_result(future: asyncio.Future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.error(f"Notification dispatch failed: {future.exception()}")
 
 class NotificationDispatcher:
-    def __init__(self):
-        self.channel_map = {
+    """
+    Long-lived dispatcher with a bounded queue and a pool of workers per channel.
+
+    A notification is queued on each of its channels at once, so channels are
+    sent concurrently and one failing channel no longer stops the others.
+    Workers for services with send_batch (email, push) take whatever else is
+    already queued, up to DISPATCH_BATCH_SIZE, and hand it over as one batch.
+    With a throttle, workers pace each batch to the provider's quota and put
+    back, for later, whatever is over a provider or recipient limit.
+    """
+
+    def __init__(
+        self,
+        channel_map: Optional[Dict[str, object]] = None,
+        workers_per_channel: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        throttle: Optional[NotificationThrottle] = None,
+    ):
+        self.channel_map = channel_map or {
             "email": EmailService(),
             "sms": SMSService(),
             "whatsapp": WhatsAppService(),
             "push": PushService(),
             "inapp": InAppService(),
         }
+        self.workers_per_channel = workers_per_channel or settings.DISPATCH_WORKERS_PER_CHANNEL
+        self.queue_size = queue_size or settings.DISPATCH_QUEUE_SIZE
+        self.batch_size = batch_size or settings.DISPATCH_BATCH_SIZE
+        self.throttle = throttle
+        self.queues: Dict[str, asyncio.Queue] = {}
+        self.workers: List[asyncio.Task] = []
+        self.deferred: Set[asyncio.Task] = set()
+        self.recipient_cleared: Set[asyncio.Future] = set()  # deferred for the provider only
+
+    def start(self):
+        """Start the worker pools on the running event loop (no-op if running)"""
+        if self.workers:
+            return
+        for channel, service in self.channel_map.items():
+            queue = asyncio.Queue(maxsize=self.queue_size)
+            self.queues[channel] = queue
+            for _ in range(self.workers_per_channel):
+                self.workers.append(asyncio.create_task(self._work(channel, service, queue)))
+
+    async def stop(self):
+        """Finish what is queued (including deferred work), then stop the workers"""
+        while True:
+            for queue in self.queues.values():
+                await queue.join()
+            if not self.deferred:
+                break
+            await asyncio.gather(*list(self.deferred))
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        self.queues = {}
 
-    async def dispatch(self, payload):
-        task_id = str(uuid.uuid4())
-        for channel in payload.channels:
-            service = self.channel_map.get(channel)
-            if not service:
+    async def submit(self, payload, task_id: Optional[str] = None) -> asyncio.Future:
+        """
+        Queue a notification on all its channels, waiting only for queue space.
+        The returned future resolves to the task id once every channel has been
+        tried, or raises DispatchError naming the channels that failed.
+        """
+        channels = list(dict.fromkeys(payload.channels))
+        for channel in channels:
+            if channel not in self.channel_map:
                 raise ChannelDeliveryError(channel, "Unsupported channel")
+
+        self.start()
+        loop = asyncio.get_running_loop()
+        futures = {}
+        for channel in channels:
+            futures[channel] = loop.create_future()
+            await self.queues[channel].put((payload, futures[channel]))
+        return asyncio.ensure_future(self._collect(task_id or str(uuid.uuid4()), futures))
+
+    async def dispatch(self, payload) -> str:
+        return await (await self.submit(payload))
+
+    async def _collect(self, task_id: str, futures: Dict[str, asyncio.Future]) -> str:
+        results = await asyncio.gather(*futures.values(), return_exceptions=True)
+        failures = {
+            channel: str(result)
+            for channel, result in zip(futures, results)
+            if isinstance(result, BaseException)
+        }
+        if failures:
+            raise DispatchError(task_id, failures, [channel for channel in futures if channel not in failures])
+        return task_id
+
+    async def _work(self, channel: str, service, queue: asyncio.Queue):
+        batching = hasattr(service, "send_batch")
+        while True:
+            batch = [await queue.get()]
+            if batching:
+                while len(batch) < self.batch_size and not queue.empty():
+                    batch.append(queue.get_nowait())
+            if self.throttle is not None:
+                batch = await self._throttle(channel, queue, batch)
+                if not batch:
+                    continue
+
+            started = time.perf_counter()
             try:
-                await service.send(payload)
+                if len(batch) == 1:
+                    errors = [await self._send_one(service, batch[0][0])]
+                else:
+                    errors = await service.send_batch([payload for payload, _ in batch])
             except Exception as e:
-                raise ChannelDeliveryError(channel, str(e))
-        return task_id
+                errors = [e] * len(batch)
+            record_latency(channel, time.perf_counter() - started)
+
+            for (_, future), error in zip(batch, errors):
+                if future.done():
+                    continue
+                if error is None:
+                    future.set_result(None)
+                    record_notification_sent(channel)
+                else:
+                    future.set_exception(ChannelDeliveryError(channel, str(error)))
+            for _ in batch:
+                queue.task_done()
+
+    async def _throttle(self, channel: str, queue: asyncio.Queue, batch: list) -> list:
+        """
+        Defer items over their recipient's limit, then wait for the provider
+        slot of the rest; returns the items that may be sent now
+        """
+        ready = []
+        for item in batch:
+            if item[1] in self.recipient_cleared:
+                # Counted against its recipient before the provider deferred it
+                self.recipient_cleared.discard(item[1])
+                ready.append(item)
+                continue
+            wait = await self.throttle.check_recipient(channel, self._recipient(channel, item[0]))
+            if wait:
+                record_throttled(channel, "recipient", 1)
+                self._defer(queue, [item], wait)
+            else:
+                ready.append(item)
+        if not ready:
+            return []
+
+        reserved, delay = await self.throttle.reserve_provider(channel, cost=len(ready))
+        if not reserved:
+            record_throttled(channel, "provider", len(ready))
+            self.recipient_cleared.update(future for _, future in ready)
+            self._defer(queue, ready, delay)
+            return []
+
+        if delay:
+            await asyncio.sleep(delay)
+        return ready
+
+    @staticmethod
+    def _recipient(channel: str, payload) -> Optional[str]:
+        if channel == "email":
+            return payload.recipient_email
+        if channel in ("sms", "whatsapp"):
+            return payload.recipient_phone
+        return None
+
+    def _defer(self, queue: asyncio.Queue, items: list, delay: float):
+        """Put items back on the queue after delay seconds; their futures stay pending"""
+        task = asyncio.create_task(self._requeue(queue, items, delay))
+        self.deferred.add(task)
+        task.add_done_callback(self.deferred.discard)
+        for _ in items:
+            queue.task_done()
+
+    @staticmethod
+    async def _requeue(queue: asyncio.Queue, items: list, delay: float):
+        await asyncio.sleep(delay)
+        for item in items:
+            await queue.put(item)
+
+    @staticmethod
+    async def _send_one(service, payload) -> Optional[Exception]:
+        try:
+            await service.send(payload)
+            return None
+        except Exception as e:
+            return e
+
+# Shared dispatcher; its workers start on the first submit or at app startup
+notification_dispatcher = NotificationDispatcher(throttle=notification_throttle)
@@ -1,4 +1,5 @@
-from ..adapters.fcm_adapter import send_push_fcm
+from typing import List, Optional
+from ..adapters.fcm_adapter import send_push_fcm, FCM_MAX_TOKENS
 from ..models.notification import NotificationRequest
 from ..core.logger import configure_logging
 
@@ -9,5 +10,36 @@ class PushService:
         logger.info("Sending Push notification")
         await send_push_fcm(
             title=payload.title or "Notification",
-            body=payload.message
+            body=payload.message,
+            tokens=payload.recipient_device_tokens
         )
+
+    async def send_batch(self, payloads: List[NotificationRequest]) -> List[Optional[Exception]]:
+        """Merge device-targeted pushes with identical content into FCM multicasts; returns an error (or None) per payload"""
+        errors: List[Optional[Exception]] = [None] * len(payloads)
+        groups = {}
+        for i, payload in enumerate(payloads):
+            if payload.recipient_device_tokens:
+                groups.setdefault((payload.title or "Notification", payload.message), []).append(i)
+            else:
+                # Topic pushes are sent as they are
+                error = None
+                try:
+                    await self.send(payload)
+                except Exception as e:
+                    error = e
+                errors[i] = error
+
+        for (title, body), indexes in groups.items():
+            tokens, owners = [], []
+            for i in indexes:
+                tokens.extend(payloads[i].recipient_device_tokens)
+                owners.extend([i] * len(payloads[i].recipient_device_tokens))
+            logger.info("Sending Push multicast", extra={"tokens": len(tokens)})
+            for start in range(0, len(tokens), FCM_MAX_TOKENS):
+                try:
+                    await send_push_fcm(title=title, body=body, tokens=tokens[start:start + FCM_MAX_TOKENS])
+                except Exception as e:
+                    for i in set(owners[start:start + FCM_MAX_TOKENS]):
+                        errors[i] = e
+        return errors
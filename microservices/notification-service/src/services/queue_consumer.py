@@ -1,18 +1,216 @@
+import time
 import asyncio
 import json
+from typing import Dict, Optional
 import aiokafka
+from aiokafka import ConsumerRebalanceListener
 import redis.asyncio as aioredis
 from ..config import settings
-from ..services.notification_dispatcher import NotificationDispatcher
+from ..services.notification_dispatcher import notification_dispatcher, log_dispatch_result
 from ..models.notification import NotificationRequest
+from ..core.exceptions import DispatchError
 from ..core.logger import configure_logging
+from ..telemetry.metrics import (
+    record_kafka_batch,
+    record_kafka_message,
+    record_kafka_lag,
+    KAFKA_IN_FLIGHT,
+)
 
 logger = configure_logging()
 
+async def submit_notification(payload: NotificationRequest):
+    # Waits only for queue space, so a broadcast no longer holds up consumption
+    future = await notification_dispatcher.submit(payload)
+    future.add_done_callback(log_dispatch_result)
+
+class PartitionOffsets:
+    """In-flight offsets of one partition; everything below the lowest one is done"""
+
+    def __init__(self):
+        self.pending = set()
+        self.highest_seen: Optional[int] = None
+        self.committed: Optional[int] = None
+
+    def add(self, offset: int):
+        if self.committed is None:
+            self.committed = offset  # where this consumer picked the partition up
+        self.pending.add(offset)
+        self.highest_seen = offset
+
+    def done(self, offset: int):
+        self.pending.discard(offset)
+
+    def committable(self) -> Optional[int]:
+        if self.pending:
+            return min(self.pending)
+        return None if self.highest_seen is None else self.highest_seen + 1
+
+class BatchedKafkaConsumer(ConsumerRebalanceListener):
+    """
+    Fetches with getmany and submits up to KAFKA_MAX_IN_FLIGHT messages at
+    once. A message is done once its delivery has settled: every channel was
+    sent, or channels that kept failing after KAFKA_MAX_ATTEMPTS had the
+    message moved to KAFKA_DEAD_LETTER_TOPIC. Offsets are committed manually,
+    only up to the lowest message not yet done, so nothing is committed that
+    a crash could lose. Messages with the same key (the record key, else the
+    recipient) are delivered in order: each waits for the previous one to
+    settle before it is submitted.
+
+    The in-flight slot is given back once the dispatcher has queued the
+    message, so sends the throttle defers don't stop polling; they only hold
+    their partition's commit. On a rebalance or shutdown, what hasn't settled
+    within KAFKA_DRAIN_TIMEOUT_SECONDS is left uncommitted and redelivered.
+    """
+
+    def __init__(self, consumer: aiokafka.AIOKafkaConsumer, producer: aiokafka.AIOKafkaProducer):
+        self.consumer = consumer
+        self.producer = producer
+        self.in_flight = asyncio.Semaphore(settings.KAFKA_MAX_IN_FLIGHT)
+        self.offsets: Dict[aiokafka.TopicPartition, PartitionOffsets] = {}
+        self.key_tails: Dict[object, asyncio.Task] = {}  # last task per key
+        self.tasks = set()
+        self.holding = set()  # tasks still holding an in-flight slot
+
+    async def run(self):
+        while True:
+            batches = await self.consumer.getmany(
+                timeout_ms=settings.KAFKA_POLL_TIMEOUT_MS,
+                max_records=settings.KAFKA_MAX_BATCH
+            )
+            for tp, records in batches.items():
+                record_kafka_batch(len(records))
+                tracker = self.offsets.setdefault(tp, PartitionOffsets())
+                for record in records:
+                    await self.in_flight.acquire()
+                    tracker.add(record.offset)
+                    self._spawn(tp, record)
+            await self.commit()
+
+    async def drain(self, timeout: Optional[float] = None):
+        """
+        Wait up to timeout seconds for messages in flight to settle, commit
+        what did, and stop waiting on the rest (their offsets stay uncommitted)
+        """
+        if self.tasks:
+            _, unsettled = await asyncio.wait(list(self.tasks), timeout=timeout)
+            for task in unsettled:
+                task.cancel()
+            if unsettled:
+                logger.warning(f"{len(unsettled)} notifications not settled, leaving them uncommitted")
+                await asyncio.gather(*unsettled, return_exceptions=True)
+        await self.commit()
+
+    async def commit(self):
+        offsets = {}
+        for tp, tracker in self.offsets.items():
+            offset = tracker.committable()
+            if offset is not None and offset != tracker.committed:
+                offsets[tp] = offset
+        if offsets:
+            await self.consumer.commit(offsets)
+            for tp, offset in offsets.items():
+                self.offsets[tp].committed = offset
+
+        for tp, tracker in self.offsets.items():
+            highwater = self.consumer.highwater(tp)
+            if highwater is not None and tracker.committed is not None:
+                record_kafka_lag(tp.partition, highwater - tracker.committed)
+
+    async def on_partitions_revoked(self, revoked):
+        await self.drain(settings.KAFKA_DRAIN_TIMEOUT_SECONDS)
+        for tp in revoked:
+            self.offsets.pop(tp, None)
+
+    async def on_partitions_assigned(self, assigned):
+        pass
+
+    def _spawn(self, tp, record):
+        try:
+            payload = NotificationRequest(**json.loads(record.value.decode()))
+            key = record.key or payload.recipient_phone or payload.recipient_email
+        except Exception as e:
+            payload, key = e, None
+
+        previous = self.key_tails.get(key) if key else None
+        task = asyncio.create_task(self._process(tp, record, payload, previous))
+        if key:
+            self.key_tails[key] = task
+        self.tasks.add(task)
+        self.holding.add(task)
+        KAFKA_IN_FLIGHT.inc()
+        task.add_done_callback(lambda t: self._on_done(key, t))
+
+    def _release(self, task: asyncio.Task):
+        if task in self.holding:
+            self.holding.discard(task)
+            self.in_flight.release()
+
+    def _on_done(self, key, task: asyncio.Task):
+        if key and self.key_tails.get(key) is task:
+            del self.key_tails[key]
+        self.tasks.discard(task)
+        self._release(task)
+        KAFKA_IN_FLIGHT.dec()
+
+    async def _process(self, tp, record, payload, previous: Optional[asyncio.Task]):
+        if previous is not None:
+            await asyncio.wait([previous])
+
+        started = time.perf_counter()
+        outcome = "success"
+        try:
+            if isinstance(payload, Exception):
+                raise payload
+            future = await notification_dispatcher.submit(payload)
+            # Queued: let polling go on while delivery settles
+            self._release(asyncio.current_task())
+            await self._settle(payload, future)
+        except Exception as e:
+            outcome = "dead_lettered"
+            await self._dead_letter(record, e)
+        tracker = self.offsets.get(tp)
+        if tracker is not None:
+            tracker.done(record.offset)
+        record_kafka_message(outcome, time.perf_counter() - started)
+
+    async def _settle(self, payload: NotificationRequest, future: asyncio.Future):
+        """Wait for delivery, retrying only the channels that failed"""
+        for attempt in range(settings.KAFKA_MAX_ATTEMPTS):
+            try:
+                return await future
+            except DispatchError as e:
+                if attempt == settings.KAFKA_MAX_ATTEMPTS - 1:
+                    raise
+                payload = payload.model_copy(update={"channels": list(e.failures)})
+                await asyncio.sleep(2 ** attempt)
+                future = await notification_dispatcher.submit(payload)
+
+    async def _dead_letter(self, record, error: Exception):
+        logger.error(f"Dead-lettering notification at offset {record.offset}: {error}")
+        delay = 1
+        while True:
+            try:
+                await self.producer.send_and_wait(
+                    settings.KAFKA_DEAD_LETTER_TOPIC,
+                    record.value,
+                    key=record.key,
+                    headers=[("error", str(error).encode())]
+                )
+                return
+            except Exception as e:
+                # The offset must not be committed until the message is safe somewhere
+                logger.error(f"Dead-letter publish failed, retrying in {delay}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 60)
+
 async def consume_kafka():
+    if settings.KAFKA_CONSUMER_MODE == "batched":
+        return await consume_kafka_batched()
+
     consumer = aiokafka.AIOKafkaConsumer(
         settings.KAFKA_NOTIFICATION_TOPIC,
-        bootstrap_servers=settings.KAFKA_BOOTSTRAP_SERVERS,
+        bootstrap_servers=settings.KAFKA_BROKER_URL,
         group_id="notification_service"
     )
     await consumer.start()
@@ -20,10 +218,28 @@ async def consume_kafka():
         async for msg in consumer:
             payload_dict = json.loads(msg.value.decode())
             payload = NotificationRequest(**payload_dict)
-            dispatcher = NotificationDispatcher()
-            await dispatcher.dispatch(payload)
+            await submit_notification(payload)
+    finally:
+        await consumer.stop()
+
+async def consume_kafka_batched():
+    consumer = aiokafka.AIOKafkaConsumer(
+        bootstrap_servers=settings.KAFKA_BROKER_URL,
+        group_id="notification_service",
+        enable_auto_commit=False,
+        max_poll_records=settings.KAFKA_MAX_BATCH
+    )
+    producer = aiokafka.AIOKafkaProducer(bootstrap_servers=settings.KAFKA_BROKER_URL)
+    runner = BatchedKafkaConsumer(consumer, producer)
+    consumer.subscribe([settings.KAFKA_NOTIFICATION_TOPIC], listener=runner)
+    await producer.start()
+    await consumer.start()
+    try:
+        await runner.run()
     finally:
+        await runner.drain(settings.KAFKA_DRAIN_TIMEOUT_SECONDS)
         await consumer.stop()
+        await producer.stop()
 
 async def consume_redis():
     redis_conn = aioredis.from_url(settings.REDIS_URL)
@@ -33,8 +249,7 @@ async def consume_redis():
         if message["type"] == "message":
             payload_dict = json.loads(message["data"])
             payload = NotificationRequest(**payload_dict)
-            dispatcher = NotificationDispatcher()
-            await dispatcher.dispatch(payload)
+            await submit_notification(payload)
 
 async def start_consumers():
     await asyncio.gather(
@@ -1,4 +1,4 @@
-from prometheus_client import Counter, Histogram
+from prometheus_client import Counter, Gauge, Histogram
 
 NOTIFICATIONS_SENT = Counter(
     "notifications_sent_total", "Total notifications sent", ["channel"]
@@ -7,8 +7,42 @@ NOTIFICATION_LATENCY = Histogram(
     "notification_send_latency_seconds", "Latency for sending notifications", ["channel"]
 )
 
+NOTIFICATIONS_THROTTLED = Counter(
+    "notifications_throttled_total", "Notifications deferred by a provider or recipient limit", ["channel", "limit"]
+)
+
+KAFKA_MESSAGES = Counter(
+    "notification_kafka_messages_total", "Kafka notification messages processed", ["outcome"]
+)
+KAFKA_PROCESSING_LATENCY = Histogram(
+    "notification_kafka_processing_seconds", "Time to dispatch (or dead-letter) a Kafka message"
+)
+KAFKA_BATCH_SIZE = Histogram(
+    "notification_kafka_batch_size", "Records per partition in a getmany batch",
+    buckets=(1, 10, 50, 100, 250, 500, 1000)
+)
+KAFKA_IN_FLIGHT = Gauge(
+    "notification_kafka_in_flight", "Kafka messages being dispatched"
+)
+KAFKA_CONSUMER_LAG = Gauge(
+    "notification_kafka_consumer_lag", "Messages between the committed offset and the high watermark", ["partition"]
+)
+
 def record_notification_sent(channel: str):
     NOTIFICATIONS_SENT.labels(channel=channel).inc()
 
 def record_latency(channel: str, seconds: float):
     NOTIFICATION_LATENCY.labels(channel=channel).observe(seconds)
+
+def record_throttled(channel: str, limit: str, count: int):
+    NOTIFICATIONS_THROTTLED.labels(channel=channel, limit=limit).inc(count)
+
+def record_kafka_batch(size: int):
+    KAFKA_BATCH_SIZE.observe(size)
+
+def record_kafka_message(outcome: str, seconds: float):
+    KAFKA_MESSAGES.labels(outcome=outcome).inc()
+    KAFKA_PROCESSING_LATENCY.observe(seconds)
+
+def record_kafka_lag(partition: int, lag: int):
+    KAFKA_CONSUMER_LAG.labels(partition=str(partition)).set(lag)
@@ -1,7 +1,15 @@
+import os
+import time
+import asyncio
+import threading
+import concurrent.futures
+from typing import List, Optional
 from celery import Celery
+from celery.signals import worker_process_init, worker_process_shutdown
 from ..config import settings
-from ..services.notification_dispatcher import NotificationDispatcher
+from ..services.notification_dispatcher import NotificationDispatcher, notification_dispatcher
 from ..models.notification import NotificationRequest
+from ..core.exceptions import DispatchError
 from ..core.logger import configure_logging
 
 logger = configure_logging()
@@ -12,12 +20,165 @@ celery_app = Celery(
     backend=settings.CELERY_RESULT_BACKEND
 )
 
+class WorkerRuntime:
+    """
+    One asyncio loop per worker process, running in a background thread.
+
+    Tasks hand their coroutines to that loop instead of building a loop and a
+    dispatcher each, so the dispatcher's worker pools, and the provider
+    clients behind them, live as long as the process does. Because every
+    task shares the dispatcher, concurrent tasks (threads pool, or the batch
+    task) are merged into provider batches like API traffic is.
+    """
+
+    def __init__(self, dispatcher: NotificationDispatcher):
+        self.dispatcher = dispatcher
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread: Optional[threading.Thread] = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        """Start the loop and the dispatcher (no-op if running)"""
+        with self.lock:
+            if self.loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="notification-loop", daemon=True)
+            thread.start()
+
+            async def start_dispatcher():
+                self.dispatcher.start()
+
+            asyncio.run_coroutine_threadsafe(start_dispatcher(), loop).result()
+            self.loop, self.thread = loop, thread
+
+    def stop(self):
+        """Finish queued notifications, then stop the loop"""
+        with self.lock:
+            if self.loop is None:
+                return
+            asyncio.run_coroutine_threadsafe(self.dispatcher.stop(), self.loop).result(settings.CELERY_TASK_TIMEOUT)
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+            self.loop.close()
+            self.loop, self.thread = None, None
+
+    def run(self, coro, timeout: Optional[float] = None):
+        """Run a coroutine on the worker loop and wait for its result; cancel it on timeout"""
+        self.start()
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return future.result(timeout or settings.CELERY_TASK_TIMEOUT)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+runtime = WorkerRuntime(notification_dispatcher)
+
+@worker_process_init.connect
+def start_runtime(**kwargs):
+    # After the fork: the loop thread and pooled connections belong to the child
+    runtime.start()
+
+@worker_process_shutdown.connect
+def stop_runtime(**kwargs):
+    runtime.stop()
+
+def failed_channels_only(payload_dict: dict, error: DispatchError) -> dict:
+    """The same notification, narrowed to the channels that failed"""
+    return {**payload_dict, "channels": list(error.failures)}
+
 @celery_app.task(bind=True, max_retries=3)
 def process_notification(self, payload_dict: dict):
     try:
         payload = NotificationRequest(**payload_dict)
-        dispatcher = NotificationDispatcher()
-        return celery_app.loop.run_until_complete(dispatcher.dispatch(payload))
+        return runtime.run(runtime.dispatcher.dispatch(payload))
+    except DispatchError as e:
+        logger.error(f"Celery task failed: {e}")
+        # Channels that were delivered are not sent again
+        raise self.retry(exc=e, args=(failed_channels_only(payload_dict, e),), countdown=2 ** self.request.retries)
+    except concurrent.futures.TimeoutError:
+        # The channels are already queued and may still go out; a retry could send them twice
+        logger.error(f"Celery task timed out after {settings.CELERY_TASK_TIMEOUT}s, not retrying")
+        raise
     except Exception as e:
         logger.error(f"Celery task failed: {e}")
         raise self.retry(exc=e, countdown=2 ** self.request.retries)
+
+async def dispatch_all(dispatcher: NotificationDispatcher, payloads: List[NotificationRequest]) -> list:
+    # Submitted together so email and push workers can batch them
+    futures = [await dispatcher.submit(payload) for payload in payloads]
+    return await asyncio.gather(*futures, return_exceptions=True)
+
+@celery_app.task
+def process_notification_batch(payload_dicts: List[dict]):
+    """
+    Dispatch many notifications in one task. Notifications that fail are
+    queued again as individual process_notification tasks for their failed
+    channels; returns the task ids of the ones that went through.
+    """
+    payloads = [NotificationRequest(**payload_dict) for payload_dict in payload_dicts]
+    results = runtime.run(dispatch_all(runtime.dispatcher, payloads))
+
+    delivered = []
+    for payload_dict, result in zip(payload_dicts, results):
+        if isinstance(result, DispatchError):
+            process_notification.apply_async((failed_channels_only(payload_dict, result),), countdown=1)
+        elif isinstance(result, BaseException):
+            logger.error(f"Batched notification failed: {result}")
+            process_notification.apply_async((payload_dict,), countdown=1)
+        else:
+            delivered.append(result)
+    return delivered
+
+class NullChannelService:
+    """Benchmark channel: takes the dispatcher path without calling a provider"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+
+    async def send(self, payload):
+        await asyncio.sleep(self.latency)
+
+async def dispatch_fresh(payloads: List[NotificationRequest], latency: float):
+    """How tasks ran before WorkerRuntime: a dispatcher (and its clients) per task"""
+    dispatcher = NotificationDispatcher(channel_map={"benchmark": NullChannelService(latency)})
+    try:
+        return await dispatch_all(dispatcher, payloads)
+    finally:
+        await dispatcher.stop()
+
+@celery_app.task(bind=True)
+def benchmark_worker(self, tasks: int = 1000, batch_size: int = 1, provider_latency: float = 0.0):
+    """
+    Tasks per second this worker process gets through, dispatching against a
+    channel that never reaches a provider, on the persistent loop and, for
+    comparison, with a fresh loop and dispatcher per task. provider_latency
+    (seconds) stands in for the provider round trip; batch_size > 1 measures
+    the batch task path.
+    """
+    payloads = [NotificationRequest(channels=["benchmark"], message="benchmark")] * batch_size
+    rounds = range(0, tasks, batch_size)
+
+    dispatcher = NotificationDispatcher(channel_map={"benchmark": NullChannelService(provider_latency)})
+    bench = WorkerRuntime(dispatcher)
+    try:
+        started = time.perf_counter()
+        for _ in rounds:
+            bench.run(dispatch_all(dispatcher, payloads))
+        persistent = time.perf_counter() - started
+    finally:
+        bench.stop()
+
+    started = time.perf_counter()
+    for _ in rounds:
+        asyncio.run(dispatch_fresh(payloads, provider_latency))
+    fresh = time.perf_counter() - started
+
+    return {
+        "worker": f"{self.request.hostname or 'local'}:{os.getpid()}",
+        "tasks": tasks,
+        "batch_size": batch_size,
+        "tasks_per_second": round(tasks / persistent, 1),
+        "fresh_loop_tasks_per_second": round(tasks / fresh, 1),
+    }
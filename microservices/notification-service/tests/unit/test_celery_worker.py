@@ -0,0 +1,92 @@
+import asyncio
+import concurrent.futures
+import pytest
+from src.workers import celery_worker
+from src.workers.celery_worker import WorkerRuntime
+from src.services.notification_dispatcher import NotificationDispatcher
+
+class FakeService:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.sent = []
+
+    async def send(self, payload):
+        if self.fail:
+            raise RuntimeError("provider down")
+        self.sent.append(payload.message)
+
+def make_runtime(services):
+    return WorkerRuntime(NotificationDispatcher(channel_map=services, workers_per_channel=1, queue_size=10, batch_size=10))
+
+def test_runtime_reuses_one_loop_across_tasks():
+    runtime = make_runtime({"sms": FakeService()})
+
+    async def current_loop():
+        return asyncio.get_running_loop()
+
+    try:
+        first = runtime.run(current_loop())
+        second = runtime.run(current_loop())
+        assert first is second is runtime.loop
+        assert runtime.dispatcher.workers
+    finally:
+        runtime.stop()
+    assert runtime.loop is None and not runtime.dispatcher.workers
+
+def test_runtime_cancels_the_coroutine_on_timeout():
+    runtime = make_runtime({"sms": FakeService()})
+    cancelled = concurrent.futures.Future()
+
+    async def hang():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set_result(True)
+            raise
+
+    try:
+        with pytest.raises(concurrent.futures.TimeoutError):
+            runtime.run(hang(), timeout=0.05)
+        assert cancelled.result(1)
+    finally:
+        runtime.stop()
+
+def test_timed_out_notification_is_not_retried(monkeypatch):
+    def time_out(coro, timeout=None):
+        coro.close()
+        raise concurrent.futures.TimeoutError()
+
+    retries = []
+    monkeypatch.setattr(celery_worker.runtime, "run", time_out)
+    monkeypatch.setattr(celery_worker.process_notification, "retry", lambda **kwargs: retries.append(kwargs))
+
+    with pytest.raises(concurrent.futures.TimeoutError):
+        celery_worker.process_notification({"channels": ["sms"], "recipient_phone": "111", "message": "Hi"})
+    assert retries == []
+
+def test_batch_requeues_only_the_failed_channels(monkeypatch):
+    services = {"sms": FakeService(fail=True), "email": FakeService()}
+    runtime = make_runtime(services)
+    requeued = []
+    monkeypatch.setattr(celery_worker, "runtime", runtime)
+    monkeypatch.setattr(celery_worker.process_notification, "apply_async", lambda args, countdown: requeued.append(args[0]))
+
+    payloads = [
+        {"channels": ["email"], "recipient_email": "a@example.com", "message": "one"},
+        {"channels": ["sms", "email"], "recipient_phone": "111", "recipient_email": "b@example.com", "message": "two"},
+    ]
+    try:
+        delivered = celery_worker.process_notification_batch(payloads)
+    finally:
+        runtime.stop()
+
+    assert len(delivered) == 1
+    assert services["email"].sent == ["one", "two"]
+    assert [payload["channels"] for payload in requeued] == [["sms"]]
+
+def test_benchmark_worker_reports_both_rates():
+    result = celery_worker.benchmark_worker.apply(kwargs={"tasks": 20, "batch_size": 5}).get()
+
+    assert result["tasks"] == 20 and result["batch_size"] == 5
+    assert result["tasks_per_second"] > 0
+    assert result["fresh_loop_tasks_per_second"] > 0
@@ -0,0 +1,112 @@
+import asyncio
+import pytest
+from src.services.notification_dispatcher import NotificationDispatcher
+from src.models.notification import NotificationRequest
+from src.core.exceptions import DispatchError
+
+class FakeService:
+    def __init__(self, delay=0.0, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.sent = []
+
+    async def send(self, payload):
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("provider down")
+        self.sent.append(payload)
+
+class FakeBatchService(FakeService):
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+
+    async def send_batch(self, payloads):
+        self.batches.append(len(payloads))
+        self.sent.extend(payloads)
+        return [None] * len(payloads)
+
+@pytest.mark.asyncio
+async def test_channels_are_sent_concurrently():
+    services = {"email": FakeService(delay=0.2), "sms": FakeService(delay=0.2)}
+    dispatcher = NotificationDispatcher(channel_map=services, workers_per_channel=1, queue_size=10, batch_size=10)
+    payload = NotificationRequest(channels=["email", "sms"], recipient_email="test@example.com", message="Hello")
+
+    started = asyncio.get_running_loop().time()
+    await dispatcher.dispatch(payload)
+    assert asyncio.get_running_loop().time() - started < 0.35
+    assert len(services["email"].sent) == len(services["sms"].sent) == 1
+    await dispatcher.stop()
+
+@pytest.mark.asyncio
+async def test_failing_channel_does_not_stop_others():
+    services = {"sms": FakeService(fail=True), "email": FakeService()}
+    dispatcher = NotificationDispatcher(channel_map=services, workers_per_channel=1, queue_size=10, batch_size=10)
+    payload = NotificationRequest(channels=["sms", "email"], recipient_email="test@example.com", message="Hello")
+
+    with pytest.raises(DispatchError) as exc_info:
+        await dispatcher.dispatch(payload)
+    assert list(exc_info.value.failures) == ["sms"]
+    assert exc_info.value.delivered == ["email"]
+    assert len(services["email"].sent) == 1
+    await dispatcher.stop()
+
+@pytest.mark.asyncio
+async def test_queued_payloads_are_micro_batched():
+    service = FakeBatchService()
+    dispatcher = NotificationDispatcher(channel_map={"email": service}, workers_per_channel=1, queue_size=100, batch_size=20)
+    payloads = [
+        NotificationRequest(channels=["email"], recipient_email=f"user{i}@example.com", message="Sale")
+        for i in range(41)
+    ]
+
+    futures = [await dispatcher.submit(payload) for payload in payloads]
+    await asyncio.gather(*futures)
+    assert len(service.sent) == 41
+    assert max(service.batches) == 20
+    await dispatcher.stop()
+
+class FakeThrottle:
+    """Provider slots are free; each recipient may be notified once per 0.2s"""
+    def __init__(self):
+        self.last = {}
+        self.reserved = 0
+
+    async def reserve_provider(self, channel, cost=1):
+        self.reserved += cost
+        return True, 0.0
+
+    async def check_recipient(self, channel, recipient):
+        now = asyncio.get_running_loop().time()
+        wait = self.last.get(recipient, -1) + 0.2 - now
+        if wait > 0:
+            return wait
+        self.last[recipient] = now
+        return 0.0
+
+@pytest.mark.asyncio
+async def test_over_limit_notifications_are_deferred_not_rejected():
+    service = FakeService()
+    dispatcher = NotificationDispatcher(
+        channel_map={"sms": service}, workers_per_channel=2, queue_size=10, batch_size=10, throttle=FakeThrottle()
+    )
+    payloads = [NotificationRequest(channels=["sms"], recipient_phone="+911234567890", message=str(i)) for i in range(2)]
+
+    started = asyncio.get_running_loop().time()
+    await asyncio.gather(*(dispatcher.dispatch(payload) for payload in payloads))
+    assert len(service.sent) == 2
+    assert asyncio.get_running_loop().time() - started >= 0.2
+    await dispatcher.stop()
+
+@pytest.mark.asyncio
+async def test_recipient_deferrals_use_no_provider_quota():
+    service, throttle = FakeBatchService(), FakeThrottle()
+    dispatcher = NotificationDispatcher(
+        channel_map={"email": service}, workers_per_channel=1, queue_size=10, batch_size=10, throttle=throttle
+    )
+    payloads = [NotificationRequest(channels=["email"], recipient_email="a@example.com", message=str(i)) for i in range(3)]
+
+    await asyncio.gather(*(dispatcher.dispatch(payload) for payload in payloads))
+    assert len(service.sent) == 3
+    assert throttle.reserved == 3  # one token per send, none for the deferrals
+    await dispatcher.stop()
@@ -0,0 +1,125 @@
+import asyncio
+import json
+import pytest
+from aiokafka import TopicPartition
+from src.services import queue_consumer
+from src.services.queue_consumer import BatchedKafkaConsumer
+from src.core.exceptions import DispatchError
+
+TP = TopicPartition("notifications", 0)
+
+class Record:
+    def __init__(self, offset, phone, message):
+        self.offset = offset
+        self.key = None
+        self.value = json.dumps({"channels": ["sms"], "recipient_phone": phone, "message": message}).encode()
+
+class FakeConsumer:
+    def __init__(self):
+        self.commits = []
+
+    async def commit(self, offsets):
+        self.commits.append(dict(offsets))
+
+    def highwater(self, tp):
+        return 4
+
+class FakeProducer:
+    def __init__(self):
+        self.sent = []
+
+    async def send_and_wait(self, topic, value, key=None, headers=None):
+        self.sent.append((topic, json.loads(value)["message"]))
+
+class FakeDispatcher:
+    """
+    submit waits on release for "slow" (a full queue). "deferred" stays
+    undelivered until its future is resolved by the test; "fail" fails.
+    """
+
+    def __init__(self):
+        self.sent = []
+        self.release = asyncio.Event()
+        self.futures = {}
+
+    async def submit(self, payload):
+        if payload.message == "slow":
+            await self.release.wait()
+        self.sent.append(payload.message)
+        future = asyncio.get_running_loop().create_future()
+        self.futures[payload.message] = future
+        if payload.message == "fail":
+            future.set_exception(DispatchError("task", {"sms": "provider down"}, []))
+        elif payload.message != "deferred":
+            future.set_result("task")
+        return future
+
+async def spawn_all(runner, records):
+    tracker = runner.offsets.setdefault(TP, queue_consumer.PartitionOffsets())
+    for record in records:
+        await runner.in_flight.acquire()
+        tracker.add(record.offset)
+        runner._spawn(TP, record)
+
+@pytest.mark.asyncio
+async def test_same_recipient_is_ordered_and_offsets_wait_for_delivery(monkeypatch):
+    dispatcher = FakeDispatcher()
+    monkeypatch.setattr(queue_consumer, "notification_dispatcher", dispatcher)
+    consumer = FakeConsumer()
+    runner = BatchedKafkaConsumer(consumer, producer=None)
+
+    await spawn_all(runner, [Record(0, "111", "slow"), Record(1, "111", "after-slow"), Record(2, "222", "other"), Record(3, "222", "other-2")])
+
+    await asyncio.sleep(0.05)
+    assert dispatcher.sent == ["other", "other-2"]
+    await runner.commit()
+    assert consumer.commits == []  # offset 0 is still waiting for queue space
+
+    dispatcher.release.set()
+    await runner.drain()
+    assert dispatcher.sent == ["other", "other-2", "slow", "after-slow"]
+    assert consumer.commits == [{TP: 4}]
+
+@pytest.mark.asyncio
+async def test_deferred_send_holds_its_offset_and_its_recipient_but_not_a_slot(monkeypatch):
+    dispatcher = FakeDispatcher()
+    monkeypatch.setattr(queue_consumer, "notification_dispatcher", dispatcher)
+    consumer = FakeConsumer()
+    runner = BatchedKafkaConsumer(consumer, producer=None)
+
+    await spawn_all(runner, [Record(0, "111", "deferred"), Record(1, "111", "next"), Record(2, "222", "other")])
+    await asyncio.sleep(0.05)
+
+    # Queued but not delivered: the next message to 111 waits, the offset stays uncommitted
+    assert dispatcher.sent == ["deferred", "other"]
+    assert len(runner.holding) == 1  # only "next", waiting behind it
+    await runner.commit()
+    assert consumer.commits == []
+
+    dispatcher.futures["deferred"].set_result("task")
+    await runner.drain()
+    assert dispatcher.sent == ["deferred", "other", "next"]
+    assert consumer.commits == [{TP: 3}]
+
+@pytest.mark.asyncio
+async def test_failed_send_is_committed_only_after_dead_lettering(monkeypatch):
+    monkeypatch.setattr(queue_consumer.settings, "KAFKA_MAX_ATTEMPTS", 1)
+    monkeypatch.setattr(queue_consumer, "notification_dispatcher", FakeDispatcher())
+    consumer, producer = FakeConsumer(), FakeProducer()
+    runner = BatchedKafkaConsumer(consumer, producer)
+
+    await spawn_all(runner, [Record(0, "111", "fail"), Record(1, "222", "sent")])
+    await runner.drain()
+    assert producer.sent == [(queue_consumer.settings.KAFKA_DEAD_LETTER_TOPIC, "fail")]
+    assert consumer.commits == [{TP: 2}]
+
+@pytest.mark.asyncio
+async def test_drain_leaves_unsettled_messages_uncommitted(monkeypatch):
+    monkeypatch.setattr(queue_consumer, "notification_dispatcher", FakeDispatcher())
+    consumer = FakeConsumer()
+    runner = BatchedKafkaConsumer(consumer, producer=None)
+
+    await spawn_all(runner, [Record(0, "111", "sent"), Record(1, "222", "deferred"), Record(2, "333", "sent")])
+    await runner.drain(timeout=0.05)
+    assert consumer.commits == [{TP: 1}]  # redelivered from offset 1
+    assert not runner.tasks
@@ -0,0 +1,53 @@
+import pytest
+from fakeredis import aioredis as fakeredis
+from src.core import rate_limiter
+from src.core.rate_limiter import NotificationThrottle
+
+@pytest.fixture
+def throttle():
+    throttle = NotificationThrottle()
+    throttle.redis = fakeredis.FakeRedis()
+    return throttle
+
+@pytest.mark.asyncio
+async def test_recipient_over_hourly_limit_is_deferred(throttle, monkeypatch):
+    monkeypatch.setattr(rate_limiter.settings, "RECIPIENT_LIMITS_PER_HOUR", {"sms": 2})
+
+    assert await throttle.check_recipient("sms", "111") == 0
+    assert await throttle.check_recipient("sms", "111") == 0
+    wait = await throttle.check_recipient("sms", "111")
+    assert 1790 < wait <= 1800  # one slot frees up every half hour
+
+    assert await throttle.check_recipient("sms", "222") == 0
+    assert await throttle.check_recipient("push", "111") == 0  # no limit on push
+
+@pytest.mark.asyncio
+async def test_recipient_keys_do_not_contain_the_recipient(throttle, monkeypatch):
+    monkeypatch.setattr(rate_limiter.settings, "RECIPIENT_LIMITS_PER_HOUR", {"email": 5})
+
+    await throttle.check_recipient("email", "someone@example.com")
+    keys = [key.decode() for key in await throttle.redis.keys("throttle:recipient:*")]
+    assert len(keys) == 1 and "someone" not in keys[0]
+
+@pytest.mark.asyncio
+async def test_provider_quota_paces_then_hands_back(throttle, monkeypatch):
+    monkeypatch.setattr(rate_limiter.settings, "PROVIDER_RATES_PER_SECOND", {"twilio": 5})
+    monkeypatch.setattr(rate_limiter.settings, "THROTTLE_MAX_WAIT_SECONDS", 0.5)
+
+    assert await throttle.reserve_provider("sms", cost=5) == (True, 0.0)
+
+    reserved, delay = await throttle.reserve_provider("sms")
+    assert reserved and 0.15 < delay <= 0.2  # wait for the next token
+
+    reserved, delay = await throttle.reserve_provider("sms", cost=5)
+    assert not reserved and delay > 0.5  # too far out: nothing reserved
+    reserved, delay = await throttle.reserve_provider("sms")
+    assert reserved and 0.35 < delay <= 0.4
+
+    assert await throttle.reserve_provider("push", cost=100) == (True, 0.0)  # fcm is unmetered
+
+@pytest.mark.asyncio
+async def test_redis_errors_fail_open():
+    throttle = NotificationThrottle("redis://localhost:1")
+    assert await throttle.reserve_provider("sms", cost=1000) == (True, 0.0)
+    assert await throttle.check_recipient("sms", "111") == 0
@@ -12,6 +12,7 @@ import asyncpg
 from datetime import datetime
 import os
 import requests
+from microservices.shared.utils.token_verifier import token_verifier
 import json
 from elasticsearch import AsyncElasticsearch
 import numpy as np
@@ -46,7 +47,7 @@ async def get_db_connection():
 
 # Authentication dependency
 async def verify_token(authorization: str = None):
-    """Verify JWT token with auth service"""
+    """Verify JWT token locally against the shared signing key and revocation mirror"""
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -55,24 +56,14 @@ async def verify_token(authorization: str = None):
     
     token = authorization.split(" ")[1]
     
-    try:
-        response = requests.post(
-            f"{AUTH_SERVICE_URL}/validate-token",
-            headers={"Authorization": f"Bearer {token}"}
-        )
-        
-        if response.status_code == 200:
-            return response.json()
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token"
-            )
-    except requests.RequestException:
+    payload = token_verifier.verify(token)
+    if payload is None:
         raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="Auth service unavailable"
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token"
         )
+    
+    return token_verifier.current_user(payload)
 
 # Pydantic models
 class SearchQuery(BaseModel):
@@ -734,8 +725,13 @@ async def health_check():
 @app.on_event("startup")
 async def startup_event():
     """Initialize the matching model on startup"""
+    await token_verifier.start()
     await matching_engine.train_model()
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await token_verifier.stop()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8004)
\ No newline at end of file
@@ -0,0 +1,98 @@
+"""
+Guarded Endpoint Benchmark for MSMEBazaar
+Measures requests/second through AuthGuard with the blocking and async token checks
+
+Run from the repository root against a real Redis:
+
+    REDIS_URL=redis://localhost:6379 python -m microservices.shared.benchmarks.auth_guard_benchmark
+
+"before" is the blocking JWTHandler.verify_token. It calls asyncio.run for the
+blacklist lookup, which cannot run on the server's event loop at all, so it is
+measured the only way it could work: offloaded to the threadpool, one new
+event loop and Redis round trip per check. "after" is the guard as shipped,
+awaiting verify_token_async with a single pipelined Redis round trip.
+"""
+
+import os
+import time
+import asyncio
+import argparse
+from typing import Dict, Any
+
+import httpx
+import redis.asyncio as redis
+from fastapi import FastAPI, Depends, Request, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.security import HTTPAuthorizationCredentials
+
+from ..middlewares.auth_guard import require_auth, security
+from ..utils.jwt_handler import JWTHandler, jwt_handler
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+
+
+async def legacy_require_auth(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """AuthGuard's token check before verify_token_async existed"""
+    # A fresh client per check: asyncio.run gives every call its own event loop
+    handler = JWTHandler(secret_key=jwt_handler.secret_key, redis_url=REDIS_URL)
+    payload = await run_in_threadpool(handler.verify_token, credentials.credentials)
+    if not payload:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired token")
+    request.state.user = payload
+    return payload
+
+
+app = FastAPI()
+
+
+@app.get("/before")
+async def guarded_before(user: Dict[str, Any] = Depends(legacy_require_auth)):
+    return {"user_id": user["sub"]}
+
+
+@app.get("/after")
+async def guarded_after(user: Dict[str, Any] = Depends(require_auth)):
+    return {"user_id": user["sub"]}
+
+
+async def run(path: str, token: str, requests: int, concurrency: int) -> float:
+    """Issue requests against path with the given concurrency and return requests/second"""
+    transport = httpx.ASGITransport(app=app)
+    headers = {"Authorization": f"Bearer {token}"}
+    remaining = requests
+    failures = 0
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        async def worker():
+            nonlocal remaining, failures
+            while remaining > 0:
+                remaining -= 1
+                response = await client.get(path, headers=headers)
+                if response.status_code != 200:
+                    failures += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    if failures:
+        raise RuntimeError(f"{path}: {failures} of {requests} requests were rejected")
+    return requests / elapsed
+
+
+async def main(args):
+    jwt_handler.redis_client = redis.from_url(REDIS_URL)
+    await jwt_handler.initialize()
+    token = jwt_handler.create_access_token({"sub": "benchmark-user", "role": "buyer"})
+
+    for path in ("/before", "/after"):
+        await run(path, token, args.concurrency, args.concurrency)  # warm up
+        rate = await run(path, token, args.requests, args.concurrency)
+        print(f"{path:8} {rate:10.0f} req/s  ({args.requests} requests, concurrency {args.concurrency})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
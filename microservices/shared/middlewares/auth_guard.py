@@ -33,7 +33,7 @@ class AuthGuard:
             token = credentials.credentials
             
             # Verify token
-            payload = jwt_handler.verify_token(token)
+            payload = await jwt_handler.verify_token_async(token)
             if not payload:
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
@@ -134,7 +134,7 @@ class OptionalAuthGuard:
             
             # Extract and verify token
             token = auth_header.split(" ")[1]
-            payload = jwt_handler.verify_token(token)
+            payload = await jwt_handler.verify_token_async(token)
             
             if payload:
                 user_id = payload.get("sub")
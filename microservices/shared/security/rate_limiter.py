@@ -1,13 +1,16 @@
 """
 Rate Limiting for MSMEBazaar Microservices
-Redis-based token bucket and sliding window rate limiting
+Redis-based token bucket and sliding window rate limiting, one Lua script call per check
 """
 
 import time
+import math
+import secrets
 import asyncio
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from fastapi import Request, HTTPException, Depends
 import redis.asyncio as redis
+from redis.exceptions import NoScriptError
 import structlog
 import hashlib
 import json
@@ -16,23 +19,110 @@ from datetime import datetime, timedelta
 logger = structlog.get_logger()
 
 
+# Each check is one server-side script, so it is atomic and costs a single
+# round trip. Times are passed in from the caller as before.
+
+SLIDING_WINDOW_SCRIPT = """
+local key = KEYS[1]
+local window = tonumber(ARGV[1])
+local now = tonumber(ARGV[2])
+redis.call('ZREMRANGEBYSCORE', key, 0, now - window)
+local count = redis.call('ZCARD', key) + 1
+redis.call('ZADD', key, now, ARGV[3])
+redis.call('EXPIRE', key, window + 1)
+return count
+"""
+
+# Approximates a sliding window from the current and previous fixed window
+# counters, weighting the previous one by how much of it still overlaps
+SLIDING_WINDOW_COUNTER_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local window_start = tonumber(ARGV[4])
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+local estimated = previous * (1 - (now - window_start) / window) + current + 1
+local allowed = 0
+if estimated <= limit then
+    allowed = 1
+    current = redis.call('INCR', KEYS[1])
+    if current == 1 then
+        redis.call('EXPIRE', KEYS[1], window * 2)
+    end
+end
+return {allowed, current, previous}
+"""
+
+TOKEN_BUCKET_SCRIPT = """
+local key = KEYS[1]
+local limit = tonumber(ARGV[1])
+local refill_period = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', key, 'tokens', 'last_refill')
+local tokens = tonumber(state[1]) or limit
+local last_refill = tonumber(state[2]) or now
+tokens = math.min(limit, tokens + math.max(0, now - last_refill) / refill_period * limit)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', key, 'tokens', tostring(tokens), 'last_refill', tostring(now))
+redis.call('EXPIRE', key, refill_period * 2)
+return {allowed, math.floor(tokens)}
+"""
+
+FIXED_WINDOW_SCRIPT = """
+local count = redis.call('INCR', KEYS[1])
+if count == 1 then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+return count
+"""
+
+
 class RateLimiter:
     """
     Advanced rate limiter with multiple algorithms and Redis backend
     """
     
+    SCRIPTS = {
+        "sliding_window": SLIDING_WINDOW_SCRIPT,
+        "sliding_window_counter": SLIDING_WINDOW_COUNTER_SCRIPT,
+        "token_bucket": TOKEN_BUCKET_SCRIPT,
+        "fixed_window": FIXED_WINDOW_SCRIPT,
+    }
+    
     def __init__(self, redis_url: str = "redis://localhost:6379"):
         self.redis_client = redis.from_url(redis_url)
+        self.script_shas: Dict[str, str] = {}
         
     async def initialize(self):
         """Initialize Redis connection"""
         try:
             await self.redis_client.ping()
+            await self._load_scripts()
             logger.info("Rate limiter Redis connection established")
         except Exception as e:
             logger.error("Failed to connect to Redis for rate limiting", error=str(e))
             raise
     
+    async def _load_scripts(self):
+        """Load the rate limiting scripts with SCRIPT LOAD"""
+        for name, script in self.SCRIPTS.items():
+            self.script_shas[name] = await self.redis_client.script_load(script)
+    
+    async def _run_script(self, name: str, keys: List[str], args: List[Any]) -> Any:
+        """EVALSHA a rate limiting script, reloading once if Redis has lost it (restart/failover)"""
+        if name not in self.script_shas:
+            await self._load_scripts()
+        try:
+            return await self.redis_client.evalsha(self.script_shas[name], len(keys), *keys, *args)
+        except NoScriptError:
+            await self._load_scripts()
+            return await self.redis_client.evalsha(self.script_shas[name], len(keys), *keys, *args)
+    
     async def check_rate_limit(
         self,
         key: str,
@@ -47,7 +137,8 @@ class RateLimiter:
             key: Unique identifier for the rate limit (IP, user_id, etc.)
             limit: Maximum number of requests allowed
             window_seconds: Time window in seconds
-            algorithm: Rate limiting algorithm ('sliding_window', 'token_bucket', 'fixed_window')
+            algorithm: Rate limiting algorithm ('sliding_window', 'sliding_window_counter',
+                'token_bucket', 'fixed_window')
         
         Returns:
             Dict with rate limit status and metadata
@@ -55,30 +146,21 @@ class RateLimiter:
         
         if algorithm == "sliding_window":
             return await self._sliding_window_check(key, limit, window_seconds)
+        elif algorithm == "sliding_window_counter":
+            return await self._sliding_window_counter_check(key, limit, window_seconds)
         elif algorithm == "token_bucket":
             return await self._token_bucket_check(key, limit, window_seconds)
         else:  # fixed_window
             return await self._fixed_window_check(key, limit, window_seconds)
     
     async def _sliding_window_check(self, key: str, limit: int, window: int) -> Dict[str, Any]:
-        """Sliding window rate limiting implementation"""
+        """Sliding window rate limiting implementation (exact, one entry per request)"""
         now = time.time()
-        pipeline = self.redis_client.pipeline()
-        
-        # Remove expired entries
-        pipeline.zremrangebyscore(f"rate_limit:{key}", 0, now - window)
-        
-        # Count current requests in window
-        pipeline.zcard(f"rate_limit:{key}")
-        
-        # Add current request
-        pipeline.zadd(f"rate_limit:{key}", {str(now): now})
-        
-        # Set expiration
-        pipeline.expire(f"rate_limit:{key}", window + 1)
+        member = f"{now}:{secrets.token_hex(4)}"  # Distinct even for simultaneous requests
         
-        results = await pipeline.execute()
-        current_count = results[1] + 1  # +1 for the current request
+        current_count = await self._run_script(
+            "sliding_window", [f"rate_limit:{key}"], [window, now, member]
+        )
         
         remaining = max(0, limit - current_count)
         reset_time = now + window
@@ -91,42 +173,52 @@ class RateLimiter:
             "retry_after": window if current_count > limit else None
         }
     
-    async def _token_bucket_check(self, key: str, limit: int, refill_period: int) -> Dict[str, Any]:
-        """Token bucket rate limiting implementation"""
+    async def _sliding_window_counter_check(self, key: str, limit: int, window: int) -> Dict[str, Any]:
+        """Sliding window counter rate limiting implementation (approximate, O(1) memory)"""
         now = time.time()
-        bucket_key = f"token_bucket:{key}"
+        window_start = int(now) // window * window
+        # Hash tag keeps both windows in one slot under Redis Cluster
+        current_key = f"sliding_counter:{{{key}}}:{window_start}"
+        previous_key = f"sliding_counter:{{{key}}}:{window_start - window}"
         
-        # Get current bucket state
-        bucket_data = await self.redis_client.hgetall(bucket_key)
-        
-        if bucket_data:
-            tokens = float(bucket_data.get('tokens', limit))
-            last_refill = float(bucket_data.get('last_refill', now))
-        else:
-            tokens = float(limit)
-            last_refill = now
+        allowed, current, previous = await self._run_script(
+            "sliding_window_counter",
+            [current_key, previous_key],
+            [limit, window, now, window_start]
+        )
         
-        # Calculate tokens to add based on time elapsed
-        time_elapsed = now - last_refill
-        tokens_to_add = (time_elapsed / refill_period) * limit
-        tokens = min(limit, tokens + tokens_to_add)
+        elapsed = now - window_start
+        estimated = previous * (1 - elapsed / window) + current
+        reset_time = window_start + window
         
-        allowed = tokens >= 1.0
+        retry_after = None
+        if not allowed:
+            if current + 1 > limit or not previous:
+                retry_after = reset_time - now
+            else:
+                # When enough of the previous window has slid out to fit one more request
+                retry_after = window * (1 - (limit - current - 1) / previous) - elapsed
         
-        if allowed:
-            tokens -= 1.0
+        return {
+            "allowed": bool(allowed),
+            "limit": limit,
+            "remaining": max(0, int(limit - estimated)),
+            "reset_time": reset_time,
+            "retry_after": max(1, math.ceil(retry_after)) if retry_after is not None else None
+        }
+    
+    async def _token_bucket_check(self, key: str, limit: int, refill_period: int) -> Dict[str, Any]:
+        """Token bucket rate limiting implementation"""
+        now = time.time()
         
-        # Update bucket state
-        await self.redis_client.hset(bucket_key, mapping={
-            'tokens': str(tokens),
-            'last_refill': str(now)
-        })
-        await self.redis_client.expire(bucket_key, refill_period * 2)
+        allowed, remaining = await self._run_script(
+            "token_bucket", [f"token_bucket:{key}"], [limit, refill_period, now]
+        )
         
         return {
-            "allowed": allowed,
+            "allowed": bool(allowed),
             "limit": limit,
-            "remaining": int(tokens),
+            "remaining": remaining,
             "reset_time": now + refill_period,
             "retry_after": refill_period if not allowed else None
         }
@@ -137,10 +229,7 @@ class RateLimiter:
         window_start = now // window * window
         window_key = f"fixed_window:{key}:{window_start}"
         
-        current_count = await self.redis_client.incr(window_key)
-        
-        if current_count == 1:
-            await self.redis_client.expire(window_key, window)
+        current_count = await self._run_script("fixed_window", [window_key], [window])
         
         remaining = max(0, limit - current_count)
         reset_time = window_start + window
@@ -266,7 +355,7 @@ async def auth_rate_limit(request: Request):
 
 async def api_rate_limit(request: Request):
     """Standard API rate limiting"""
-    return await apply_rate_limit(request, limit=100, window=60, algorithm="sliding_window")  # 100 per minute
+    return await apply_rate_limit(request, limit=100, window=60, algorithm="sliding_window_counter")  # 100 per minute
 
 
 async def otp_rate_limit(request: Request):
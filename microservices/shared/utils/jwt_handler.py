@@ -4,6 +4,7 @@ Enhanced JWT implementation with security features and token management
 """
 
 import os
+import json
 import time
 import secrets
 from datetime import datetime, timedelta
@@ -25,6 +26,9 @@ class JWTHandler:
     Enhanced JWT handler with security features
     """
     
+    # Revocations are announced here so services can mirror them locally
+    REVOCATION_CHANNEL = "jwt:revocations"
+    
     def __init__(
         self,
         secret_key: Optional[str] = None,
@@ -40,6 +44,11 @@ class JWTHandler:
         self.refresh_token_expire_days = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
         self.issuer = os.getenv("JWT_ISSUER", "msmebazaar.com")
         
+        # Recently rejected tokens (by SHA-256) -> monotonic expiry, so retries skip Redis
+        self.negative_cache: Dict[str, float] = {}
+        self.negative_cache_seconds = int(os.getenv("JWT_NEGATIVE_CACHE_SECONDS", "30"))
+        self.negative_cache_size = 10000
+        
     def _generate_secret_key(self) -> str:
         """Generate a secure secret key"""
         return base64.urlsafe_b64encode(secrets.token_bytes(32)).decode()
@@ -106,12 +115,11 @@ class JWTHandler:
         
         return jwt.encode(to_encode, self.secret_key, algorithm=self.algorithm)
     
-    def verify_token(self, token: str) -> Optional[Dict[str, Any]]:
+    def decode_token(self, token: str) -> Optional[Dict[str, Any]]:
         """
-        Verify and decode JWT token with comprehensive validation
+        Verify signature and standard claims without consulting the revocation lists
         """
         try:
-            # Decode and verify token
             payload = jwt.decode(
                 token,
                 self.secret_key,
@@ -133,24 +141,89 @@ class JWTHandler:
                 logger.warning("Token missing type claim")
                 return None
             
-            # Check if token is in blacklist (for logout/revocation)
-            jti = payload.get("jti")
-            if jti and asyncio.run(self._is_token_blacklisted(jti)):
-                logger.warning("Token is blacklisted", jti=jti)
-                return None
-            
             return payload
             
         except jwt.ExpiredSignatureError:
             logger.warning("Token has expired")
             return None
-        except jwt.InvalidTokenError as e:
+        except JWTError as e:
             logger.warning("Invalid token", error=str(e))
             return None
         except Exception as e:
             logger.error("Token verification error", error=str(e))
             return None
     
+    def verify_token(self, token: str) -> Optional[Dict[str, Any]]:
+        """
+        Verify and decode JWT token with comprehensive validation
+        
+        Blocking; must not be called from a running event loop. Async code
+        should use verify_token_async.
+        """
+        payload = self.decode_token(token)
+        if not payload:
+            return None
+        
+        # Check if token is in blacklist (for logout/revocation)
+        jti = payload.get("jti")
+        if jti and asyncio.run(self._is_token_blacklisted(jti)):
+            logger.warning("Token is blacklisted", jti=jti)
+            return None
+        
+        return payload
+    
+    async def verify_token_async(self, token: str) -> Optional[Dict[str, Any]]:
+        """
+        Verify a token and check the blacklist and user revocation in one Redis round trip
+        
+        Rejections are remembered for negative_cache_seconds so repeated
+        attempts with the same bad token neither decode it nor hit Redis.
+        """
+        token_hash = hashlib.sha256(token.encode()).hexdigest()
+        rejected_until = self.negative_cache.get(token_hash)
+        if rejected_until is not None:
+            if rejected_until > time.monotonic():
+                return None
+            del self.negative_cache[token_hash]
+        
+        payload = self.decode_token(token)
+        if not payload:
+            self._remember_rejection(token_hash)
+            return None
+        
+        jti = payload.get("jti")
+        user_id = payload.get("sub")
+        if not jti and not user_id:
+            return payload
+        
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.exists(f"blacklist:{jti}")
+                pipe.get(f"user_revoked:{user_id}")
+                blacklisted, revocation_time = await pipe.execute()
+        except Exception as e:
+            # Same fail-open behaviour as the individual checks
+            logger.error("Error checking token revocation", error=str(e))
+            return payload
+        
+        if jti and blacklisted:
+            logger.warning("Token is blacklisted", jti=jti)
+            self._remember_rejection(token_hash)
+            return None
+        
+        if user_id and revocation_time and int(revocation_time) > payload.get("iat", 0):
+            logger.warning("User tokens have been revoked", user_id=user_id)
+            self._remember_rejection(token_hash)
+            return None
+        
+        return payload
+    
+    def _remember_rejection(self, token_hash: str):
+        """Add a rejected token to the negative cache, evicting the oldest entry when full"""
+        if len(self.negative_cache) >= self.negative_cache_size:
+            self.negative_cache.pop(next(iter(self.negative_cache)))
+        self.negative_cache[token_hash] = time.monotonic() + self.negative_cache_seconds
+    
     async def _is_token_blacklisted(self, jti: str) -> bool:
         """Check if token is blacklisted"""
         try:
@@ -163,7 +236,10 @@ class JWTHandler:
         """Add token to blacklist"""
         try:
             ttl = ttl_seconds or (self.refresh_token_expire_days * 24 * 60 * 60)
-            await self.redis_client.setex(f"blacklist:{jti}", ttl, "1")
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.setex(f"blacklist:{jti}", ttl, "1")
+                pipe.publish(self.REVOCATION_CHANNEL, json.dumps({"jti": jti, "expires_at": int(time.time()) + ttl}))
+                await pipe.execute()
             logger.info("Token blacklisted", jti=jti)
         except Exception as e:
             logger.error("Error blacklisting token", jti=jti, error=str(e))
@@ -172,7 +248,7 @@ class JWTHandler:
         """
         Create new access token using refresh token
         """
-        payload = self.verify_token(refresh_token)
+        payload = await self.verify_token_async(refresh_token)
         
         if not payload:
             return None
@@ -215,7 +291,10 @@ class JWTHandler:
             
             # Set revocation timestamp with TTL
             ttl = self.refresh_token_expire_days * 24 * 60 * 60
-            await self.redis_client.setex(revocation_key, ttl, str(revocation_time))
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.setex(revocation_key, ttl, str(revocation_time))
+                pipe.publish(self.REVOCATION_CHANNEL, json.dumps({"user_id": str(user_id), "revoked_at": revocation_time}))
+                await pipe.execute()
             
             logger.info("All tokens revoked for user", user_id=user_id)
             
@@ -0,0 +1,193 @@
+"""
+Local Token Verifier for MSMEBazaar
+Verifies access tokens in-process against a locally mirrored revocation list
+"""
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Dict, Optional, Any, Tuple
+import structlog
+
+from .jwt_handler import JWTHandler
+
+logger = structlog.get_logger()
+
+
+class TokenVerifier:
+    """
+    Verifies JWTs without a round trip to the auth service
+
+    Signatures are checked locally with JWTHandler, decoded claims are kept
+    in a small LRU keyed by the token's SHA-256, and revocation is checked
+    against an in-memory mirror of the Redis blacklist. The mirror is seeded
+    with SCAN, kept current through the JWTHandler.REVOCATION_CHANNEL pub/sub
+    channel and fully resynced every resync_seconds in case a message was
+    missed.
+    """
+
+    def __init__(
+        self,
+        handler: Optional[JWTHandler] = None,
+        cache_size: int = 10000,
+        resync_seconds: int = 300,
+        token_types: Tuple[str, ...] = ("access",)
+    ):
+        if handler is None:
+            secret_key = os.getenv("JWT_SECRET")
+            if not secret_key:
+                # JWTHandler would fall back to a random key and reject every token
+                raise RuntimeError("JWT_SECRET must be set to verify tokens")
+            handler = JWTHandler(
+                secret_key=secret_key,
+                algorithm=os.getenv("JWT_ALGORITHM", "HS256"),
+                redis_url=os.getenv("REDIS_URL", "redis://localhost:6379")
+            )
+        self.handler = handler
+        self.cache_size = cache_size
+        self.resync_seconds = resync_seconds
+        self.token_types = token_types
+
+        self.claims_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.revoked_tokens: Dict[str, int] = {}  # jti -> blacklist expiry (epoch seconds)
+        self.revoked_users: Dict[str, int] = {}  # user_id -> revocation time (epoch seconds)
+        self.sync_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Seed the revocation mirror and start following revocations"""
+        try:
+            await self.resync()
+        except Exception as e:
+            # The sync loop keeps retrying; signatures are still verified meanwhile
+            logger.error("Initial revocation sync failed", error=str(e))
+        self.sync_task = asyncio.create_task(self._follow_revocations())
+
+    async def stop(self):
+        """Stop following revocations"""
+        if self.sync_task:
+            self.sync_task.cancel()
+
+    def verify(self, token: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the token's claims if it is valid and not revoked, else None
+        """
+        key = hashlib.sha256(token.encode()).hexdigest()
+        payload = self.claims_cache.get(key)
+
+        if payload is not None and payload["exp"] > time.time():
+            self.claims_cache.move_to_end(key)
+        else:
+            self.claims_cache.pop(key, None)
+            payload = self.handler.decode_token(token)
+            if payload is None:
+                return None
+
+            self.claims_cache[key] = payload
+            if len(self.claims_cache) > self.cache_size:
+                self.claims_cache.popitem(last=False)
+
+        if payload.get("token_type") not in self.token_types:
+            return None
+
+        if self.is_revoked(payload):
+            logger.warning("Token has been revoked", jti=payload.get("jti"))
+            return None
+
+        return payload
+
+    def is_revoked(self, payload: Dict[str, Any]) -> bool:
+        """Check the token and its user against the mirrored revocation lists"""
+        jti = payload.get("jti")
+        if jti and self.revoked_tokens.get(jti, 0) > time.time():
+            return True
+
+        revoked_at = self.revoked_users.get(str(payload.get("sub")))
+        return revoked_at is not None and revoked_at > payload.get("iat", 0)
+
+    @staticmethod
+    def current_user(payload: Dict[str, Any]) -> Dict[str, Any]:
+        """User info in the shape the auth service's /validate-token returns"""
+        return {
+            "valid": True,
+            "user_id": payload.get("user_id", payload.get("sub")),
+            "role": payload.get("role")
+        }
+
+    async def resync(self):
+        """Rebuild the revocation mirror from the blacklist:* and user_revoked:* keys"""
+        redis_client = self.handler.redis_client
+        now = int(time.time())
+
+        jtis = [key async for key in redis_client.scan_iter(match="blacklist:*", count=1000)]
+        user_keys = [key async for key in redis_client.scan_iter(match="user_revoked:*", count=1000)]
+
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for key in jtis:
+                pipe.ttl(key)
+            for key in user_keys:
+                pipe.get(key)
+            results = await pipe.execute()
+
+        revoked_tokens = {}
+        for key, ttl in zip(jtis, results[:len(jtis)]):
+            if ttl != -2:  # -2: expired since the scan; -1: no expiry
+                revoked_tokens[self._suffix(key)] = now + ttl if ttl >= 0 else float("inf")
+
+        revoked_users = {}
+        for key, value in zip(user_keys, results[len(jtis):]):
+            if value is not None:
+                revoked_users[self._suffix(key)] = int(value)
+
+        self.revoked_tokens = revoked_tokens
+        self.revoked_users = revoked_users
+
+    def apply_revocation(self, message: Any):
+        """Apply one revocation published by JWTHandler"""
+        event = json.loads(message)
+        if "jti" in event:
+            self.revoked_tokens[event["jti"]] = int(event["expires_at"])
+        elif "user_id" in event:
+            self.revoked_users[str(event["user_id"])] = int(event["revoked_at"])
+
+    async def _follow_revocations(self):
+        """Follow the revocation channel, resyncing on (re)subscribe and periodically"""
+        while True:
+            pubsub = self.handler.redis_client.pubsub()
+            try:
+                await pubsub.subscribe(JWTHandler.REVOCATION_CHANNEL)
+                # Subscribed first, so nothing published during the resync is lost
+                await self.resync()
+                next_resync = time.monotonic() + self.resync_seconds
+
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is not None:
+                        try:
+                            self.apply_revocation(message["data"])
+                        except (ValueError, KeyError, TypeError) as e:
+                            logger.warning("Ignoring malformed revocation message", error=str(e))
+
+                    if time.monotonic() >= next_resync:
+                        await self.resync()
+                        next_resync = time.monotonic() + self.resync_seconds
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Revocation feed failed, reconnecting", error=str(e))
+                await asyncio.sleep(5)
+            finally:
+                await pubsub.close()
+
+    @staticmethod
+    def _suffix(key: Any) -> str:
+        if isinstance(key, bytes):
+            key = key.decode()
+        return key.split(":", 1)[1]
+
+
+# Shared verifier instance for service auth dependencies
+token_verifier = TokenVerifier()
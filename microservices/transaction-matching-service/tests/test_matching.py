@@ -0,0 +1,321 @@
+"""
+Tests for the batched match scorer and the in-memory matching index
+"""
+
+import json
+import math
+import random
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from fuzzywuzzy import fuzz
+
+import app as matching
+from app import BuyerRequirement, CategoryPartition, MatchingIndex, SellerOffering, TransactionMatcher
+
+CATEGORIES = ["electronics", "electronic", "textiles", "textile machinery", "food processing", "chemicals"]
+SUBCATEGORIES = [None, "cables", "cable", "yarn", "spices", "dyes"]
+LOCATIONS = ["Mumbai", "Pune", "Navi Mumbai", "Delhi", "New Delhi", "Chennai", "Bengaluru"]
+UNITS = [None, "kg", "KG", "tonnes", "pieces"]
+CERTIFICATIONS = ["ISO 9001", "ISO 14001", "BIS", "FSSAI", "CE"]
+QUALITY = ["grade a", "export quality", "food grade", "rohs"]
+TAGS = ["bulk", "wholesale", "Organic", "custom", "urgent"]
+WORDS = ["copper", "wire", "cotton", "yarn", "spice", "powder", "dye", "industrial", "supply", "bulk"]
+
+# Per-pair scorers the batch scorer replaced, kept as the reference it must agree with
+
+def reference_category_match(requirement, offering):
+    if requirement.category.lower() == offering.category.lower():
+        category_score = 1.0
+    else:
+        category_score = fuzz.ratio(requirement.category.lower(), offering.category.lower()) / 100.0
+
+    subcategory_score = 0.0
+    if requirement.subcategory and offering.subcategory:
+        if requirement.subcategory.lower() == offering.subcategory.lower():
+            subcategory_score = 0.2
+        else:
+            subcategory_score = fuzz.ratio(
+                requirement.subcategory.lower(), offering.subcategory.lower()
+            ) / 100.0 * 0.2
+
+    return min(1.0, category_score + subcategory_score)
+
+def reference_price_compatibility(requirement, offering):
+    if (not requirement.budget_min and not requirement.budget_max and
+        not offering.price_min and not offering.price_max):
+        return 0.7
+
+    req_min = requirement.budget_min or 0
+    req_max = requirement.budget_max or float('inf')
+    off_min = offering.price_min or 0
+    off_max = offering.price_max or float('inf')
+
+    overlap_min = max(req_min, off_min)
+    overlap_max = min(req_max, off_max)
+
+    if overlap_min <= overlap_max:
+        req_range = req_max - req_min if req_max != float('inf') else req_min * 2
+        off_range = off_max - off_min if off_max != float('inf') else off_min * 2
+        overlap_size = overlap_max - overlap_min
+        if req_range > 0 and off_range > 0:
+            return min(1.0, min(overlap_size / req_range, overlap_size / off_range))
+        return 1.0
+
+    if req_max < off_min:
+        penalty = (off_min - req_max) / (req_max if req_max > 0 else 1)
+    else:
+        penalty = (req_min - off_max) / (off_max if off_max > 0 else 1)
+    return max(0.0, 1.0 - penalty)
+
+def reference_quantity_match(requirement, offering):
+    if not requirement.quantity or not offering.capacity:
+        return 0.7
+    if requirement.unit and offering.unit and requirement.unit.lower() != offering.unit.lower():
+        return 0.3
+    if offering.capacity >= requirement.quantity:
+        return 1.0 if offering.capacity <= requirement.quantity * 2 else 0.8
+    return offering.capacity / requirement.quantity * 0.6
+
+def reference_quality_match(requirement, offering):
+    score = 0.5
+    if requirement.certifications_required:
+        req_certs = set(cert.lower() for cert in requirement.certifications_required)
+        off_certs = set(cert.lower() for cert in offering.certifications)
+        if req_certs.issubset(off_certs):
+            score += 0.3
+        else:
+            score += 0.3 * (len(req_certs.intersection(off_certs)) / len(req_certs))
+    if requirement.quality_requirements:
+        req_quality = set(q.lower() for q in requirement.quality_requirements)
+        off_quality = set(q.lower() for q in offering.quality_standards)
+        if req_quality.issubset(off_quality):
+            score += 0.2
+        else:
+            score += 0.2 * (len(req_quality.intersection(off_quality)) / len(req_quality))
+    return min(1.0, score)
+
+REFERENCE_FACTORS = {
+    'category_match': reference_category_match,
+    'price_compatibility': reference_price_compatibility,
+    'location_compatibility': TransactionMatcher()._calculate_location_compatibility,
+    'quantity_match': reference_quantity_match,
+    'quality_match': reference_quality_match
+}
+
+def maybe(rng, value):
+    return value if rng.random() < 0.7 else None
+
+def random_range(rng):
+    low = maybe(rng, float(rng.choice([0, 100, 500, 1000, 2500])))
+    high = maybe(rng, float(rng.choice([0, 400, 1000, 3000, 10000])))
+    return low, high
+
+def random_requirement(rng, n):
+    budget_min, budget_max = random_range(rng)
+    return BuyerRequirement(
+        buyer_id=f"buyer-{n}",
+        requirement_id=f"req-{n}",
+        title=" ".join(rng.sample(WORDS, 2)),
+        description=" ".join(rng.sample(WORDS, 4)),
+        category=rng.choice(CATEGORIES),
+        subcategory=rng.choice(SUBCATEGORIES),
+        budget_min=budget_min,
+        budget_max=budget_max,
+        location=rng.choice(LOCATIONS),
+        preferred_locations=rng.sample(LOCATIONS, rng.randint(0, 2)),
+        quantity=maybe(rng, rng.choice([0, 10, 50, 100, 1000])),
+        unit=rng.choice(UNITS),
+        quality_requirements=rng.sample(QUALITY, rng.randint(0, 2)),
+        certifications_required=rng.sample(CERTIFICATIONS, rng.randint(0, 3)),
+        tags=rng.sample(TAGS, rng.randint(0, 3)),
+        created_at=datetime(2024, 1, 1) + timedelta(minutes=n)
+    )
+
+def random_offering(rng, n):
+    price_min, price_max = random_range(rng)
+    return SellerOffering(
+        seller_id=f"seller-{n}",
+        offering_id=f"off-{n}",
+        title=" ".join(rng.sample(WORDS, 2)),
+        description=" ".join(rng.sample(WORDS, 4)),
+        category=rng.choice(CATEGORIES),
+        subcategory=rng.choice(SUBCATEGORIES),
+        price_min=price_min,
+        price_max=price_max,
+        location=rng.choice(LOCATIONS),
+        service_areas=rng.sample(LOCATIONS, rng.randint(0, 2)),
+        capacity=maybe(rng, rng.choice([0, 5, 40, 100, 500, 5000])),
+        unit=rng.choice(UNITS),
+        certifications=rng.sample(CERTIFICATIONS, rng.randint(0, 4)),
+        quality_standards=rng.sample(QUALITY, rng.randint(0, 3)),
+        tags=rng.sample(TAGS, rng.randint(0, 3)),
+        rating=maybe(rng, rng.choice([3.5, 4.0, 4.8])),
+        created_at=datetime(2024, 1, 1) + timedelta(minutes=n)
+    )
+
+def random_pairs(count, seed=7):
+    rng = random.Random(seed)
+    return [random_requirement(rng, n) for n in range(count)], [random_offering(rng, n) for n in range(count)]
+
+def test_batch_factors_match_per_pair_scorers():
+    """Every batched factor agrees with the per-pair scorer on random pairs"""
+    requirements, offerings = random_pairs(300)
+    matcher = TransactionMatcher()
+
+    scores, factors = matcher._score_batch(requirements, offerings)
+
+    for row, (requirement, offering) in enumerate(zip(requirements, offerings)):
+        for column, name in enumerate(TransactionMatcher.MATCH_FACTORS):
+            if name in REFERENCE_FACTORS:
+                expected = REFERENCE_FACTORS[name](requirement, offering)
+                assert factors[row, column] == pytest.approx(expected), (name, requirement, offering)
+        assert scores[row] == pytest.approx(float(factors[row] @ TransactionMatcher.MATCH_WEIGHTS))
+
+def test_batch_text_similarity_is_cosine_plus_tag_bonus():
+    requirements, offerings = random_pairs(50)
+    offerings[0] = offerings[0].model_copy(update={
+        "title": requirements[0].title, "description": requirements[0].description, "tags": []
+    })
+    offerings[1] = offerings[1].model_copy(update={
+        "title": "zinc", "description": "galvanised sheets", "tags": requirements[1].tags or ["bulk"]
+    })
+    requirements[1] = requirements[1].model_copy(update={"tags": offerings[1].tags})
+
+    _, factors = TransactionMatcher()._score_batch(requirements, offerings)
+    text = factors[:, TransactionMatcher.MATCH_FACTORS.index('text_similarity')]
+
+    assert text[0] == pytest.approx(1.0)   # identical text
+    assert text[1] == pytest.approx(0.1)   # no shared words, identical tags
+    assert ((text >= 0) & (text <= 1)).all()
+
+def test_partition_columns_score_like_the_models():
+    """Columns precomputed by a partition give the same scores as reading the models"""
+    requirements, offerings = random_pairs(120, seed=11)
+    for offering in offerings:
+        offering.category = "electronics"
+    partition = CategoryPartition('offering', offerings)
+    matcher = TransactionMatcher()
+
+    candidates, columns = partition.select()
+    requirement = requirements[0]
+    with_columns, _ = matcher._score_batch([requirement] * len(candidates), candidates, offering_columns=columns)
+    without_columns, _ = matcher._score_batch([requirement] * len(candidates), candidates)
+
+    assert with_columns == pytest.approx(without_columns)
+
+def offering(n, location="Pune", service_areas=(), price_min=None, category="textiles", rating=None):
+    return SellerOffering(
+        seller_id=f"seller-{n}",
+        offering_id=f"off-{n}",
+        title="cotton yarn",
+        description="combed cotton yarn",
+        category=category,
+        location=location,
+        service_areas=list(service_areas),
+        price_min=price_min,
+        certifications=["ISO 9001"] if n % 2 else [],
+        rating=rating,
+        created_at=datetime(2024, 1, 1) + timedelta(days=n)
+    )
+
+def test_partition_select_applies_location_and_price_filters():
+    partition = CategoryPartition('offering', [
+        offering(1, location="Mumbai", price_min=100.0),
+        offering(2, location="Pune", service_areas=["Navi Mumbai"], price_min=900.0),
+        offering(3, location="Pune", price_min=None),
+        offering(4, location="Mumbai", price_min=2000.0),
+        offering(5, location="Delhi", price_min=50.0),
+    ])
+
+    selected, columns = partition.select({"location": "MUMBAI", "max_price": 1000})
+
+    # Newest first; missing prices always pass the price filter
+    assert [entity.offering_id for entity in selected] == ["off-2", "off-1"]
+    assert columns['price_min'].tolist() == [900.0, 100.0]
+    assert columns['certifications'] == [frozenset(), frozenset({"iso 9001"})]
+
+    selected, columns = partition.select({"max_price": 100})
+    assert [entity.offering_id for entity in selected] == ["off-5", "off-3", "off-1"]
+    assert math.isnan(columns['price_min'][1])
+
+    selected, columns = partition.select()
+    assert len(selected) == len(partition) == 5
+    assert columns is partition.columns
+
+def test_requirement_partition_filters_on_min_budget():
+    requirements, _ = random_pairs(40, seed=3)
+    partition = CategoryPartition('requirement', requirements)
+
+    selected, columns = partition.select({"min_budget": 1000})
+
+    assert selected == [
+        requirement for requirement in partition.entities
+        if requirement.budget_max is None or requirement.budget_max >= 1000
+    ]
+    assert len(columns['tags']) == len(columns['budget_max']) == len(selected)
+
+def offering_row(n, category, **overrides):
+    row = {
+        "seller_id": f"seller-{n}", "offering_id": f"off-{n}", "title": "cotton yarn",
+        "description": "combed cotton yarn", "category": category, "subcategory": None,
+        "price_min": None, "price_max": None, "location": "Pune", "service_areas": json.dumps([]),
+        "capacity": None, "unit": None, "delivery_capability": None, "certifications": None,
+        "quality_standards": None, "tags": json.dumps(["bulk"]), "rating": None,
+        "created_at": datetime(2024, 1, 1) + timedelta(days=n)
+    }
+    row.update(overrides)
+    return row
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    async def fetch(self, query, *args):
+        self.queries.append((query, args))
+        ids = set(args[0])
+        return [row for row in self.rows if row["offering_id"] in ids]
+
+@pytest.mark.asyncio
+async def test_apply_changes_moves_updates_and_drops_entities(monkeypatch):
+    index = MatchingIndex()
+    index.entities, index.members, index.partitions = index._build({
+        'offering': [offering_row(1, "textiles"), offering_row(2, "textiles"), offering_row(3, "dyes")],
+        'requirement': []
+    })
+    old_dyes = index.partitions['offering']['dyes']
+
+    # off-1 moves to dyes, off-2 is deactivated, off-4 is new, off-3 is untouched
+    conn = FakeConnection([
+        offering_row(1, "dyes", title="reactive dyes"),
+        offering_row(4, "textiles", price_min=250.0),
+    ])
+
+    @asynccontextmanager
+    async def fake_connection():
+        yield conn
+
+    monkeypatch.setattr(matching, "get_db_connection", fake_connection)
+    await index.apply_changes('offering', {"off-1", "off-2", "off-4"})
+
+    assert sorted(conn.queries[0][1][0]) == ["off-1", "off-2", "off-4"]
+    assert index.get('offering', "off-2") is None
+    assert index.get('offering', "off-1").title == "reactive dyes"
+    assert index.members['offering'] == {"textiles": {"off-4"}, "dyes": {"off-1", "off-3"}}
+
+    textiles, columns = index.candidates('offering', "textiles")
+    assert [entity.offering_id for entity in textiles] == ["off-4"]
+    assert columns['price_min'].tolist() == [250.0]
+    dyes, _ = index.candidates('offering', "dyes")
+    assert {entity.offering_id for entity in dyes} == {"off-1", "off-3"}
+    assert index.partitions['offering']['dyes'] is not old_dyes  # swapped, never mutated
+    assert len(old_dyes) == 1
+
+    # Emptied categories are dropped entirely
+    conn.rows = []
+    await index.apply_changes('offering', {"off-4"})
+    assert "textiles" not in index.partitions['offering']
+    assert "textiles" not in index.members['offering']
+    assert index.candidates('offering', "textiles") == ([], {})
@@ -14,7 +14,7 @@ import os
 import uuid
 import boto3
 from botocore.exceptions import ClientError
-import requests
+from microservices.shared.utils.token_verifier import token_verifier
 from enum import Enum
 
 app = FastAPI(title="User Profile Service", description="User Profile Management Service")
@@ -49,7 +49,7 @@ async def get_db_connection():
 
 # Authentication dependency
 async def verify_token(authorization: str = None):
-    """Verify JWT token with auth service"""
+    """Verify JWT token locally against the shared signing key and revocation mirror"""
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -58,24 +58,14 @@ async def verify_token(authorization: str = None):
     
     token = authorization.split(" ")[1]
     
-    try:
-        response = requests.post(
-            f"{AUTH_SERVICE_URL}/validate-token",
-            headers={"Authorization": f"Bearer {token}"}
-        )
-        
-        if response.status_code == 200:
-            return response.json()
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token"
-            )
-    except requests.RequestException:
+    payload = token_verifier.verify(token)
+    if payload is None:
         raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="Auth service unavailable"
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token"
         )
+    
+    return token_verifier.current_user(payload)
 
 # Enums
 class UserRole(str, Enum):
@@ -767,6 +757,15 @@ async def health_check():
             detail=f"Health check failed: {str(e)}"
         )
 
+# Mirror token revocations for local verification
+@app.on_event("startup")
+async def startup_event():
+    await token_verifier.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await token_verifier.stop()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8002)
\ No newline at end of file
@@ -11,7 +11,7 @@ from typing import Optional, List, Dict, Any
 import asyncpg
 from datetime import datetime
 import os
-import requests
+from microservices.shared.utils.token_verifier import token_verifier
 import json
 import pickle
 import numpy as np
@@ -54,7 +54,7 @@ async def get_db_connection():
 
 # Authentication dependency
 async def verify_token(authorization: str = None):
-    """Verify JWT token with auth service"""
+    """Verify JWT token locally against the shared signing key and revocation mirror"""
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -63,24 +63,14 @@ async def verify_token(authorization: str = None):
     
     token = authorization.split(" ")[1]
     
-    try:
-        response = requests.post(
-            f"{AUTH_SERVICE_URL}/validate-token",
-            headers={"Authorization": f"Bearer {token}"}
-        )
-        
-        if response.status_code == 200:
-            return response.json()
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid token"
-            )
-    except requests.RequestException:
+    payload = token_verifier.verify(token)
+    if payload is None:
         raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="Auth service unavailable"
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token"
         )
+    
+    return token_verifier.current_user(payload)
 
 # Pydantic models
 class ValuationRequest(BaseModel):
@@ -812,6 +802,11 @@ async def health_check():
 async def startup_event():
     """Load trained models on startup"""
     valuation_engine.load_models()
+    await token_verifier.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await token_verifier.stop()
 
 if __name__ == "__main__":
     import uvicorn
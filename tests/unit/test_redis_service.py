@@ -0,0 +1,109 @@
+import asyncio
+import sys
+from pathlib import Path
+import pytest
+from fakeredis import aioredis as fakeredis
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from shared.redis_service import (  # noqa: E402
+    MSMERedisService,
+    CacheFamily,
+    INVALIDATE_TAG_SCRIPT,
+)
+
+PROFILES = CacheFamily("profile_test", ttl=60, local_ttl=30, tag_prefix="user")
+
+@pytest.fixture
+def service():
+    service = MSMERedisService()
+    service.async_client = fakeredis.FakeRedis()
+    service.async_invalidate_tag_script = service.async_client.register_script(INVALIDATE_TAG_SCRIPT)
+    return service
+
+class SlowLoader:
+    def __init__(self, value, delay=0.05):
+        self.value = value
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return dict(self.value)
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_load(service):
+    loader = SlowLoader({"name": "Asha"})
+
+    results = await asyncio.gather(*(service.get_cached(PROFILES, "1", loader) for _ in range(5)))
+    assert loader.calls == 1
+    assert results == [{"name": "Asha"}] * 5
+    assert len({id(result) for result in results}) == 5  # each caller gets its own copy
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_the_shared_load(service):
+    loader = SlowLoader({"name": "Asha"})
+
+    first = asyncio.create_task(service.get_cached(PROFILES, "1", loader))
+    second = asyncio.create_task(service.get_cached(PROFILES, "1", loader))
+    await asyncio.sleep(0.01)
+    first.cancel()
+
+    assert await second == {"name": "Asha"}
+    assert first.cancelled()
+    assert loader.calls == 1
+
+@pytest.mark.asyncio
+async def test_mutating_a_result_does_not_change_the_cache(service):
+    profile = await service.get_cached(PROFILES, "1", SlowLoader({"name": "Asha", "tags": []}, delay=0))
+    profile["tags"].append("mutated")
+
+    assert await service.get_cached(PROFILES, "1") == {"name": "Asha", "tags": []}  # local tier
+    service.local_cache.delete(service.generate_key(PROFILES.prefix, "1"))
+    assert await service.get_cached(PROFILES, "1") == {"name": "Asha", "tags": []}  # Redis tier
+
+@pytest.mark.asyncio
+async def test_expensive_entry_near_expiry_is_refreshed_early(service, monkeypatch):
+    loader = SlowLoader({"version": 1}, delay=0)
+    await service.get_cached(PROFILES, "1", loader)
+    loader.value = {"version": 2}
+    service.local_cache.delete(service.generate_key(PROFILES.prefix, "1"))
+
+    monkeypatch.setattr(service, "_should_refresh_early", lambda delta, remaining: True)
+    assert await service.get_cached(PROFILES, "1", loader) == {"version": 1}  # served while refreshing
+    await asyncio.gather(*service.refresh_tasks)
+
+    assert loader.calls == 2
+    service.local_cache.delete(service.generate_key(PROFILES.prefix, "1"))
+    assert await service.get_cached(PROFILES, "1") == {"version": 2}
+
+def test_refresh_probability_grows_with_loader_cost(service):
+    # XFetch: an entry 1s from expiry that took 10s to build is almost always refreshed
+    assert sum(service._should_refresh_early(10.0, 1.0) for _ in range(1000)) > 850
+    assert sum(service._should_refresh_early(0.001, 1.0) for _ in range(1000)) == 0
+    assert not service._should_refresh_early(0.0, 0.0)
+
+@pytest.mark.asyncio
+async def test_tag_invalidation_drops_only_tagged_entries(service):
+    await service.set_cached(PROFILES, "1", {"name": "Asha"}, tags=["listing:9"])
+    await service.set_cached(PROFILES, "2", {"name": "Ravi"})
+
+    assert await service.invalidate_tags("user:1") == 1
+    assert await service.get_cached(PROFILES, "1") is None
+    assert await service.get_cached(PROFILES, "2") == {"name": "Ravi"}
+
+    await service.set_cached(PROFILES, "1", {"name": "Asha"}, tags=["listing:9"])
+    assert await service.invalidate_tags("listing:9") == 1
+    assert await service.get_cached(PROFILES, "1") is None
+
+def test_invalidation_skips_the_keyspace_scan_by_default(service, monkeypatch):
+    scanned = []
+    monkeypatch.setattr(service, "delete_pattern", lambda pattern: scanned.append(pattern) or 0)
+
+    service.invalidate_user_cache("1")
+    service.invalidate_listing_cache("9")
+    assert scanned == []
+
+    service.invalidate_user_cache("1", include_legacy=True)
+    assert len(scanned) == 3